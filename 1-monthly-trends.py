@@ -1,17 +1,11 @@
 import numpy as np
-import pandas as pd
 import seaborn as sns 
 import matplotlib.pyplot as plt
 
+from collisions import load_collisions
 
-data = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
-
-data['Date'] = pd.to_datetime(data['Date'], errors='coerce')
-data = data.dropna(subset=['Date'])
-
-# Extract Month and Year 
-data['Month'] = data['Date'].dt.month
-data['Year'] = data['Date'].dt.year
+# Cleaned data with Month and Year already extracted
+data = load_collisions()
 
 monthly_counts = data.groupby('Month').size().reset_index(name='Accident_Count')
 monthly_counts.sort_values('Month', inplace=True)
@@ -1,14 +1,12 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# --- Load Data ---
-df = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
+from aggregate import VALUE_SPECS, aggregate, iqr_summary, outlier_mask
+from collisions import load_collisions
 
-# Ensure that the numeric columns are read correctly; here, we focus on "Persons Injured"
-df['Persons Injured'] = pd.to_numeric(df['Persons Injured'], errors='coerce')
-# Optionally, fill NaN values with 0 for our analysis
-df['Persons Injured'] = df['Persons Injured'].fillna(0)
+# --- Load Data ---
+# Casualty columns, including "Persons Injured", are numeric with NaN filled as 0
+df = load_collisions()
 
 # --- Visualize Data Quality: Boxplot Before Outlier Removal ---
 plt.figure(figsize=(10, 6))
@@ -20,21 +18,21 @@ plt.savefig("boxplot_before_outliers.png")
 plt.show()
 
 # --- Outlier Detection using IQR Method ---
-Q1 = df['Persons Injured'].quantile(0.25)
-Q3 = df['Persons Injured'].quantile(0.75)
-IQR = Q3 - Q1
-lower_bound = Q1 - 1.5 * IQR
-upper_bound = Q3 + 1.5 * IQR
+# Quartiles of every casualty column come from their value counts, one pass
+# over the rows with no sorting; the bounds are the usual Q1/Q3 -/+ 1.5 x IQR
+bounds = iqr_summary(aggregate(df, VALUE_SPECS))
+print("IQR outlier bounds of the casualty columns:")
+print(bounds.to_string())
 
-# Identify outliers
-outliers = df[(df['Persons Injured'] < lower_bound) | (df['Persons Injured'] > upper_bound)]
-print(f"Number of outliers in 'Persons Injured': {outliers.shape[0]}")
-# Remove outliers from the dataset for analysis
-df_clean = df[(df['Persons Injured'] >= lower_bound) & (df['Persons Injured'] <= upper_bound)]
+# Identify outliers as a row mask rather than copies of the frame
+outliers = outlier_mask(df, bounds, ['Persons Injured'])
+print(f"Number of outliers in 'Persons Injured': {outliers.sum()}")
+# Only the analysed column is taken from the rows that are kept
+injured_clean = df.loc[~outliers, 'Persons Injured']
 
 # --- Visualize Data Quality: Boxplot After Outlier Removal ---
 plt.figure(figsize=(10, 6))
-sns.boxplot(x=df_clean['Persons Injured'])
+sns.boxplot(x=injured_clean)
 plt.title("Boxplot of Persons Injured (After Outlier Removal)")
 plt.xlabel("Persons Injured")
 plt.tight_layout()
@@ -45,4 +43,4 @@ plt.show()
 print("Summary statistics before outlier removal:")
 print(df['Persons Injured'].describe())
 print("\nSummary statistics after outlier removal:")
-print(df_clean['Persons Injured'].describe())
+print(injured_clean.describe())
@@ -1,30 +1,13 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# --- Load & Clean Data ---
-# Read the CSV file
-df = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
-
-# Convert 'Date' to datetime and drop rows with invalid dates
-df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-df.dropna(subset=['Date'], inplace=True)
-
-# parsing the 'Time' column (assuming the format is "HH:MM:SS")
-df['Time'] = pd.to_datetime(df['Time'], format='%H:%M:%S', errors='coerce')
-df.dropna(subset=['Time'], inplace=True)
-df['Hour'] = df['Time'].dt.hour
+from collisions import DAY_ORDER, load_collisions
 
+# --- Load & Clean Data ---
+# Invalid dates/times are dropped; Hour and an ordered DayOfWeek are already extracted
+df = load_collisions()
+day_order = DAY_ORDER
 df.info()
-df
-
-# Extract the day of the week from 'Date'
-df['DayOfWeek'] = df['Date'].dt.day_name()
-# Order the days in a natural week order
-day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-df['DayOfWeek'] = pd.Categorical(df['DayOfWeek'], categories=day_order, ordered=True)
-df.info()
-df['Time'].head(35)
 
 # --- Visualization ---
 
@@ -54,7 +37,7 @@ plt.show()
 
 # 3. Heatmap: Accident Count by Day of Week vs. Hour of Day
 # pivot table with days as rows and hours as columns
-pivot = df.groupby(['DayOfWeek', 'Hour']).size().reset_index(name='Accident_Count')
+pivot = df.groupby(['DayOfWeek', 'Hour'], observed=True).size().reset_index(name='Accident_Count')
 pivot_table = pivot.pivot(index='DayOfWeek', columns='Hour', values='Accident_Count')
 # Ensure row order follows Monday to Sunday
 pivot_table = pivot_table.reindex(day_order)
@@ -1,22 +1,25 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Read the CSV file (update the path as needed)
-df = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
+from collisions import load_collisions
+from spatial import hotspot_grid, spatial_hotspots
 
+# Location columns are already filled with 'Unknown' by the shared loader
+df = load_collisions()
 
-# --- Accident Hotspot Identification ---
 
-# Clean location columns: fill missing values with 'Unknown'
-df['Borough'] = df['Borough'].fillna('Unknown')
-df['Street Name'] = df['Street Name'].fillna('Unknown')
+# --- Accident Hotspot Identification ---
 
-# grouping by Borough and Street Name, counting accidents
-hotspots = df.groupby(['Borough', 'Street Name']).size().reset_index(name='Accident_Count')
+# grouping by Borough and interned street ID (the codes of the canonical Street Name), counting accidents
+streets = df['Street Name'].cat.categories
+hotspots = df.groupby([df['Borough'], df['Street Name'].cat.codes.rename('Street ID')],
+                      observed=True).size().reset_index(name='Accident_Count')
 
 # sorting by accident count in descending order and select the top 20 hotspots
 top_hotspots = hotspots.sort_values('Accident_Count', ascending=False).head(20)
+# Plain strings so seaborn only draws the streets/boroughs being shown, not every category
+top_hotspots['Street Name'] = streets.take(top_hotspots['Street ID']).astype(str)
+top_hotspots = top_hotspots.astype({'Borough': str})
 
 
 # Create a horizontal bar plot to display top accident hotspots
@@ -30,3 +33,13 @@ plt.savefig("accident_hotspots.png")
 plt.show()
 
 
+# --- Coordinate-based Hotspots ---
+# Long streets span many blocks, so also rank fixed-size grid cells built from Latitude/Longitude
+for cell_size, cells in hotspot_grid(df).items():
+    print(f"Top accident hotspots on a {cell_size} m grid:")
+    print(cells.drop(columns='Cell').head(10).to_string(index=False))
+
+# Density clusters: 8-connected 100 m cells with at least 25 collisions each
+clusters = spatial_hotspots(df, eps=100, min_samples=25, k=20)
+print("Top 20 spatial hotspot clusters:")
+print(clusters.drop(columns='Cluster').to_string(index=False))
@@ -1,20 +1,19 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import textwrap
 
-# --- Load & Clean Data ---
-df = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
-
-# Fill missing 'Street Name' values
-df['Street Name'] = df['Street Name'].fillna('Unknown')
+from aggregate import week_ordinal
+from collisions import load_collisions
 
-# Convert 'Date' to datetime and drop invalid
-df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-df.dropna(subset=['Date'], inplace=True)
+# --- Load & Clean Data ---
+df = load_collisions()
 
 # --- Street-Specific Risk Evaluation ---
 total_accidents = df.shape[0]
-street_counts = df['Street Name'].value_counts()
+# Street Name is canonical and coded by interned street ID; count the codes and label the result
+streets = df['Street Name'].cat.categories
+street_ids = df['Street Name'].cat.codes.rename('Street ID')
+street_counts = street_ids.value_counts()
+street_counts.index = streets.take(street_counts.index)
 top_street = street_counts.idxmax()
 top_accident_count = street_counts.max()
 share_percentage = (top_accident_count / total_accidents) * 100
@@ -25,9 +24,11 @@ print(f"Number of accidents on {top_street}: {top_accident_count}")
 print(f"Share of total accidents: {share_percentage:.2f}%")
 
 # --- Weekly Average Calculation ---
-df['Week'] = df['Date'].dt.to_period('W').apply(lambda r: r.start_time)
-weekly_counts = df.groupby(['Street Name', 'Week']).size().reset_index(name='Weekly_Count')
-weekly_avg = weekly_counts.groupby('Street Name')['Weekly_Count'].mean()
+# Integer Monday-based week numbers; same buckets as to_period('W') without per-row Periods
+df['Week'] = week_ordinal(df['Date'])
+weekly_counts = df.groupby([street_ids, 'Week']).size().reset_index(name='Weekly_Count')
+weekly_avg = weekly_counts.groupby('Street ID')['Weekly_Count'].mean()
+weekly_avg.index = streets.take(weekly_avg.index)
 
 # --- Visualization ---
 # Get top 10 street names and truncate long ones for labels
@@ -1,12 +1,13 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-df = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
-df['Contributing Factor'] = df['Contributing Factor'].fillna('Unknown')
+from collisions import load_collisions
+
+df = load_collisions()
 
 # --- Contributing Factor Assessment ---
 cf_counts = df['Contributing Factor'].value_counts()
+cf_counts.index = cf_counts.index.astype(str)
 unspecified_count = cf_counts.get("Unspecified", 0)
 cf_counts_filtered = cf_counts.drop("Unspecified", errors='ignore')
 specified_count = cf_counts_filtered.sum()
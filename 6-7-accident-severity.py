@@ -2,30 +2,26 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# --- Load & Clean Data ---
-df = pd.read_csv(r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv")
+from aggregate import OBJECTIVE_SPECS, aggregate
+from collisions import load_collisions
+from severity import fatal_factor_counts, road_user_profile, severity_cube
 
-# Fill missing values for 'Contributing Factor'
-df['Contributing Factor'] = df['Contributing Factor'].fillna('Unknown')
+# --- Load & Clean Data ---
+# 'Contributing Factor' is filled, the casualty columns are numeric and every row
+# carries its 'Severity' code (none/injury/fatal plus the road-user groups hurt)
+df = load_collisions()
 
-# Ensure numeric columns are numeric; convert and fill NaN with 0
-numeric_cols = ['Persons Killed', 'Pedestrians Killed', 'Cyclists Killed', 'Motorists Killed',
-                'Pedestrians Injured', 'Cyclists Injured', 'Motorists Injured']
-for col in numeric_cols:
-    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+# --- Severity cube ---
+# Accidents and casualty sums per Borough x Hour x Contributing Factor x Severity
+# code; the fatal and injury analyses below roll it up instead of copying rows
+severity = aggregate(df, [spec for spec in OBJECTIVE_SPECS if spec.name == 'severity'])['severity']
+cube = severity_cube(severity)
 
 # --- Objective 6: Fatal Accident Causality Analysis ---
-# Create a 'Total Fatalities' column by summing fatalities across categories
-df['Total Fatalities'] = (df['Persons Killed'] + 
-                          df['Pedestrians Killed'] + 
-                          df['Cyclists Killed'] + 
-                          df['Motorists Killed'])
-
-# Filter fatal accidents (where Total Fatalities > 0)
-fatal_df = df[df['Total Fatalities'] > 0]
-
-# Group by 'Contributing Factor' and count fatal accidents
-fatal_cf_counts = fatal_df['Contributing Factor'].value_counts()
+# Fatal accidents (anyone killed) per contributing factor
+fatal_cf_counts = fatal_factor_counts(cube).set_index('Contributing Factor')['Accident_Count']
+fatal_cf_counts = fatal_cf_counts.sort_values(ascending=False, kind='stable')
+fatal_cf_counts.index = fatal_cf_counts.index.astype(str)
 
 # Plot the top contributing factors in fatal accidents
 plt.figure(figsize=(10, 6))
@@ -50,18 +46,14 @@ plt.show()
 
 # --- Objective 7: Injury Severity Profiling ---
 # Calculate total injuries and fatalities for pedestrians, cyclists, and motorists
-ped_injured = df['Pedestrians Injured'].sum()
-ped_killed  = df['Pedestrians Killed'].sum()
-cycl_injured = df['Cyclists Injured'].sum()
-cycl_killed  = df['Cyclists Killed'].sum()
-motor_injured = df['Motorists Injured'].sum()
-motor_killed  = df['Motorists Killed'].sum()
+totals = cube.rollup([], ['Pedestrians Injured', 'Pedestrians Killed', 'Cyclists Injured', 'Cyclists Killed',
+                          'Motorists Injured', 'Motorists Killed']).iloc[0]
 
 # Create a summary DataFrame
 injury_data = {
     "Category": ["Pedestrians", "Cyclists", "Motorists"],
-    "Injured": [ped_injured, cycl_injured, motor_injured],
-    "Killed": [ped_killed, cycl_killed, motor_killed]
+    "Injured": [totals[f"{group} Injured"] for group in ["Pedestrians", "Cyclists", "Motorists"]],
+    "Killed": [totals[f"{group} Killed"] for group in ["Pedestrians", "Cyclists", "Motorists"]]
 }
 injury_df = pd.DataFrame(injury_data)
 
@@ -97,3 +89,7 @@ for bar, base in zip(bars_killed, injured):
 plt.tight_layout()
 plt.savefig("injury_severity_stacked.png")
 plt.show()
+
+# Accidents in which each group was injured / killed, from the severity codes
+print("Accidents injuring / killing each road-user group:")
+print(road_user_profile(cube).round(2).to_string(index=False))
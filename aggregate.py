@@ -0,0 +1,343 @@
+"""
+Single-pass aggregation engine for the analysis objectives.
+
+Each aggregate is described by an AggSpec: the key columns to group on, the
+columns to sum (or None to count accidents) and an optional column whose
+non-zero rows are the only ones counted. Every key column is integer-encoded
+once, then each spec is reduced with np.bincount over the combined codes, so
+the whole list of aggregates is computed from one pass over the frame instead
+of one groupby per objective.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from collisions import COUNT_COLS, DAY_ORDER, iter_collisions, report_dropped
+from profiling import stage
+from streets import intersection_labels
+
+AggSpec = namedtuple('AggSpec', ['name', 'keys', 'values', 'where'], defaults=[None, None])
+AggSpec.__doc__ = """
+Named aggregate over the frame: group on keys (an empty list gives one total
+row), count accidents when values is None or sum the values columns, and only
+consider rows where the where column is non-zero.
+"""
+
+COUNT_NAME = 'Accident_Count'
+
+# Combined key spaces up to this size are reduced with a dense bincount
+_DENSE_LIMIT = 1 << 22
+
+# Value counts of every casualty column. The counts are small integers, so the
+# exact value histogram is a mergeable quantile summary: its size is the number
+# of distinct values, it adds up across chunks and workers like any partial, and
+# the IQR outlier step reads exact quantiles from it without sorting the rows.
+VALUE_SPECS = [AggSpec(f'values:{col}', [col]) for col in COUNT_COLS]
+
+# Aggregates read by the plotting code in nyc-data-analysis.py
+OBJECTIVE_SPECS = [
+    AggSpec('monthly', ['Month']),
+    AggSpec('monthly_year', ['Year', 'Month']),
+    AggSpec('day', ['DayOfWeek']),
+    AggSpec('hour', ['Hour']),
+    AggSpec('day_hour', ['DayOfWeek', 'Hour']),
+    AggSpec('hotspots', ['Borough', 'Street Name']),
+    AggSpec('streets', ['Street Name']),
+    AggSpec('street_week', ['Street Name', 'Week']),
+    AggSpec('factors', ['Contributing Factor']),
+    AggSpec('fatal_factors', ['Contributing Factor'], where='Total Fatalities'),
+    AggSpec('casualties', [], values=COUNT_COLS),
+    # Casualty-rate cube of severity.py: accidents and casualties per severity code
+    AggSpec('severity', ['Borough', 'Hour', 'Contributing Factor', 'Severity'], values=COUNT_COLS),
+    # Count tensor of temporal.py
+    AggSpec('borough_month_day_hour', ['Borough', 'Month', 'DayOfWeek', 'Hour']),
+    # Vehicle Type contingency tables of vehicles.py
+    AggSpec('vehicle_severity', ['Vehicle Type', 'Severity']),
+    AggSpec('vehicle_factors', ['Vehicle Type', 'Contributing Factor']),
+    # Count series scored for spikes by anomaly.py (with monthly_year and street_week)
+    AggSpec('daily', ['Date']),
+    AggSpec('borough_hour_week', ['Borough', 'Hour', 'Week']),
+    # Intersection index of intersections.py: totals and weekly history per borough
+    AggSpec('intersections', ['Borough', 'Intersection'], values=COUNT_COLS),
+    AggSpec('intersection_week', ['Borough', 'Intersection', 'Week']),
+] + VALUE_SPECS
+
+
+def week_ordinal(dates):
+    """
+    Return the Monday-based week number of each date as int32, computed without Period objects.
+
+    Week 0 starts on Monday 1969-12-29, so the buckets match
+    dates.dt.to_period('W') and week_start() recovers its start_time.
+    """
+    days = dates.to_numpy().astype('datetime64[D]').astype('int64')
+    # 1970-01-01 was a Thursday, three days after the Monday that starts week 0
+    return ((days + 3) // 7).astype('int32')
+
+
+def week_start(ordinals):
+    """Return the Monday starting each week_ordinal() as datetime64."""
+    days = np.asarray(ordinals, dtype='int64') * 7 - 3
+    return pd.to_datetime(days, unit='D')
+
+
+def weekly_average(street_week, key='Street Name'):
+    """
+    Average weekly accident count per key from the sparse key x week count table.
+
+    Only weeks with at least one accident are present in the table, so this is
+    the key's total divided by its number of active weeks, reduced with bincount.
+    """
+    codes, keys = pd.factorize(street_week[key], sort=True)
+    counts = street_week[COUNT_NAME].to_numpy()
+    totals = np.bincount(codes, weights=counts, minlength=len(keys))
+    weeks = np.bincount(codes, minlength=len(keys))
+    return pd.Series(totals / weeks, index=pd.Index(keys, name=key), name='Weekly_Count')
+
+
+def add_objective_columns(df):
+    """Add the derived 'Week', 'Intersection' and 'Total Fatalities' columns that OBJECTIVE_SPECS use."""
+    df['Week'] = week_ordinal(df['Date'])
+    df['Intersection'] = intersection_labels(df['Street Name'], df['Cross Street'])
+    # 'Persons Killed' is already the total of the pedestrian, cyclist and motorist
+    # columns; the larger of the two only covers rows where one side is missing
+    group_killed = (df['Pedestrians Killed'].astype('int64') + df['Cyclists Killed'] + df['Motorists Killed'])
+    df['Total Fatalities'] = np.maximum(df['Persons Killed'].to_numpy().astype('int64'), group_killed.to_numpy())
+    return df
+
+
+def _encode(series):
+    """Return integer codes (-1 for missing) and the sorted values they index."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        if series.cat.ordered:
+            # Keep ordered categoricals (e.g. DayOfWeek) sorting in their natural order
+            categories = pd.CategoricalIndex(categories, dtype=series.dtype)
+        return series.cat.codes.to_numpy(), categories
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes, pd.Index(uniques, name=series.name)
+
+
+def _reduce(spec, df, encoded):
+    """Aggregate one spec into a frame indexed by its key values."""
+    keys = list(spec.keys)
+    values = list(spec.values or [])
+    mask = np.ones(len(df), dtype=bool)
+    if keys:
+        sizes = [len(encoded[k][1]) for k in keys]
+        for k in keys:
+            mask &= encoded[k][0] >= 0
+    else:
+        sizes = [1]
+    if spec.where is not None:
+        mask &= df[spec.where].to_numpy() > 0
+
+    if keys:
+        group = np.ravel_multi_index([encoded[k][0][mask] for k in keys], sizes)
+    else:
+        group = np.zeros(int(mask.sum()), dtype=np.intp)
+
+    space = int(np.prod(sizes))
+    if space <= _DENSE_LIMIT:
+        slot, ids = group, np.arange(space)
+    else:
+        # Sparse key space (e.g. street x week): only number the observed groups
+        ids, slot = np.unique(group, return_inverse=True)
+    counts = np.bincount(slot, minlength=len(ids))
+    present = np.flatnonzero(counts)
+
+    columns = {COUNT_NAME: counts[present].astype('int64')}
+    for col in values:
+        sums = np.bincount(slot, weights=df[col].to_numpy()[mask], minlength=len(ids))
+        columns[col] = np.rint(sums[present]).astype('int64')
+    ids = ids[present]
+
+    if keys:
+        levels = np.unravel_index(ids, sizes)
+        index = pd.MultiIndex.from_arrays(
+            [encoded[k][1].take(level) for k, level in zip(keys, levels)], names=keys)
+        if len(keys) == 1:
+            index = index.get_level_values(0)
+    else:
+        index = pd.RangeIndex(len(ids))
+    return pd.DataFrame(columns, index=index)
+
+
+def partial_aggregate(df, specs):
+    """Compute every spec over df, returning {name: frame indexed by the spec's keys}."""
+    encoded = {}
+    with stage('encode_keys', rows_in=len(df)):
+        for spec in specs:
+            for key in spec.keys:
+                if key not in encoded:
+                    encoded[key] = _encode(df[key])
+    partials = {}
+    for spec in specs:
+        with stage(f'groupby:{spec.name}', rows_in=len(df)) as step:
+            partials[spec.name] = _reduce(spec, df, encoded)
+            step.rows_out = len(partials[spec.name])
+    return partials
+
+
+def merge_partials(left, right):
+    """Add two partial results from partial_aggregate() key by key."""
+    merged = {}
+    for name in left.keys() | right.keys():
+        if name not in left or name not in right:
+            merged[name] = left.get(name, right.get(name))
+        else:
+            merged[name] = left[name].add(right[name], fill_value=0).astype('int64')
+    return merged
+
+
+def finalize(partials, specs):
+    """Turn partial results into flat result tables sorted by their keys."""
+    results = {}
+    for spec in specs:
+        table = partials[spec.name]
+        if spec.keys:
+            table = table.sort_index().reset_index()
+        else:
+            table = table.sum().to_frame().T.astype('int64')
+        results[spec.name] = table
+    return results
+
+
+def aggregate(df, specs=OBJECTIVE_SPECS):
+    """Compute all specs over df in one pass and return {name: result table}."""
+    with stage('aggregate', rows_in=len(df)):
+        return finalize(partial_aggregate(df, specs), specs)
+
+
+def aggregate_chunks(chunks, specs=OBJECTIVE_SPECS):
+    """
+    Aggregate an iterable of cleaned frames, folding each chunk's partial into a running total.
+
+    Only the partial tables are kept between chunks, so memory is bounded by the
+    number of distinct keys rather than the number of rows. The result is
+    identical to aggregate() over the concatenated chunks.
+    """
+    partials = None
+    dropped = {'Date': 0, 'Time': 0}
+    for chunk in chunks:
+        for col, count in chunk.attrs.get('dropped_rows', {}).items():
+            dropped[col] += count
+        partial = partial_aggregate(add_objective_columns(chunk), specs)
+        partials = partial if partials is None else merge_partials(partials, partial)
+    if partials is None:
+        raise ValueError("no rows to aggregate")
+    report_dropped(dropped)
+    return finalize(partials, specs)
+
+
+def aggregate_csv(path=None, specs=OBJECTIVE_SPECS, chunksize=500_000):
+    """Stream the raw CSV in bounded chunks and aggregate it without loading it whole."""
+    return aggregate_chunks(iter_collisions(path, chunksize), specs)
+
+
+# ------------------ Derived tables shared by the reports and figures ------------------
+
+def monthly_percentages(monthly):
+    """Add each month's share of all accidents as 'Percentage'."""
+    monthly = monthly.copy()
+    monthly['Percentage'] = monthly[COUNT_NAME] / monthly[COUNT_NAME].sum() * 100
+    return monthly
+
+
+def monthly_year_percentages(monthly_year):
+    """Add each month's share of its year's accidents as 'Percentage'."""
+    monthly_year = monthly_year.copy()
+    monthly_year['Percentage'] = (monthly_year[COUNT_NAME] /
+                                  monthly_year.groupby('Year')[COUNT_NAME].transform('sum') * 100)
+    return monthly_year
+
+
+def day_hour_percentages(day_hour):
+    """Pivot the DayOfWeek x Hour counts (Monday first) and normalise each day to 100%."""
+    pivot_table = day_hour.pivot(index='DayOfWeek', columns='Hour', values=COUNT_NAME)
+    pivot_table = pivot_table.reindex(DAY_ORDER).fillna(0)
+    pivot_table.index = pivot_table.index.astype(str)
+    return pivot_table.div(pivot_table.sum(axis=1), axis=0) * 100
+
+
+def top_counts(table, key, n=None):
+    """Accident counts of a one-key table as a Series with plain string labels, largest first."""
+    counts = table.set_index(key)[COUNT_NAME].sort_values(ascending=False, kind='stable')
+    counts.index = counts.index.astype(str)
+    return counts if n is None else counts.head(n)
+
+
+def injury_profile(casualties):
+    """Injured and killed totals for pedestrians, cyclists and motorists from the 'casualties' table."""
+    totals = casualties.iloc[0]
+    groups = ["Pedestrians", "Cyclists", "Motorists"]
+    return pd.DataFrame({"Category": groups,
+                         "Injured": [totals[f"{g} Injured"] for g in groups],
+                         "Killed": [totals[f"{g} Killed"] for g in groups]})
+
+
+def weighted_quantile(values, counts, q):
+    """Quantile of the data described by distinct values and their counts (same as Series.quantile)."""
+    order = np.argsort(values)
+    values, cumulative = np.asarray(values, dtype='float64')[order], np.cumsum(np.asarray(counts)[order])
+    position = q * (cumulative[-1] - 1)
+    lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+    upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+    return lower + (upper - lower) * (position - np.floor(position))
+
+
+def iqr_bounds(values, counts):
+    """Return (Q1, Q3, lower_bound, upper_bound) of the 1.5 x IQR rule."""
+    q1 = weighted_quantile(values, counts, 0.25)
+    q3 = weighted_quantile(values, counts, 0.75)
+    iqr = q3 - q1
+    return q1, q3, q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def value_counts(results, col):
+    """Distinct values of col and their counts from the VALUE_SPECS table, as float64/int64 arrays."""
+    table = results[f'values:{col}']
+    return table[col].to_numpy(dtype='float64'), table[COUNT_NAME].to_numpy()
+
+
+def describe_counts(values, counts):
+    """Series.describe() of the data described by distinct values and their counts."""
+    total = counts.sum()
+    mean = (values * counts).sum() / total
+    std = np.sqrt(((values - mean) ** 2 * counts).sum() / max(total - 1, 1))
+    return pd.Series({'count': total, 'mean': mean, 'std': std, 'min': values.min(),
+                      '25%': weighted_quantile(values, counts, 0.25),
+                      '50%': weighted_quantile(values, counts, 0.5),
+                      '75%': weighted_quantile(values, counts, 0.75), 'max': values.max()})
+
+
+def iqr_summary(results, columns=COUNT_COLS):
+    """
+    IQR outlier bounds of every casualty column from the VALUE_SPECS tables.
+
+    One row per column with Q1, Q3, IQR, the Lower/Upper bounds and the number
+    of Outliers outside them.
+    """
+    rows = {}
+    for col in columns:
+        values, counts = value_counts(results, col)
+        q1, q3, low, high = iqr_bounds(values, counts)
+        outside = (values < low) | (values > high)
+        rows[col] = {'Q1': q1, 'Q3': q3, 'IQR': q3 - q1, 'Lower': low, 'Upper': high,
+                     'Outliers': int(counts[outside].sum())}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def outlier_mask(df, bounds, columns=None):
+    """
+    Boolean row mask of values outside the iqr_summary() bounds in any of columns.
+
+    Filter with df.loc[~mask, col] (or keep the mask) instead of copying the frame.
+    """
+    mask = np.zeros(len(df), dtype=bool)
+    for col in columns or list(bounds.index):
+        values = df[col].to_numpy()
+        mask |= (values < bounds.at[col, 'Lower']) | (values > bounds.at[col, 'Upper'])
+    return mask
@@ -0,0 +1,285 @@
+"""
+Command-line entry point for the objective analysis.
+
+Only the tables and figures of the selected objectives are computed, and the
+heavy modules (pandas, and matplotlib/seaborn inside the render workers) are
+imported after the arguments are parsed, so `--help` and bad arguments return
+immediately and `--no-plots` never loads a plotting library. `--profile`
+records every stage (see profiling.py).
+
+    python analysis.py --objectives 1,2,6
+    python analysis.py --input NYC_Collisions.csv --no-plots
+    python analysis.py --output-dir figures --stream
+"""
+
+import argparse
+import os
+import sys
+
+# collisions.COUNT_COLS, repeated so parsing the arguments does not import pandas
+CASUALTY_COLS = ['Persons Injured', 'Persons Killed', 'Pedestrians Injured', 'Pedestrians Killed',
+                 'Cyclists Injured', 'Cyclists Killed', 'Motorists Injured', 'Motorists Killed']
+
+# Aggregate tables each objective needs (names from aggregate.OBJECTIVE_SPECS)
+OBJECTIVE_TABLES = {
+    1: ['monthly', 'monthly_year'],
+    2: ['day', 'hour', 'day_hour'],
+    3: ['hotspots'],
+    4: ['streets', 'street_week', 'casualties', 'intersections', 'intersection_week'],
+    5: ['factors'],
+    6: ['fatal_factors', 'severity'],
+    7: ['casualties', 'severity'],
+    8: ['vehicle_severity', 'vehicle_factors'],
+    9: ['borough_month_day_hour'],
+    10: [f'values:{col}' for col in CASUALTY_COLS] + ['daily', 'borough_hour_week', 'street_week', 'monthly_year'],
+}
+
+
+def parse_objectives(text):
+    """Parse '1,2,6' (or 'all') into a sorted list of objective numbers."""
+    if text.strip().lower() == 'all':
+        return sorted(OBJECTIVE_TABLES)
+    try:
+        objectives = sorted({int(part) for part in text.split(',') if part.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated objective numbers, got {text!r}")
+    unknown = [n for n in objectives if n not in OBJECTIVE_TABLES]
+    if unknown or not objectives:
+        raise argparse.ArgumentTypeError(
+            f"unknown objective(s) {unknown or text!r}; choose from {sorted(OBJECTIVE_TABLES)}")
+    return objectives
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Analyse the NYC collisions dataset objective by objective.")
+    parser.add_argument('--input', default=None,
+                        help="collisions CSV (default: $NYC_COLLISIONS_CSV or the original path)")
+    parser.add_argument('--objectives', type=parse_objectives, default=sorted(OBJECTIVE_TABLES),
+                        help="comma-separated objectives to run, e.g. 1,2,6 (default: all of "
+                             f"{','.join(map(str, OBJECTIVE_TABLES))})")
+    parser.add_argument('--no-plots', action='store_true', help="print the tables only, draw no figures")
+    parser.add_argument('--output-dir', default='.', help="directory for the PNG figures (default: %(default)s)")
+    parser.add_argument('--stream', action='store_true',
+                        help="aggregate the CSV in chunks instead of loading it whole")
+    parser.add_argument('--parallel', type=int, metavar='N', default=None,
+                        help="aggregate the CSV across N worker processes over byte ranges (parallel.py)")
+    parser.add_argument('--approximate', action='store_true',
+                        help="stream the CSV and rank streets, hotspots and fatal factors with a bounded-memory "
+                             "top-K sketch plus an exact re-count")
+    parser.add_argument('--capacity', type=int, default=1000,
+                        help="counters per top-K sketch with --approximate (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="figure render processes (default: CPU count); --parallel sets aggregation workers")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="record per-stage timings and memory to PATH "
+                             "(.json: Chrome trace, .jsonl: one record per line)")
+    return parser
+
+
+# ------------------ Text reports per objective ------------------
+
+def report_monthly(results):
+    from aggregate import monthly_percentages, monthly_year_percentages
+
+    print("Overall Monthly Accident Distribution:")
+    print(monthly_percentages(results['monthly']))
+    print("Monthly Accident Distribution by Year:")
+    print(monthly_year_percentages(results['monthly_year']))
+
+
+def report_temporal(results):
+    from aggregate import top_counts
+
+    print("Accidents by Day of Week:")
+    print(top_counts(results['day'], 'DayOfWeek'))
+    print("Busiest hours:")
+    print(top_counts(results['hour'], 'Hour', 5))
+
+
+def report_hotspots(results):
+    top_hotspots = results['hotspots'].sort_values('Accident_Count', ascending=False, kind='stable').head(20)
+    print("Top 20 Accident Hotspots (Borough, Street Name):")
+    print(top_hotspots.astype({'Borough': str, 'Street Name': str}).to_string(index=False))
+
+
+def report_streets(results):
+    from aggregate import top_counts
+
+    street_counts = top_counts(results['streets'], 'Street Name')
+    top_street = street_counts.index[0]
+    top_accident_count = street_counts.iloc[0]
+    # Share of all accidents; the 'streets' table may hold only the top streets (--approximate)
+    total_accidents = results['casualties']['Accident_Count'].iloc[0]
+    share_percentage = (top_accident_count / total_accidents) * 100
+
+    print("Street-Specific Risk Evaluation:")
+    print(f"Street with highest accidents: {top_street}")
+    print(f"Number of accidents on {top_street}: {top_accident_count}")
+    print(f"Share of total accidents: {share_percentage:.2f}%")
+
+    if 'intersections' in results:
+        from intersections import IntersectionIndex
+
+        index = IntersectionIndex.from_results(results)
+        top = index.top(k=10)[['Intersection', 'Main Borough', 'Accident_Count', 'Persons Injured', 'Persons Killed',
+                               'Weekly_Average']]
+        print(f"Top 10 Intersections (Street Name x Cross Street, {len(index)} intersections):")
+        print(top.round(2).to_string(index=False))
+
+
+def report_factors(results):
+    from aggregate import top_counts
+
+    print("Top 10 Contributing Factors:")
+    print(top_counts(results['factors'], 'Contributing Factor', 10))
+
+
+def report_fatal(results):
+    from aggregate import top_counts
+
+    from severity import casualty_rates, severity_cube
+
+    print("Top 10 Contributing Factors in Fatal Accidents:")
+    print(top_counts(results['fatal_factors'], 'Contributing Factor', 10))
+
+    cube = severity_cube(results['severity'])
+    columns = ['Accident_Count', 'Fatal Accidents', 'Fatality Rate', 'Fatal Share']
+    print("Fatal accidents by Borough (Fatality Rate: killed per 1,000 accidents; Fatal Share: %):")
+    print(casualty_rates(cube, ['Borough'])[['Borough'] + columns].round(2).to_string(index=False))
+    print("Hours with the highest Fatal Share:")
+    hours = casualty_rates(cube, ['Hour']).sort_values('Fatal Share', ascending=False, kind='stable')
+    print(hours[['Hour'] + columns].head(5).round(2).to_string(index=False))
+
+
+def report_injuries(results):
+    from aggregate import injury_profile
+
+    from severity import road_user_profile, severity_cube
+
+    print("Injuries and Fatalities by Road User:")
+    print(injury_profile(results['casualties']).to_string(index=False))
+    print("Accidents injuring / killing each road-user group (Share: % of injury / fatal accidents):")
+    print(road_user_profile(severity_cube(results['severity'])).round(2).to_string(index=False))
+
+
+def report_vehicles(results):
+    from vehicles import Contingency, relative_risks, report_association, severity_classes
+
+    classes = severity_classes(results['vehicle_severity'])
+    factors = Contingency.from_table(results['vehicle_factors'], 'Vehicle Type', 'Contributing Factor')
+    print("Association of Vehicle Type with outcome and cause (chi-square test of independence):")
+    report_association("Vehicle Type x severity", classes)
+    report_association("Vehicle Type x Contributing Factor", factors)
+    for outcome in ('fatal', 'injury'):
+        print(f"Vehicle types by relative risk of a{'n' if outcome == 'injury' else ''} {outcome} accident:")
+        print(relative_risks(classes, outcome).head(10).round(3).to_string(index=False))
+    print("Vehicle Type x Contributing Factor pairs most over-represented (standardized residual):")
+    print(factors.residuals(min_count=20).head(10).round(2).to_string(index=False))
+
+
+def report_temporal_spatial(results):
+    from temporal import PROFILE_AXES, count_tensor, peak_hours, profile_correlations, segment_shares
+
+    boroughs, tensor = count_tensor(results['borough_month_day_hour'])
+    for profile in PROFILE_AXES:
+        print(f"Correlation of the boroughs' {profile} accident profiles:")
+        print(profile_correlations(boroughs, tensor, profile).round(3).to_string())
+    print("Share of each borough's accidents by part of the day (%):")
+    print(segment_shares(boroughs, tensor).round(1).to_string())
+    print("Busiest hour per borough:")
+    print(peak_hours(boroughs, tensor).round(1).to_string())
+
+
+def report_outliers(results):
+    from aggregate import describe_counts, iqr_bounds, iqr_summary, value_counts
+
+    print("IQR outlier bounds of the casualty columns:")
+    print(iqr_summary(results).to_string())
+
+    values, counts = value_counts(results, 'Persons Injured')
+    _, _, low, high = iqr_bounds(values, counts)
+    kept = (values >= low) & (values <= high)
+    print(f"Number of outliers in 'Persons Injured': {counts[~kept].sum()}")
+    for label, stats in [("before", describe_counts(values, counts)),
+                         ("after", describe_counts(values[kept], counts[kept]))]:
+        print(f"Summary statistics {label} outlier removal:")
+        for name, value in stats.items():
+            print(f"{name:<6}{value:>14.6f}")
+
+    # Spikes against per-group baselines, from the same aggregate tables
+    from anomaly import detect, report_anomalies
+
+    report_anomalies(detect(results))
+
+
+REPORTS = {
+    1: report_monthly,
+    2: report_temporal,
+    3: report_hotspots,
+    4: report_streets,
+    5: report_factors,
+    6: report_fatal,
+    7: report_injuries,
+    8: report_vehicles,
+    9: report_temporal_spatial,
+    10: report_outliers,
+}
+
+
+def run(args):
+    """Compute the tables of the selected objectives, print their reports and render their figures."""
+    from aggregate import OBJECTIVE_SPECS, add_objective_columns, aggregate, aggregate_csv
+    from collisions import load_collisions
+    from profiling import stage
+
+    needed = {name for n in args.objectives for name in OBJECTIVE_TABLES[n]}
+    specs = [spec for spec in OBJECTIVE_SPECS if spec.name in needed]
+
+    if args.approximate:
+        from topk import aggregate_approximate, report_error_bounds
+
+        # The spike detector of objective 10 scores street_week for more streets than objective 4 reports
+        coverage = {}
+        if 10 in args.objectives:
+            from anomaly import STREETS
+
+            coverage['street_week'] = STREETS
+        results, summaries = aggregate_approximate(args.input, specs, args.capacity, coverage=coverage)
+        report_error_bounds(summaries)
+    elif args.parallel:
+        from parallel import aggregate_parallel
+
+        results = aggregate_parallel(args.input, specs, workers=args.parallel)
+    elif args.stream:
+        results = aggregate_csv(args.input, specs)
+    else:
+        df = load_collisions(args.input, report=True)
+        with stage('objective_columns', rows_in=len(df)):
+            df = add_objective_columns(df)
+        results = aggregate(df, specs)
+        del df
+
+    for n in args.objectives:
+        print(f"\n------------------ Objective {n} ------------------")
+        with stage(f'report:{n}'):
+            REPORTS[n](results)
+
+    if not args.no_plots:
+        from render import figure_specs, render_all
+
+        os.makedirs(args.output_dir, exist_ok=True)
+        render_all(figure_specs(results, objectives=args.objectives), args.output_dir, workers=args.workers)
+    return results
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        import profiling
+
+        profiling.enable(args.profile)
+    run(args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,290 @@
+"""
+Spike detection on the aggregated accident counts.
+
+The IQR step of objective 10 trims single rows; this module instead flags
+periods whose accident count is unusually high for their own group:
+
+* days against the rolling median of the same weekday in the surrounding weeks,
+* Borough x Hour weeks against that borough-hour's rolling median/MAD,
+* street-weeks of the busiest streets against the street's rolling median/MAD,
+
+each of which must also be improbable as Poisson noise around the group's
+expected count (see poisson_tail()),
+* months of the Year x Month series of objective 1 against a seasonal
+  (month-of-year) x yearly-level expectation.
+
+Everything works on the small aggregate tables of aggregate.py, laid out as a
+dense group x period array with zeros for periods without accidents, so the
+rolling statistics are a few NumPy reductions over sliding windows and cost
+the same whether the tables came from a full load or --stream.
+
+    python anomaly.py NYC_Collisions.csv
+"""
+
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from aggregate import COUNT_NAME, OBJECTIVE_SPECS, week_start
+from profiling import stage
+
+# OBJECTIVE_SPECS tables the detectors read
+ANOMALY_TABLES = ['daily', 'borough_hour_week', 'street_week', 'monthly_year']
+
+# Robust z-score above which a period is reported, and the window (in periods) on each side of the baselines
+THRESHOLD = 3.5
+DAY_WINDOW = 28
+WEEK_WINDOW = 8
+
+# A rolling spike must also have a Poisson tail probability below ALPHA and at least MIN_COUNT
+# accidents. The detectors test tens of thousands of group-periods, so ALPHA is set for
+# (almost) no false alarms on data without spikes rather than per-period significance.
+ALPHA = 1e-6
+MIN_COUNT = 5
+
+# Busiest streets whose weeks are scored; --approximate re-counts street_week for this many
+STREETS = 200
+
+# 1 / Phi^-1(0.75): scales the MAD to the standard deviation of normal data
+_MAD_SCALE = 1.4826
+
+
+def dense_counts(table, group_keys, period):
+    """
+    Lay out a sparse count table as a (groups x periods) array.
+
+    period is an integer column (e.g. 'Week'); every period between the first
+    and the last one observed gets a column, with 0 where a group had no
+    accidents. Returns (groups, first_period, counts) where groups is the
+    MultiIndex of the group key values (a RangeIndex of one group when
+    group_keys is empty).
+    """
+    periods = table[period].to_numpy().astype('int64')
+    first = int(periods.min())
+    if group_keys:
+        codes, groups = pd.MultiIndex.from_frame(table[group_keys]).factorize()
+        groups.names = group_keys
+    else:
+        codes, groups = np.zeros(len(table), dtype=np.intp), pd.RangeIndex(1)
+    counts = np.zeros((len(groups), int(periods.max()) - first + 1))
+    counts[codes, periods - first] = table[COUNT_NAME].to_numpy()
+    return groups, first, counts
+
+
+def rolling_baseline(counts, window):
+    """
+    Trailing median, MAD and mean of each period's preceding window periods, per row.
+
+    Returns three arrays shaped like counts; the first window periods of each
+    row have no complete history and are NaN.
+    """
+    windows = sliding_window_view(counts, window, axis=1)[:, :-1]
+    median = np.median(windows, axis=2)
+    mad = np.median(np.abs(windows - median[..., None]), axis=2)
+    mean = windows.mean(axis=2)
+    head = np.full((counts.shape[0], window), np.nan)
+    return np.hstack([head, median]), np.hstack([head, mad]), np.hstack([head, mean])
+
+
+def robust_score(counts, median, mad):
+    """
+    Robust z-score of counts against a median/MAD baseline.
+
+    A few tied weeks make the MAD of a short window collapse (often to 0 or 1),
+    so the spread is never taken below the Poisson noise of the baseline,
+    sqrt(median), and never below one accident.
+    """
+    spread = np.maximum(_MAD_SCALE * mad, np.sqrt(np.maximum(median, 1)))
+    return (counts - median) / spread
+
+
+def poisson_tail(counts, expected):
+    """
+    P(X >= counts) for X ~ Poisson(expected), elementwise.
+
+    Uses the regularized incomplete gamma function of scipy when it is
+    installed, and the Wilson-Hilferty approximation of the same Gamma
+    probability otherwise.
+    """
+    counts = np.maximum(np.asarray(counts, dtype='float64'), 1)
+    expected = np.asarray(expected, dtype='float64')
+    try:
+        from scipy.special import gammainc
+    except ImportError:
+        # P(X >= k) = P(Gamma(k, 1) <= expected), and the cube root of Gamma(k) is close to normal
+        z = ((expected / counts) ** (1 / 3) - (1 - 1 / (9 * counts))) * 3 * np.sqrt(counts)
+        return np.frompyfunc(math.erfc, 1, 1)(-z / np.sqrt(2)).astype('float64') / 2
+    return gammainc(counts, expected)
+
+
+def _spikes(groups, first, counts, median, mad, expected, group_keys, period, threshold, alpha):
+    """
+    Frame of the (group, period) cells flagged as spikes, most improbable first.
+
+    A cell is flagged when its robust z-score is above threshold, it has at
+    least MIN_COUNT accidents and its Poisson tail probability against the
+    expected count is below alpha.
+    """
+    with np.errstate(invalid='ignore'):
+        score = robust_score(counts, median, mad)
+        rows, cols = np.nonzero((score > threshold) & (counts >= MIN_COUNT))
+    tail = poisson_tail(counts[rows, cols], expected[rows, cols])
+    keep = tail < alpha
+    rows, cols, tail = rows[keep], cols[keep], tail[keep]
+    table = pd.DataFrame({period: cols + first, COUNT_NAME: counts[rows, cols].astype('int64'),
+                          'Baseline': median[rows, cols], 'Expected': expected[rows, cols].round(2),
+                          'Score': score[rows, cols].round(2), 'P': tail})
+    if group_keys:
+        table = pd.concat([groups.take(rows).to_frame(index=False), table], axis=1)
+    return table.sort_values('P', kind='stable').reset_index(drop=True)
+
+
+def rolling_anomalies(table, group_keys, period, window, threshold=THRESHOLD, alpha=ALPHA):
+    """
+    Periods whose count is a spike against the group's windows on both sides.
+
+    The baseline is taken over the window periods before and the window
+    periods after each one, whichever is higher, so a lasting change of level
+    (e.g. from a quiet to a busy month) is not reported as a spike. Near the
+    ends of a series only one side is complete: the first window periods are
+    compared with the periods after them and the last window periods with the
+    periods before them. The robust z-score is
+    taken against the baseline median/MAD. The Poisson expectation is the
+    larger of the baseline median and mean, and never less
+    than the group's mean over all periods (capped at one accident), so a
+    window of zeros in a sparse group does not make a handful of accidents
+    look impossible.
+    """
+    groups, first, counts = dense_counts(table, group_keys, period)
+    if counts.shape[1] <= window:
+        empty = counts[:, :0]
+        return _spikes(groups, first, empty, empty, empty, empty, group_keys, period, threshold, alpha)
+    before = rolling_baseline(counts, window)
+    after = [np.flip(values, axis=1) for values in rolling_baseline(np.flip(counts, axis=1), window)]
+    median, mad, mean = (np.fmax(b, a) for b, a in zip(before, after))
+    expected = np.fmax(np.fmax(median, mean), np.minimum(counts.mean(axis=1, keepdims=True), 1))
+    expected[np.isnan(median)] = np.nan
+    return _spikes(groups, first, counts, median, mad, expected, group_keys, period, threshold, alpha)
+
+
+def daily_anomalies(daily, window=DAY_WINDOW, threshold=THRESHOLD, alpha=ALPHA):
+    """
+    Days with unusually many accidents compared with the same weekday in the window days around them.
+
+    Each weekday is its own weekly series, so a busy Friday is compared with
+    the surrounding Fridays rather than with the quieter weekend.
+    """
+    # Week and weekday as in week_ordinal(): weeks start on Monday, 1970-01-01 was a Thursday
+    days = daily['Date'].to_numpy().astype('datetime64[D]').astype('int64') + 3
+    table = daily.assign(Weekday=days % 7, Week=days // 7)
+    spikes = rolling_anomalies(table, ['Weekday'], 'Week', window // 7, threshold, alpha)
+    dates = spikes.pop('Week').to_numpy() * 7 + spikes.pop('Weekday').to_numpy() - 3
+    spikes.insert(0, 'Date', pd.to_datetime(dates, unit='D'))
+    return spikes
+
+
+def borough_hour_anomalies(borough_hour_week, window=WEEK_WINDOW, threshold=THRESHOLD, alpha=ALPHA):
+    """Borough x Hour weeks with unusually many accidents for that borough at that hour."""
+    return rolling_anomalies(borough_hour_week, ['Borough', 'Hour'], 'Week', window, threshold, alpha)
+
+
+def street_week_anomalies(street_week, streets=STREETS, window=WEEK_WINDOW, threshold=THRESHOLD, alpha=ALPHA):
+    """
+    Street-weeks with unusually many accidents for the street.
+
+    Only the streets with the most accidents are scored: quiet streets have too
+    few accidents per week for a weekly baseline.
+    """
+    totals = street_week.groupby('Street Name', observed=True)[COUNT_NAME].sum()
+    busiest = totals.nlargest(streets).index
+    table = street_week[street_week['Street Name'].isin(busiest)]
+    spikes = rolling_anomalies(table.astype({'Street Name': str}), ['Street Name'], 'Week', window, threshold, alpha)
+    # Fewer streets than asked for when street_week only covers the top streets
+    spikes.attrs['streets'] = len(busiest)
+    return spikes
+
+
+def seasonal_anomalies(monthly_year, threshold=THRESHOLD):
+    """
+    Months of the Year x Month series that stray from the seasonal expectation.
+
+    The expected count of a month is its year's level times the month-of-year
+    factor (the median over years of the month's count relative to its year's
+    mean); residuals are scored against their median/MAD, as robust_score()
+    does for the rolling baselines. Both spikes and
+    drops are returned, with the signed Score.
+    """
+    counts = monthly_year.pivot(index='Year', columns='Month', values=COUNT_NAME).astype('float64')
+    values = counts.to_numpy()
+    # Partial first/last years have missing months; they are left out of the means and medians
+    level = np.nanmean(values, axis=1, keepdims=True)
+    season = np.nanmedian(values / level, axis=0, keepdims=True)
+    level = np.nanmean(values / season, axis=1, keepdims=True)
+    expected = level * season
+    residual = values - expected
+    center = np.nanmedian(residual)
+    mad = np.nanmedian(np.abs(residual - center))
+    # Same spread floor as robust_score(): the Poisson noise of the expected count
+    score = (residual - center) / np.maximum(_MAD_SCALE * mad, np.sqrt(np.maximum(expected, 1)))
+
+    rows, cols = np.nonzero(np.abs(np.nan_to_num(score)) > threshold)
+    table = pd.DataFrame({'Year': counts.index.to_numpy()[rows], 'Month': counts.columns.to_numpy()[cols],
+                          COUNT_NAME: values[rows, cols].astype('int64'),
+                          'Expected': expected[rows, cols].round(1), 'Score': score[rows, cols].round(2)})
+    order = np.argsort(-np.abs(table['Score'].to_numpy()), kind='stable')
+    return table.iloc[order].reset_index(drop=True)
+
+
+def detect(results, threshold=THRESHOLD, alpha=ALPHA):
+    """Run every detector whose input table is in results and return {name: flagged periods}."""
+    detectors = {
+        'daily': lambda: daily_anomalies(results['daily'], threshold=threshold, alpha=alpha),
+        'borough_hour_week': lambda: borough_hour_anomalies(results['borough_hour_week'], threshold=threshold,
+                                                            alpha=alpha),
+        'street_week': lambda: street_week_anomalies(results['street_week'], threshold=threshold, alpha=alpha),
+        'monthly_year': lambda: seasonal_anomalies(results['monthly_year'], threshold=threshold),
+    }
+    anomalies = {}
+    for name, detect_one in detectors.items():
+        if name in results:
+            with stage(f'anomalies:{name}', rows_in=len(results[name])) as step:
+                anomalies[name] = detect_one()
+                step.rows_out = len(anomalies[name])
+    return anomalies
+
+
+def report_anomalies(anomalies, n=10):
+    """Print the n strongest anomalies of each detector."""
+    titles = {
+        'daily': "Days with accident spikes (vs. the same weekday in the 4 weeks either side):",
+        'borough_hour_week': "Borough x Hour weeks with accident spikes (vs. the 8 weeks either side):",
+        'street_week': "Street-weeks with accident spikes ({streets} busiest streets, vs. the 8 weeks either side):",
+        'monthly_year': "Months deviating from the seasonal pattern:",
+    }
+    for name, table in anomalies.items():
+        print(titles[name].format(**table.attrs))
+        if table.empty:
+            print("  none")
+            continue
+        table = table.head(n).copy()
+        if 'Week' in table:
+            table['Week'] = week_start(table['Week']).strftime('%Y-%m-%d')
+        print(table.to_string(index=False))
+        print(f"  ({len(anomalies[name])} flagged)")
+
+
+if __name__ == '__main__':
+    import time
+
+    from aggregate import aggregate_csv
+
+    specs = [spec for spec in OBJECTIVE_SPECS if spec.name in ANOMALY_TABLES]
+    results = aggregate_csv(sys.argv[1] if len(sys.argv) > 1 else None, specs)
+    start = time.perf_counter()
+    anomalies = detect(results)
+    elapsed = time.perf_counter() - start
+    report_anomalies(anomalies)
+    print(f"Scored {sum(len(results[name]) for name in anomalies)} aggregate rows in {elapsed:.3f} s")
@@ -0,0 +1,208 @@
+"""
+Benchmark the analysis pipeline on synthetic data at several scales.
+
+For each row count a synthetic CSV is generated once (synthetic.py) and then
+a fresh interpreter times every stage with the profiling.stage() hooks:
+reading the CSV, cleaning it (Date/Time parsing, filling, casting), deriving
+the objective columns, each OBJECTIVE_SPECS groupby and drawing and saving
+each figure. Each stage records wall time, CPU time, its own peak RSS and the
+rows it saw. Runs are appended to a JSON history, and every stage is compared
+with the previous run at the same scale; a stage slower than --threshold
+makes the command exit with status 1. A stage that fails (say, one figure
+cannot be drawn) is recorded with its error and the remaining scales still
+run; any failure also makes the command exit with status 1.
+
+    python benchmark.py --rows 1e6,10e6,50e6
+    python benchmark.py --rows 1e6 --no-render --history bench.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import traceback
+
+# Default scales and the allowed slowdown before a stage counts as a regression
+SCALES = (1_000_000, 10_000_000, 50_000_000)
+THRESHOLD = 0.20
+
+# Where synthetic CSVs are kept between runs, and the history file
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'nyc-collisions-bench')
+HISTORY = 'benchmark_history.json'
+
+
+def measure(path, render=True):
+    """
+    Time every pipeline stage on the CSV at path in this process and return the stage records.
+
+    An exception ends the run but not the measurement: its traceback goes to
+    stderr and the stages it interrupted carry the error in their records.
+    """
+    import profiling
+    from aggregate import OBJECTIVE_SPECS, add_objective_columns, aggregate
+    from collisions import clean, read_raw, street_names
+    from profiling import stage
+
+    profiling.enable()
+    try:
+        with stage('read') as step:
+            raw = read_raw(path)
+            step.rows_out = len(raw)
+        with stage('clean', rows_in=len(raw)) as step:
+            df = clean(raw, street_names(path))
+            step.rows_out = len(df)
+        del raw
+        with stage('objective_columns', rows_in=len(df)):
+            df = add_objective_columns(df)
+        results = aggregate(df, OBJECTIVE_SPECS)
+
+        if render:
+            from render import figure_specs, render_all
+
+            with tempfile.TemporaryDirectory() as output_dir:
+                render_all(figure_specs(results), output_dir, cache_dir=False)
+    except Exception:
+        traceback.print_exc(file=sys.stderr)
+
+    records = sorted(profiling.disable().records, key=lambda r: r['start_us'])
+    for record in records:
+        name = '  ' * record['depth'] + record['stage']
+        failed = f"  FAILED: {record['error']}" if 'error' in record else ''
+        print(f"  {name:<48}{record['wall_s']:>9.3f} s{record['peak_rss_mb'] or 0:>10.1f} MB{failed}",
+              file=sys.stderr)
+    return records
+
+
+def synthetic_csv(rows, data_dir=DATA_DIR, seed=0):
+    """Return the path of the synthetic CSV with rows collisions, generating it if missing."""
+    from synthetic import write_csv
+
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic_{rows}_seed{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows} synthetic rows into {path} ...", file=sys.stderr)
+        write_csv(path + '.tmp', rows, seed)
+        os.replace(path + '.tmp', path)
+    return path
+
+
+def run_scale(rows, data_dir=DATA_DIR, render=True):
+    """
+    Benchmark one scale in a fresh interpreter so peak memory is not inherited from earlier scales.
+
+    'failed' lists the stages that raised, with their errors; a child that
+    dies without reporting its stages is recorded as a failed 'measure' stage.
+    """
+    path = synthetic_csv(rows, data_dir)
+    print(f"{rows} rows:", file=sys.stderr)
+    command = [sys.executable, os.path.abspath(__file__), '--measure', path]
+    if not render:
+        command.append('--no-render')
+    child = subprocess.run(command, stdout=subprocess.PIPE, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    try:
+        stages = json.loads(child.stdout)
+    except ValueError:
+        stages = [{'stage': 'measure', 'wall_s': 0.0, 'peak_rss_mb': None, 'depth': 0,
+                   'error': f"benchmark process exited with status {child.returncode}"}]
+    return {'rows': rows, 'total_wall_s': round(sum(s['wall_s'] for s in stages if s['depth'] == 0), 4),
+            'peak_rss_mb': max((s['peak_rss_mb'] or 0) for s in stages),
+            'failed': [(s['stage'], s['error']) for s in stages if 'error' in s], 'stages': stages}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_history(path=HISTORY):
+    try:
+        with open(path) as fh:
+            return json.load(fh)
+    except FileNotFoundError:
+        return []
+
+
+def save_history(history, path=HISTORY):
+    with open(path + '.tmp', 'w') as fh:
+        json.dump(history, fh, indent=1)
+    os.replace(path + '.tmp', path)
+
+
+def regressions(run, history, threshold=THRESHOLD):
+    """Return (rows, stage, previous_s, current_s) for stages slower than the last run at the same scale."""
+    found = []
+    for scale in run['scales']:
+        previous = next((s for past in reversed(history) for s in past['scales'] if s['rows'] == scale['rows']),
+                        None)
+        if previous is None:
+            continue
+        # Failed stages stopped early, so their timings are not compared
+        before = {s['stage']: s['wall_s'] for s in previous['stages'] if 'error' not in s}
+        for stage in scale['stages']:
+            if 'error' in stage:
+                continue
+            old = before.get(stage['stage'])
+            # Ignore sub-10 ms stages, whose timings are mostly noise
+            if old and max(old, stage['wall_s']) >= 0.01 and stage['wall_s'] > old * (1 + threshold):
+                found.append((scale['rows'], stage['stage'], old, stage['wall_s']))
+    return found
+
+
+def benchmark(scales=SCALES, history_path=HISTORY, data_dir=DATA_DIR, render=True, threshold=THRESHOLD):
+    """Run every scale, append the run to the history and return (run, regressions)."""
+    import numpy as np
+    import pandas as pd
+
+    run = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scales': [run_scale(rows, data_dir, render) for rows in scales],
+    }
+    history = load_history(history_path)
+    found = regressions(run, history, threshold)
+    save_history(history + [run], history_path)
+    return run, found
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic data.")
+    parser.add_argument('--rows', default=','.join(map(str, SCALES)),
+                        help="comma-separated row counts, e.g. 1e6,10e6 (default: %(default)s)")
+    parser.add_argument('--history', default=HISTORY, help="JSON history file (default: %(default)s)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="where synthetic CSVs are kept (default: %(default)s)")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="slowdown per stage reported as a regression (default: %(default)s)")
+    parser.add_argument('--no-render', action='store_true', help="skip the rendering stage")
+    parser.add_argument('--measure', metavar='CSV', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        # Child process started by run_scale(): stdout carries only the JSON stage records
+        with contextlib.redirect_stdout(sys.stderr):
+            records = measure(args.measure, render=not args.no_render)
+        print(json.dumps(records))
+        sys.exit(0)
+
+    scales = [int(float(rows)) for rows in args.rows.split(',')]
+    run, found = benchmark(scales, args.history, args.data_dir, not args.no_render, args.threshold)
+    for scale in run['scales']:
+        print(f"{scale['rows']:>11} rows: {scale['total_wall_s']:8.2f} s, peak {scale['peak_rss_mb']:.0f} MB")
+    for rows, stage, old, new in found:
+        print(f"REGRESSION at {rows} rows: {stage} took {new:.3f} s (was {old:.3f} s)")
+    failed = [(scale['rows'], stage, error) for scale in run['scales'] for stage, error in scale['failed']]
+    for rows, stage, error in failed:
+        print(f"FAILED at {rows} rows: {stage}: {error}")
+    sys.exit(1 if found or failed else 0)
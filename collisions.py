@@ -0,0 +1,394 @@
+"""
+Shared loading and cleaning for the NYC collisions dataset.
+
+The raw CSV is parsed and cleaned once and the result is written to a Feather
+(Arrow IPC) cache next to it. The cache is keyed by the size, modification time
+and a content hash of the source file, so later runs memory-map the cleaned
+columns instead of re-parsing the CSV.
+"""
+
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+from streets import REGISTRY_NAME, STREET_RULES_VERSION, StreetNames
+
+# Location of the raw dataset; override with the NYC_COLLISIONS_CSV environment variable
+CSV_PATH = os.environ.get(
+    "NYC_COLLISIONS_CSV",
+    r"D:\unishitz\4thsem\int375\EDA-Project\NYC_Collisions\NYC_Collisions.csv",
+)
+
+# Cleaned caches live here unless NYC_COLLISIONS_CACHE points somewhere else
+CACHE_DIR = os.environ.get("NYC_COLLISIONS_CACHE")
+
+TEXT_COLS = ['Borough', 'Street Name', 'Cross Street', 'Contributing Factor', 'Vehicle Type']
+COUNT_COLS = ['Persons Injured', 'Persons Killed',
+              'Pedestrians Injured', 'Pedestrians Killed',
+              'Cyclists Injured', 'Cyclists Killed',
+              'Motorists Injured', 'Motorists Killed']
+DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Known formats of the raw 'Date' and 'Time' columns; values that do not match
+# are retried with format inference before being counted as invalid
+DATE_FORMAT = '%Y-%m-%d'
+TIME_FORMAT = '%H:%M:%S'
+
+# Explicit load-time schema: dictionary-encoded strings and float32 coordinates.
+# Date and Time are read as categoricals so each distinct value is parsed once.
+CSV_DTYPES = dict.fromkeys(TEXT_COLS + ['Date', 'Time'], 'category')
+CSV_DTYPES.update({'Latitude': 'float32', 'Longitude': 'float32'})
+
+# Per-collision casualty counts fit comfortably in small unsigned integers
+COUNT_DTYPES = {'Persons Injured': 'uint16', 'Persons Killed': 'uint8',
+                'Pedestrians Injured': 'uint8', 'Pedestrians Killed': 'uint8',
+                'Cyclists Injured': 'uint8', 'Cyclists Killed': 'uint8',
+                'Motorists Injured': 'uint16', 'Motorists Killed': 'uint8'}
+
+# Derived calendar columns
+FEATURE_DTYPES = {'Hour': 'uint8', 'Month': 'uint8', 'Year': 'uint16'}
+
+# Per-row 'Severity' code (uint8): the low two bits hold the severity class and
+# one bit per road-user group marks the groups with a casualty at that severity
+# (killed in a fatal collision, injured in an injury collision)
+SEVERITY_NONE, SEVERITY_INJURY, SEVERITY_FATAL = 0, 1, 2
+SEVERITY_CLASSES = ['none', 'injury', 'fatal']
+SEVERITY_CLASS_MASK = 0b11
+ROAD_USER_BITS = {'Pedestrians': 4, 'Cyclists': 8, 'Motorists': 16}
+
+# Canonical spellings of the common vehicle types. The raw 'Vehicle Type' column
+# mixes case, punctuation and abbreviations, so values are matched on a key of
+# their lower-cased words; VEHICLE_ALIASES maps further keys to a label, and
+# other values become the title-cased key.
+VEHICLE_LABELS = ['Sedan', 'Station Wagon/Sport Utility Vehicle', 'Taxi', 'Pick-up Truck', 'Box Truck', 'Bus',
+                  'Bike', 'Tractor Truck Diesel', 'Tractor Truck Gasoline', 'Motorcycle', 'Van', 'E-Bike',
+                  'E-Scooter', 'Ambulance', 'Dump', 'Convertible', 'Moped', 'Garbage or Refuse', 'Flat Bed',
+                  'Carry All', 'Tow Truck / Wrecker', 'Chassis Cab', 'Motorscooter', 'Tanker', 'Fire Truck',
+                  'Concrete Mixer', 'Armored Truck', 'Unknown']
+VEHICLE_ALIASES = {
+    'sport utility station wagon': 'Station Wagon/Sport Utility Vehicle',
+    'suv': 'Station Wagon/Sport Utility Vehicle',
+    '4 dr sedan': 'Sedan', '2 dr sedan': 'Sedan', '3 door': 'Sedan', 'passenger vehicle': 'Sedan',
+    'bicycle': 'Bike', 'pick up': 'Pick-up Truck', 'pickup truck': 'Pick-up Truck',
+    'yellow taxi': 'Taxi', 'taxi cab': 'Taxi', 'ambul': 'Ambulance', 'firetruck': 'Fire Truck',
+    'fire': 'Fire Truck', 'box t': 'Box Truck', 'e bik': 'E-Bike', 'e sco': 'E-Scooter',
+    'motorbike': 'Motorcycle', 'garbage truck': 'Garbage or Refuse', 'unk': 'Unknown', 'nan': 'Unknown',
+}
+
+# Bump whenever clean() or the schema changes so stale caches are rebuilt; the cache
+# name also carries streets.STREET_RULES_VERSION, as street codes follow those rules
+CACHE_VERSION = 6
+
+# Bytes read from each end of the source file for the content hash
+_HASH_BLOCK = 1 << 20
+
+# Street-name registries of this process by cache directory; see street_names()
+_street_names = {}
+
+
+def source_fingerprint(path):
+    """Return a hex key built from the file's size, mtime and a hash of its first and last MiB."""
+    stat = os.stat(path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as fh:
+        digest.update(fh.read(_HASH_BLOCK))
+        if stat.st_size > _HASH_BLOCK:
+            fh.seek(max(stat.st_size - _HASH_BLOCK, _HASH_BLOCK))
+            digest.update(fh.read(_HASH_BLOCK))
+    return digest.hexdigest()[:16]
+
+
+def _parse_distinct(series, parse):
+    """Parse each distinct value of series once; return the parsed values and each row's code into them."""
+    values = series.astype('category')
+    return parse(values.cat.categories.astype(str)), values.cat.codes.to_numpy()
+
+
+def _parse_dates(values):
+    dates = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    retry = dates.isna()
+    if retry.any():
+        dates = dates.where(~retry, pd.to_datetime(values.where(retry), format='mixed', errors='coerce'))
+    return pd.DatetimeIndex(dates).normalize()
+
+
+def _parse_times(values):
+    times = pd.to_datetime(values, format=TIME_FORMAT, errors='coerce')
+    retry = times.isna()
+    if retry.any():
+        times = times.where(~retry, pd.to_datetime(values.where(retry), format='mixed', errors='coerce'))
+    times = pd.DatetimeIndex(times)
+    return times - times.normalize()
+
+
+def parse_timestamps(df):
+    """
+    Parse 'Date' and 'Time' into one 'Timestamp' column plus small-int calendar features.
+
+    Every distinct date and time string is parsed once with the fixed format and
+    the results are broadcast to the rows through their category codes. Rows
+    with an unparseable Date or Time are dropped and counted in
+    df.attrs['dropped_rows'].
+    """
+    dates, date_codes = _parse_distinct(df['Date'], _parse_dates)
+    times, time_codes = _parse_distinct(df['Time'], _parse_times)
+
+    # A code of -1 (missing value) or an unparseable distinct value marks a bad row
+    bad_date = (date_codes < 0) | np.asarray(dates.isna())[date_codes]
+    bad_time = ~bad_date & ((time_codes < 0) | np.asarray(times.isna())[time_codes])
+    keep = ~(bad_date | bad_time)
+    df = df[keep].copy()
+    date_codes, time_codes = date_codes[keep], time_codes[keep]
+
+    df['Date'] = dates.take(date_codes)
+    df['Timestamp'] = df['Date'] + times.take(time_codes)
+
+    # Calendar features computed on the distinct dates/times, then taken per row
+    df['Hour'] = times.components.hours.to_numpy().take(time_codes).astype(FEATURE_DTYPES['Hour'])
+    df['Month'] = dates.month.to_numpy().take(date_codes).astype(FEATURE_DTYPES['Month'])
+    df['Year'] = dates.year.to_numpy().take(date_codes).astype(FEATURE_DTYPES['Year'])
+    df['DayOfWeek'] = pd.Categorical.from_codes(dates.dayofweek.to_numpy().take(date_codes).astype('int8'),
+                                                categories=DAY_ORDER, ordered=True)
+
+    df.attrs['dropped_rows'] = {'Date': int(bad_date.sum()), 'Time': int(bad_time.sum())}
+    return df
+
+
+def _vehicle_key(text):
+    return ' '.join(re.findall(r'[a-z0-9]+', text.casefold()))
+
+
+def canonical_vehicle_types(series):
+    """
+    Map every spelling of a vehicle type to its canonical label, as a categorical.
+
+    Only the distinct values are normalized; the rows are re-coded with one
+    take() over their category codes.
+    """
+    values = series.astype('category')
+    labels = {_vehicle_key(label): label for label in VEHICLE_LABELS}
+    labels.update(VEHICLE_ALIASES)
+    keys = [_vehicle_key(value) for value in values.cat.categories.astype(str)]
+    canonical = [labels.get(key) or key.title() or 'Unknown' for key in keys]
+    categories, positions = np.unique(np.asarray(canonical, dtype=object), return_inverse=True)
+    codes = values.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, positions.take(codes.clip(0)), -1)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def street_names(path=None, cache_dir=None):
+    """
+    The StreetNames registry of the dataset at path, loaded from its cache directory on first use.
+
+    Datasets sharing a cache directory share one registry per process. The
+    loaders pass it to clean(), which interns 'Street Name' and 'Cross Street'
+    through it, and save it afterwards, so later runs only normalize new spellings.
+    """
+    folder = os.path.abspath(cache_location(path or CSV_PATH, cache_dir)[0])
+    if folder not in _street_names:
+        _street_names[folder] = StreetNames.load(os.path.join(folder, REGISTRY_NAME))
+    return _street_names[folder]
+
+
+def save_street_names(path=None, cache_dir=None):
+    """Persist new entries of the dataset's street-name registry; a read-only cache directory is not an error."""
+    try:
+        street_names(path, cache_dir).save()
+    except OSError:
+        pass
+
+
+def severity_codes(df):
+    """
+    Return the 'Severity' code of every row as uint8 (see SEVERITY_CLASSES and ROAD_USER_BITS).
+
+    A collision is fatal if anyone was killed and an injury collision if anyone
+    was injured; 'Persons Killed'/'Persons Injured' are the totals of the
+    three groups, so either side being non-zero counts.
+    """
+    killed = df['Persons Killed'].to_numpy() > 0
+    injured = df['Persons Injured'].to_numpy() > 0
+    killed_bits = np.zeros(len(df), dtype='uint8')
+    injured_bits = np.zeros(len(df), dtype='uint8')
+    for group, bit in ROAD_USER_BITS.items():
+        group_killed = df[f'{group} Killed'].to_numpy() > 0
+        group_injured = df[f'{group} Injured'].to_numpy() > 0
+        killed_bits |= np.where(group_killed, bit, 0).astype('uint8')
+        injured_bits |= np.where(group_injured, bit, 0).astype('uint8')
+        killed |= group_killed
+        injured |= group_injured
+    return np.where(killed, SEVERITY_FATAL | killed_bits,
+                    np.where(injured, SEVERITY_INJURY | injured_bits, SEVERITY_NONE)).astype('uint8')
+
+
+def report_dropped(dropped):
+    """Print how many rows were dropped for an unparseable Date or Time."""
+    if any(dropped.values()):
+        print(f"Dropped {dropped['Date']} rows with an invalid Date and {dropped['Time']} with an invalid Time.")
+
+
+def clean(df, streets=None):
+    """
+    Apply the cleaning shared by every objective and return the cleaned frame.
+
+    streets is the StreetNames registry that street names are interned in
+    (default: that of CSV_PATH, see street_names()).
+    """
+    # Parse Date/Time into Timestamp, Hour, Month, Year and DayOfWeek; invalid rows are dropped and counted
+    with stage('parse_timestamps', rows_in=len(df)) as step:
+        df = parse_timestamps(df)
+        step.rows_out = len(df)
+        step.args['dropped_rows'] = df.attrs['dropped_rows']
+
+    # Fill missing location/factor values with 'Unknown', keeping them dictionary-encoded
+    with stage('fillna', rows_in=len(df)):
+        for col in TEXT_COLS:
+            values = df[col].astype('category')
+            if 'Unknown' not in values.cat.categories:
+                values = values.cat.add_categories('Unknown')
+            df[col] = values.fillna('Unknown')
+
+    # One spelling per street, coded by interned street ID so hotspots are not split by variants
+    with stage('street_names', rows_in=len(df)):
+        registry = streets or street_names()
+        for col in ['Street Name', 'Cross Street']:
+            df[col] = registry.encode(df[col])
+
+    # One spelling per vehicle type, so contingency tables are not split by variants
+    with stage('vehicle_types', rows_in=len(df)):
+        df['Vehicle Type'] = canonical_vehicle_types(df['Vehicle Type'])
+
+    # Ensure casualty columns are numeric; convert, fill NaN with 0 and narrow
+    with stage('cast_numeric', rows_in=len(df)):
+        for col, dtype in COUNT_DTYPES.items():
+            values = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[col] = values.clip(0, np.iinfo(dtype).max).astype(dtype)
+
+        for col in ['Latitude', 'Longitude']:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+
+    # Severity class and road-user groups, coded once so later stages never re-derive them
+    with stage('severity', rows_in=len(df)):
+        df['Severity'] = severity_codes(df)
+
+    dropped = df.attrs['dropped_rows']
+    df = df.reset_index(drop=True)
+    df.attrs['dropped_rows'] = dropped
+    return df
+
+
+def read_raw(path, **kwargs):
+    """Read the raw CSV with the explicit load-time schema."""
+    return pd.read_csv(path, dtype=CSV_DTYPES, **kwargs)
+
+
+def iter_collisions(path=None, chunksize=500_000):
+    """
+    Yield the cleaned dataset in chunks of at most chunksize raw rows.
+
+    Memory stays bounded by the chunk size, so this works on CSVs larger than
+    RAM; the cache is neither read nor written.
+    """
+    registry = street_names(path)
+    with read_raw(path or CSV_PATH, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield clean(chunk, registry)
+    save_street_names(path)
+
+
+def memory_report(df):
+    """
+    Print per-column memory of df next to what pandas' default dtypes would use.
+
+    The default footprint assumes object strings for categoricals and 8-byte
+    numbers for everything else; columns are measured one at a time.
+    """
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            default = series.astype(object).memory_usage(deep=True, index=False)
+        else:
+            default = 8 * len(series)
+        rows.append((col, str(series.dtype), default, series.memory_usage(deep=True, index=False)))
+
+    report = pd.DataFrame(rows, columns=['Column', 'Dtype', 'Default_MB', 'Compact_MB']).set_index('Column')
+    report[['Default_MB', 'Compact_MB']] /= 1 << 20
+    print("Memory usage before (default dtypes) and after (compact schema):")
+    print(report.round(2))
+    before, after = report['Default_MB'].sum(), report['Compact_MB'].sum()
+    print(f"Total: {before:.1f} MB -> {after:.1f} MB ({after / before:.0%} of default)")
+    return report
+
+
+def cache_location(path, cache_dir=None):
+    """Return the cache directory for the dataset at path and the file stem used to name its caches."""
+    cache_dir = cache_dir or CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+    return cache_dir, os.path.splitext(os.path.basename(path))[0]
+
+
+def _cache_path(path, cache_dir):
+    cache_dir, stem = cache_location(path, cache_dir)
+    return cache_dir, stem, os.path.join(cache_dir, f"{stem}.{source_fingerprint(path)}.v{CACHE_VERSION}.r{STREET_RULES_VERSION}.feather")
+
+
+def load_collisions(path=None, cache_dir=None, refresh=False, report=False):
+    """
+    Load the cleaned collisions frame, building the Feather cache on first use.
+
+    Pass refresh=True to ignore an existing cache and re-parse the CSV, and
+    report=True to print a memory report of the loaded frame.
+    Without pyarrow installed the CSV is parsed and cleaned on every call.
+    """
+    with stage('load') as step:
+        df = _load(path or CSV_PATH, cache_dir, refresh)
+        step.rows_out = len(df)
+    report_dropped(df.attrs.get('dropped_rows', {}))
+    if report:
+        memory_report(df)
+    return df
+
+
+def _load(path, cache_dir, refresh):
+    registry = street_names(path, cache_dir)
+    try:
+        from pyarrow import feather
+    except ImportError:
+        df = clean(_read_csv(path), registry)
+        save_street_names(path, cache_dir)
+        return df
+
+    cache_dir, stem, cache_file = _cache_path(path, cache_dir)
+    if os.path.exists(cache_file) and not refresh:
+        # Uncompressed Feather can be memory-mapped, so numeric columns are not copied
+        with stage('read_cache') as step:
+            table = feather.read_table(cache_file, memory_map=True)
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            step.rows_out = len(df)
+        return df
+
+    df = clean(_read_csv(path), registry)
+    save_street_names(path, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    # Remove caches built from older versions of the source file
+    for name in os.listdir(cache_dir):
+        if name.startswith(stem + '.') and name.endswith('.feather'):
+            os.remove(os.path.join(cache_dir, name))
+
+    with stage('write_cache', rows_in=len(df)):
+        tmp_file = cache_file + '.tmp'
+        feather.write_feather(df, tmp_file, compression='uncompressed')
+        os.replace(tmp_file, cache_file)
+    return df
+
+
+def _read_csv(path):
+    with stage('read_csv') as step:
+        df = read_raw(path)
+        step.rows_out = len(df)
+    return df
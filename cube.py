@@ -0,0 +1,223 @@
+"""
+Pre-aggregated cube over the low-cardinality dimensions of the dataset.
+
+Accident counts, fatal-accident counts and the casualty sums are aggregated
+once per occupied Year x Month x DayOfWeek x Hour x Borough x Contributing
+Factor cell. The cube is stored sparsely: one small integer coordinate array
+per dimension plus one array per measure, so slicing is a mask over the
+occupied cells and rolling up to any subset of dimensions is a bincount over
+them, independent of the number of collisions. It is saved as an .npz next to
+the Feather cache and rebuilt when the source CSV changes.
+
+    python cube.py [--input NYC_Collisions.csv] [--refresh]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME, AggSpec, add_objective_columns, aggregate
+from collisions import COUNT_COLS, CSV_PATH, DAY_ORDER, cache_location, load_collisions, source_fingerprint
+
+CUBE_DIMS = ['Year', 'Month', 'DayOfWeek', 'Hour', 'Borough', 'Contributing Factor']
+CUBE_MEASURES = [COUNT_NAME, 'Fatal Accidents'] + COUNT_COLS
+
+# Bump whenever the dimensions, measures or file layout change
+CUBE_VERSION = 1
+
+# Aggregate tables of OBJECTIVE_SPECS that can be answered from the cube
+CUBE_TABLES = ['monthly', 'monthly_year', 'day', 'hour', 'day_hour', 'factors', 'fatal_factors', 'casualties']
+
+# Rollups over more cells than this number only the occupied groups
+_DENSE_LIMIT = 1 << 22
+
+
+class Cube:
+    """
+    Sparse cube: labels per dimension, the coordinates of each occupied cell and the measures of each cell.
+
+    labels maps each dimension to the pandas Index of its values, coords maps it
+    to each cell's position in that index, and measures maps each measure name
+    to an int64 array aligned with the cells. The objective cube has CUBE_DIMS
+    and CUBE_MEASURES; other cubes (see severity.py) pick their own.
+    """
+
+    def __init__(self, labels, coords, measures):
+        self.labels = labels
+        self.coords = coords
+        self.measures = measures
+
+    @property
+    def dims(self):
+        return list(self.labels)
+
+    def __len__(self):
+        return len(self.measures[COUNT_NAME])
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the cube from a cleaned frame with the objective columns added."""
+        frame = pd.DataFrame({col: df[col] for col in CUBE_DIMS + COUNT_COLS})
+        frame['Fatal Accidents'] = (df['Total Fatalities'].to_numpy() > 0).astype('uint8')
+        spec = AggSpec('cube', CUBE_DIMS, values=['Fatal Accidents'] + COUNT_COLS)
+        return cls.from_table(aggregate(frame, [spec])['cube'], CUBE_DIMS)
+
+    @classmethod
+    def from_table(cls, table, dims):
+        """Build a cube from a finalize()-style table: the dims columns plus one column per measure."""
+        labels, coords = {}, {}
+        for dim in dims:
+            codes, uniques = pd.factorize(table[dim], sort=True)
+            labels[dim] = pd.Index(uniques, name=dim)
+            coords[dim] = codes.astype(np.min_scalar_type(max(len(uniques) - 1, 0)))
+        measures = {name: table[name].to_numpy(dtype='int64') for name in table.columns if name not in dims}
+        return cls(labels, coords, measures)
+
+    def slice(self, filters):
+        """
+        Return the sub-cube of cells matching filters, {dimension: value or list of values}.
+
+        Values missing from a dimension simply match nothing.
+        """
+        keep = np.ones(len(self), dtype=bool)
+        for dim, values in filters.items():
+            if np.ndim(values) == 0:
+                values = [values]
+            positions = self.labels[dim].get_indexer(pd.Index(values, dtype=self.labels[dim].dtype))
+            keep &= np.isin(self.coords[dim], positions[positions >= 0])
+        return Cube(self.labels,
+                    {dim: codes[keep] for dim, codes in self.coords.items()},
+                    {name: values[keep] for name, values in self.measures.items()})
+
+    def rollup(self, dims=(), measures=None):
+        """
+        Sum the measures over every dimension not in dims.
+
+        Returns a flat frame with one row per non-empty group, sorted by dims,
+        in the same layout as aggregate.finalize().
+        """
+        dims = list(dims)
+        measures = list(measures or self.measures)
+        if not dims:
+            return pd.DataFrame({name: [int(self.measures[name].sum())] for name in measures})
+        sizes = [len(self.labels[dim]) for dim in dims]
+        group = np.ravel_multi_index([self.coords[dim] for dim in dims], sizes)
+
+        space = int(np.prod(sizes))
+        if space <= _DENSE_LIMIT:
+            slot, ids = group, np.arange(space)
+        else:
+            ids, slot = np.unique(group, return_inverse=True)
+        counts = np.bincount(slot, weights=self.measures[COUNT_NAME], minlength=len(ids))
+        present = np.flatnonzero(counts)
+
+        table = {}
+        for dim, level in zip(dims, np.unravel_index(ids[present], sizes)):
+            table[dim] = self.labels[dim].take(level)
+        for name in measures:
+            sums = np.bincount(slot, weights=self.measures[name], minlength=len(ids))
+            table[name] = np.rint(sums[present]).astype('int64')
+        return pd.DataFrame(table)
+
+    def results(self, names=CUBE_TABLES):
+        """Return the named OBJECTIVE_SPECS tables computed from the cube, as aggregate() would."""
+        builders = {
+            'monthly': lambda: self.rollup(['Month'], [COUNT_NAME]),
+            'monthly_year': lambda: self.rollup(['Year', 'Month'], [COUNT_NAME]),
+            'day': lambda: self.rollup(['DayOfWeek'], [COUNT_NAME]),
+            'hour': lambda: self.rollup(['Hour'], [COUNT_NAME]),
+            'day_hour': lambda: self.rollup(['DayOfWeek', 'Hour'], [COUNT_NAME]),
+            'factors': lambda: self.rollup(['Contributing Factor'], [COUNT_NAME]),
+            'fatal_factors': self._fatal_factors,
+            'casualties': lambda: self.rollup([], [COUNT_NAME] + COUNT_COLS),
+        }
+        return {name: builders[name]() for name in names}
+
+    def _fatal_factors(self):
+        table = self.rollup(['Contributing Factor'], ['Fatal Accidents'])
+        table = table[table['Fatal Accidents'] > 0].reset_index(drop=True)
+        return table.rename(columns={'Fatal Accidents': COUNT_NAME})
+
+    def save(self, file):
+        """Write the cube to an uncompressed .npz file."""
+        arrays = {}
+        for dim in self.dims:
+            labels = self.labels[dim]
+            # Text labels are stored as fixed-width unicode so the file loads without pickle
+            numeric = pd.api.types.is_numeric_dtype(labels.dtype)
+            arrays[f'labels:{dim}'] = labels.to_numpy() if numeric else np.asarray(labels.astype(str), dtype=str)
+            arrays[f'coords:{dim}'] = self.coords[dim]
+        for name, values in self.measures.items():
+            arrays[f'measures:{name}'] = values
+        with open(file, 'wb') as fh:
+            np.savez(fh, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        """Read a cube written by save()."""
+        with np.load(file) as data:
+            dims = [key.split(':', 1)[1] for key in data.files if key.startswith('labels:')]
+            labels = {}
+            for dim in dims:
+                values = data[f'labels:{dim}']
+                if dim == 'DayOfWeek':
+                    labels[dim] = pd.CategoricalIndex(values, categories=DAY_ORDER, ordered=True, name=dim)
+                else:
+                    labels[dim] = pd.Index(values.astype(object) if values.dtype.kind == 'U' else values, name=dim)
+            coords = {dim: data[f'coords:{dim}'] for dim in dims}
+            measures = {key.split(':', 1)[1]: data[key] for key in data.files if key.startswith('measures:')}
+        return cls(labels, coords, measures)
+
+
+def cube_path(path=None, cache_dir=None):
+    """Return where the cube for the current version of the dataset at path is stored."""
+    path = path or CSV_PATH
+    cache_dir, stem = cache_location(path, cache_dir)
+    return os.path.join(cache_dir, f"{stem}.{source_fingerprint(path)}.cube.v{CUBE_VERSION}.npz")
+
+
+def load_cube(path=None, cache_dir=None, refresh=False, df=None):
+    """
+    Load the cube for the dataset at path, building and saving it on first use.
+
+    df may be the already-loaded cleaned frame, so a missing cube is built
+    without loading the dataset a second time.
+    """
+    path = path or CSV_PATH
+    target = cube_path(path, cache_dir)
+    if os.path.exists(target) and not refresh:
+        return Cube.load(target)
+
+    if df is None:
+        df = load_collisions(path, cache_dir)
+    if 'Total Fatalities' not in df:
+        df = add_objective_columns(df)
+    cube = Cube.from_frame(df)
+
+    cache_dir = os.path.dirname(target)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Remove cubes built from older versions of the source file
+    stem = cache_location(path, cache_dir)[1]
+    for name in os.listdir(cache_dir):
+        if name.startswith(stem + '.') and '.cube.' in name and name.endswith('.npz'):
+            os.remove(os.path.join(cache_dir, name))
+    cube.save(target + '.tmp')
+    os.replace(target + '.tmp', target)
+    return cube
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the pre-aggregated cube and time rollups from it.")
+    parser.add_argument('--input', default=CSV_PATH, help="collisions CSV (default: %(default)s)")
+    parser.add_argument('--refresh', action='store_true', help="rebuild the cube even if it is cached")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    cube = load_cube(args.input, refresh=args.refresh)
+    print(f"Loaded cube with {len(cube)} occupied cells in {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    tables = cube.results()
+    print(f"Computed {len(tables)} objective tables from the cube in {(time.perf_counter() - start) * 1000:.2f} ms")
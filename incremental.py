@@ -0,0 +1,175 @@
+"""
+Incremental daily updates of the objective aggregates.
+
+The partial tables from aggregate.partial_aggregate() are persisted together
+with the byte offset, highest 'Collision ID' and latest date already ingested.
+Because the dataset only grows by appended days, a new run seeks straight to
+the stored offset, parses only the appended rows and folds them into the saved
+state. If the already-ingested part of the file has changed (older records
+corrected, file replaced or truncated) the state is rebuilt from scratch.
+
+Run it directly for the nightly refresh:
+
+    python incremental.py [--rebuild]
+"""
+
+import hashlib
+import io
+import os
+import pickle
+import sys
+
+from aggregate import OBJECTIVE_SPECS, add_objective_columns, finalize, merge_partials, partial_aggregate
+from collisions import CSV_PATH, cache_location, clean, read_raw, save_street_names, street_names
+from streets import STREET_RULES_VERSION
+
+# Bump whenever the layout of the saved state or the cleaned keys change (the
+# file name also carries streets.STREET_RULES_VERSION)
+STATE_VERSION = 4
+
+# Bytes hashed at the start of the file and just before the ingested offset
+_CHECK_BLOCK = 1 << 20
+
+
+def state_path(path=None, cache_dir=None):
+    """Return where the aggregate state for the dataset at path is stored."""
+    cache_dir, stem = cache_location(path or CSV_PATH, cache_dir)
+    return os.path.join(cache_dir, f"{stem}.state.v{STATE_VERSION}.r{STREET_RULES_VERSION}.pkl")
+
+
+def load_state(path=None, cache_dir=None):
+    """Return the saved aggregate state, or None if there is none."""
+    try:
+        with open(state_path(path, cache_dir), 'rb') as fh:
+            return pickle.load(fh)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(state, path=None, cache_dir=None):
+    """Write the aggregate state atomically."""
+    target = state_path(path, cache_dir)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target + '.tmp', 'wb') as fh:
+        pickle.dump(state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(target + '.tmp', target)
+
+
+def invalidate_state(path=None, cache_dir=None):
+    """Delete the saved state so the next update rebuilds it from the whole file."""
+    try:
+        os.remove(state_path(path, cache_dir))
+    except FileNotFoundError:
+        pass
+
+
+def _checksums(fh, offset):
+    """Hash the first block of the file and the block ending at offset."""
+    fh.seek(0)
+    head = hashlib.sha256(fh.read(min(offset, _CHECK_BLOCK))).hexdigest()
+    start = max(offset - _CHECK_BLOCK, 0)
+    fh.seek(start)
+    tail = hashlib.sha256(fh.read(offset - start)).hexdigest()
+    return head, tail
+
+
+def _complete_offset(fh, size):
+    """Return the offset just past the last complete line, so a half-written row is re-read next time."""
+    start = max(size - _CHECK_BLOCK, 0)
+    fh.seek(start)
+    last_newline = fh.read(size - start).rfind(b'\n')
+    return start + last_newline + 1 if last_newline >= 0 else 0
+
+
+class _Prefix(io.RawIOBase):
+    """Read-only stream over the first end bytes of an open binary file, so a half-written last row is not parsed."""
+
+    def __init__(self, fh, end):
+        self.fh = fh
+        self.left = end
+        fh.seek(0)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.fh.read(min(len(buffer), self.left))
+        buffer[:len(data)] = data
+        self.left -= len(data)
+        return len(data)
+
+
+def _stale_reason(state, fh, size, specs):
+    """Return why the saved state cannot be extended, or None if it is still valid."""
+    if [spec.name for spec in specs] != state['specs']:
+        return "aggregate specs changed"
+    if size < state['offset']:
+        return "source file shrank"
+    if _checksums(fh, state['offset']) != state['checksums']:
+        return "already-ingested rows changed"
+    return None
+
+
+def update_aggregates(path=None, specs=OBJECTIVE_SPECS, cache_dir=None, rebuild=False, chunksize=500_000):
+    """
+    Fold rows appended since the last run into the saved state and return the result tables.
+
+    Pass rebuild=True (or call invalidate_state()) after older records were
+    corrected in place; changes to the ingested part of the file that touch its
+    first or last MiB are detected automatically.
+    """
+    path = path or CSV_PATH
+    state = None if rebuild else load_state(path, cache_dir)
+    size = os.path.getsize(path)
+    registry = street_names(path, cache_dir)
+
+    with open(path, 'rb') as fh:
+        if state is not None:
+            reason = _stale_reason(state, fh, size, specs)
+            if reason:
+                print(f"Rebuilding aggregate state: {reason}.")
+                state = None
+
+        end = _complete_offset(fh, size)
+        if state is None:
+            state = {'specs': [spec.name for spec in specs], 'partials': None, 'offset': 0,
+                     'columns': None, 'max_id': None, 'max_date': None, 'rows': 0}
+
+        new_rows = 0
+        if state['offset'] < end:
+            if state['partials'] is None:
+                # Stream the file up to the last complete line, in chunks
+                reader = read_raw(io.BufferedReader(_Prefix(fh, end)), chunksize=chunksize)
+            else:
+                # Parse only the complete lines appended after the last ingested one
+                fh.seek(state['offset'])
+                appended = io.BytesIO(fh.read(end - state['offset']))
+                reader = read_raw(appended, header=None, names=state['columns'], chunksize=chunksize)
+            with reader:
+                for chunk in reader:
+                    state['columns'] = state['columns'] or list(chunk.columns)
+                    chunk = clean(chunk, registry)
+                    if chunk.empty:
+                        continue
+                    partial = partial_aggregate(add_objective_columns(chunk), specs)
+                    state['partials'] = (partial if state['partials'] is None
+                                         else merge_partials(state['partials'], partial))
+                    state['max_id'] = max(state['max_id'] or 0, int(chunk['Collision ID'].max()))
+                    state['max_date'] = max(state['max_date'] or chunk['Date'].max(), chunk['Date'].max())
+                    new_rows += len(chunk)
+
+        state['offset'] = end
+        state['checksums'] = _checksums(fh, end)
+
+    state['rows'] += new_rows
+    if state['partials'] is None:
+        raise ValueError(f"no rows to aggregate in {path}")
+    save_state(state, path, cache_dir)
+    save_street_names(path, cache_dir)
+    print(f"Ingested {new_rows} new rows; state covers {state['rows']} rows up to "
+          f"Collision ID {state['max_id']} ({state['max_date']:%Y-%m-%d}).")
+    return finalize(state['partials'], specs)
+
+
+if __name__ == '__main__':
+    update_aggregates(rebuild='--rebuild' in sys.argv[1:])
@@ -0,0 +1,289 @@
+"""
+Intersection index over Street Name x Cross Street.
+
+Every collision whose street and cross street are both known is keyed on the
+unordered pair of canonical names (aggregate.add_objective_columns() adds it as
+the 'Intersection' column, see streets.intersection_labels()). The
+'intersections' and 'intersection_week' aggregates of OBJECTIVE_SPECS count it
+in the same pass as every other table, and IntersectionIndex lays them out
+with one compact integer key per intersection:
+
+* totals per key (accidents, casualty sums, active weeks, weekly average),
+* the Borough x Intersection cells with their own totals and active weeks,
+  for per-borough rankings,
+* every key's weekly counts stored contiguously with offsets, so the history
+  of one intersection is a slice.
+
+Lookups such as "top intersections in Queens" or "history for BROADWAY & W 42
+ST" then read a few arrays instead of scanning the rows. The index is saved as
+an .npz next to the Feather cache and rebuilt when the source CSV changes.
+
+    python intersections.py --borough Queens
+    python intersections.py --history "BROADWAY & W 42 ST"
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME, OBJECTIVE_SPECS, add_objective_columns, aggregate, week_start
+from collisions import COUNT_COLS, CSV_PATH, cache_location, load_collisions, source_fingerprint
+from streets import STREET_RULES_VERSION, normalize_street
+
+INDEX_TABLES = ['intersections', 'intersection_week']
+INDEX_MEASURES = [COUNT_NAME] + COUNT_COLS
+
+# Bump whenever the layout of the saved index changes (the file name also
+# carries streets.STREET_RULES_VERSION, since labels follow those rules)
+INDEX_VERSION = 2
+
+
+def intersection_name(text):
+    """Canonical 'A & B' label of a free-text intersection such as 'broadway & w 42 st'."""
+    parts = [part for part in text.split('&') if part.strip()]
+    if len(parts) != 2:
+        raise KeyError(f"expected 'STREET & CROSS STREET', got {text!r}")
+    return ' & '.join(sorted(normalize_street(part) for part in parts))
+
+
+class IntersectionIndex:
+    """
+    Per-intersection totals, Borough x Intersection cells and weekly history.
+
+    names is the sorted Index of intersection labels and the key of an
+    intersection is its position in it. totals maps each INDEX_MEASURES name
+    to an int64 array per key. The cells (cell_borough into boroughs,
+    cell_key, cell_measures, cell_weeks) hold the totals and active weeks per
+    borough, and main_borough is the borough with most of each key's
+    accidents. weeks and week_counts hold each key's active weeks across all
+    boroughs in order, key k's entries being weeks[offsets[k]:offsets[k + 1]].
+    """
+
+    def __init__(self, names, totals, boroughs, cell_borough, cell_key, cell_measures, cell_weeks, offsets, weeks,
+                 week_counts):
+        self.names = names
+        self.totals = totals
+        self.boroughs = boroughs
+        self.cell_borough = cell_borough
+        self.cell_key = cell_key
+        self.cell_measures = cell_measures
+        self.cell_weeks = cell_weeks
+        self.offsets = offsets
+        self.weeks = weeks
+        self.week_counts = week_counts
+        self._borough_lookup = {str(b).casefold(): i for i, b in enumerate(boroughs)}
+        # The last cell of each key after sorting by key and count is its busiest borough
+        order = np.lexsort((cell_measures[COUNT_NAME], cell_key))
+        last = np.r_[cell_key[order][1:] != cell_key[order][:-1], True]
+        self.main_borough = np.zeros(len(names), dtype=cell_borough.dtype)
+        self.main_borough[cell_key[order][last]] = cell_borough[order][last]
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_results(cls, results):
+        """Build the index from the 'intersections' and 'intersection_week' aggregate tables."""
+        cells = results['intersections']
+        names = pd.Index(np.unique(cells['Intersection'].astype(str)), name='Intersection')
+        cell_key = names.get_indexer(cells['Intersection'].astype(str))
+        borough_codes, boroughs = pd.factorize(cells['Borough'].astype(str), sort=True)
+        cell_measures = {name: cells[name].to_numpy(dtype='int64') for name in INDEX_MEASURES}
+        totals = {name: np.bincount(cell_key, weights=values, minlength=len(names)).astype('int64')
+                  for name, values in cell_measures.items()}
+
+        # Each Borough x Intersection x Week row is one active week of its cell
+        history = results['intersection_week']
+        cells_index = pd.MultiIndex.from_arrays([cells['Borough'].astype(str), cells['Intersection'].astype(str)])
+        week_cell = cells_index.get_indexer(
+            pd.MultiIndex.from_arrays([history['Borough'].astype(str), history['Intersection'].astype(str)]))
+        present = week_cell >= 0
+        cell_weeks = np.bincount(week_cell[present], minlength=len(cells))
+
+        # A key's history sums its cells' counts of the same week
+        weekly = (pd.DataFrame({'Key': cell_key[week_cell[present]], 'Week': history['Week'].to_numpy()[present],
+                                COUNT_NAME: history[COUNT_NAME].to_numpy()[present]})
+                  .groupby(['Key', 'Week'], sort=True)[COUNT_NAME].sum())
+        week_key = weekly.index.get_level_values('Key').to_numpy()
+        offsets = np.zeros(len(names) + 1, dtype='int64')
+        np.cumsum(np.bincount(week_key, minlength=len(names)), out=offsets[1:])
+        return cls(names, totals, pd.Index(boroughs, name='Borough'), borough_codes.astype('int8'),
+                   cell_key.astype('int32'), cell_measures, cell_weeks.astype('int32'), offsets,
+                   weekly.index.get_level_values('Week').to_numpy().astype('int32'),
+                   weekly.to_numpy().astype('int64'))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the index from a cleaned frame."""
+        if 'Intersection' not in df:
+            df = add_objective_columns(df)
+        specs = [spec for spec in OBJECTIVE_SPECS if spec.name in INDEX_TABLES]
+        return cls.from_results(aggregate(df, specs))
+
+    def key(self, name):
+        """Integer key of an intersection given as 'STREET & CROSS STREET' in any spelling or order."""
+        position = self.names.get_indexer([intersection_name(name)])[0]
+        if position < 0:
+            raise KeyError(f"no accidents recorded at {name!r}")
+        return int(position)
+
+    def close_matches(self, name, n=5):
+        """Up to n intersection labels resembling name, for a name that is not in the index."""
+        try:
+            name = intersection_name(name)
+        except KeyError:
+            name = name.upper()
+        return difflib.get_close_matches(name, list(self.names), n=n, cutoff=0.5)
+
+    def active_weeks(self):
+        return np.diff(self.offsets)
+
+    def weekly_average(self):
+        """Accidents per week with at least one accident, per key (as aggregate.weekly_average())."""
+        return self.totals[COUNT_NAME] / np.maximum(self.active_weeks(), 1)
+
+    def top(self, borough=None, k=10, by=COUNT_NAME):
+        """
+        The k intersections with the most by (a measure), overall or within one borough.
+
+        Each row has the intersection's key, label, borough, its measures and its
+        average accidents per active week. Ranking overall uses the citywide
+        totals and labels each intersection with its 'Main Borough' (the one with
+        most of its accidents); ranking one borough uses only that borough's
+        accidents and weeks.
+        """
+        if borough is None:
+            values = self.totals[by]
+            keys = np.argsort(-values, kind='stable')[:k]
+            measures = {name: self.totals[name][keys] for name in INDEX_MEASURES}
+            borough_column, borough_labels = 'Main Borough', self.boroughs.take(self.main_borough[keys])
+            averages = self.weekly_average()[keys]
+        else:
+            code = self._borough_lookup.get(str(borough).casefold())
+            if code is None:
+                raise KeyError(f"unknown borough {borough!r}; choose from {list(self.boroughs)}")
+            cells = np.flatnonzero(self.cell_borough == code)
+            cells = cells[np.argsort(-self.cell_measures[by][cells], kind='stable')[:k]]
+            keys = self.cell_key[cells]
+            measures = {name: self.cell_measures[name][cells] for name in INDEX_MEASURES}
+            borough_column, borough_labels = 'Borough', [self.boroughs[code]] * len(keys)
+            averages = measures[COUNT_NAME] / np.maximum(self.cell_weeks[cells], 1)
+        table = pd.DataFrame({'Key': keys, 'Intersection': self.names.take(keys), borough_column: borough_labels})
+        for name, values in measures.items():
+            table[name] = values
+        table['Weekly_Average'] = averages
+        return table
+
+    def history(self, name):
+        """Weekly accident counts of one intersection: the Monday of each active week and its count."""
+        key = self.key(name)
+        start, end = self.offsets[key], self.offsets[key + 1]
+        return pd.DataFrame({'Week': week_start(self.weeks[start:end]), COUNT_NAME: self.week_counts[start:end]})
+
+    def summary(self, name):
+        """Totals of one intersection as a dict: key, label, measures, active weeks and weekly average."""
+        key = self.key(name)
+        row = {'Key': key, 'Intersection': self.names[key]}
+        row.update({measure: int(values[key]) for measure, values in self.totals.items()})
+        row['Active Weeks'] = int(self.active_weeks()[key])
+        row['Weekly_Average'] = float(self.weekly_average()[key])
+        return row
+
+    def save(self, file):
+        """Write the index to an uncompressed .npz file (labels as fixed-width unicode, no pickle)."""
+        arrays = {'names': np.asarray(self.names, dtype=str), 'boroughs': np.asarray(self.boroughs, dtype=str),
+                  'cell_borough': self.cell_borough, 'cell_key': self.cell_key, 'cell_weeks': self.cell_weeks,
+                  'offsets': self.offsets,
+                  'weeks': self.weeks, 'week_counts': self.week_counts}
+        for name in INDEX_MEASURES:
+            arrays[f'totals:{name}'] = self.totals[name]
+            arrays[f'cells:{name}'] = self.cell_measures[name]
+        with open(file, 'wb') as fh:
+            np.savez(fh, **arrays)
+
+    @classmethod
+    def load(cls, file):
+        """Read an index written by save()."""
+        with np.load(file) as data:
+            return cls(pd.Index(data['names'].astype(object), name='Intersection'),
+                       {name: data[f'totals:{name}'] for name in INDEX_MEASURES},
+                       pd.Index(data['boroughs'].astype(object), name='Borough'),
+                       data['cell_borough'], data['cell_key'],
+                       {name: data[f'cells:{name}'] for name in INDEX_MEASURES}, data['cell_weeks'],
+                       data['offsets'], data['weeks'], data['week_counts'])
+
+
+def index_path(path=None, cache_dir=None):
+    """Return where the intersection index for the current version of the dataset at path is stored."""
+    path = path or CSV_PATH
+    cache_dir, stem = cache_location(path, cache_dir)
+    return os.path.join(cache_dir, f"{stem}.{source_fingerprint(path)}.intersections.v{INDEX_VERSION}.r{STREET_RULES_VERSION}.npz")
+
+
+def load_index(path=None, cache_dir=None, refresh=False, df=None):
+    """
+    Load the intersection index for the dataset at path, building and saving it on first use.
+
+    df may be the already-loaded cleaned frame, so a missing index is built
+    without loading the dataset a second time.
+    """
+    path = path or CSV_PATH
+    target = index_path(path, cache_dir)
+    if os.path.exists(target) and not refresh:
+        return IntersectionIndex.load(target)
+
+    index = IntersectionIndex.from_frame(load_collisions(path, cache_dir) if df is None else df)
+
+    cache_dir = os.path.dirname(target)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Remove indexes built from older versions of the source file
+    stem = cache_location(path, cache_dir)[1]
+    for name in os.listdir(cache_dir):
+        if name.startswith(stem + '.') and '.intersections.' in name and name.endswith('.npz'):
+            os.remove(os.path.join(cache_dir, name))
+    index.save(target + '.tmp')
+    os.replace(target + '.tmp', target)
+    return index
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the intersection index and look up intersections.")
+    parser.add_argument('--input', default=CSV_PATH, help="collisions CSV (default: %(default)s)")
+    parser.add_argument('--borough', help="rank the intersections of one borough only")
+    parser.add_argument('--k', type=int, default=10, help="intersections to list (default: %(default)s)")
+    parser.add_argument('--history', metavar='"STREET & CROSS STREET"', help="print one intersection's weekly counts")
+    parser.add_argument('--refresh', action='store_true', help="rebuild the index even if it is cached")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = load_index(args.input, refresh=args.refresh)
+    print(f"Loaded the index of {len(index)} intersections in {time.perf_counter() - start:.3f} s")
+    start = time.perf_counter()
+    try:
+        top = index.top(args.borough, args.k)
+    except KeyError as exc:
+        sys.exit(f"error: {exc.args[0]}")
+    elapsed = time.perf_counter() - start
+    print(f"Top {args.k} intersections{' in ' + args.borough if args.borough else ''}:")
+    print(top.round(2).to_string(index=False))
+    print(f"Ranked in {elapsed * 1000:.2f} ms")
+    if args.history:
+        start = time.perf_counter()
+        try:
+            summary, history = index.summary(args.history), index.history(args.history)
+        except KeyError:
+            matches = index.close_matches(args.history)
+            print(f"no such intersection: {args.history!r}", file=sys.stderr)
+            if matches:
+                print("close matches: " + '; '.join(matches), file=sys.stderr)
+            sys.exit(1)
+        elapsed = time.perf_counter() - start
+        print(', '.join(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}"
+                        for name, value in summary.items()))
+        print(history.assign(Week=history['Week'].dt.strftime('%Y-%m-%d')).to_string(index=False))
+        print(f"Looked up the history in {elapsed * 1000:.2f} ms")
@@ -0,0 +1,113 @@
+"""
+Process-pool execution of the objective aggregates.
+
+The CSV is split into line-aligned byte ranges. Each worker parses and cleans
+its ranges, derives the objective columns and computes partial aggregates,
+which the parent merges with aggregate.merge_partials(). Workers also hand
+back the street spellings they normalized, which the parent adds to its
+street-name registry and saves, so later runs reuse them. Ranges are kept
+small (block_size bytes) and handed out as workers free up, so memory stays
+bounded per worker and uneven ranges balance out.
+
+    python parallel.py --workers 8
+    python parallel.py --benchmark --workers 32
+"""
+
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from aggregate import OBJECTIVE_SPECS, add_objective_columns, finalize, merge_partials, partial_aggregate
+from collisions import CSV_PATH, clean, read_raw, save_street_names, street_names
+
+# Default size of the byte range handed to a worker at a time
+BLOCK_SIZE = 64 << 20
+
+
+def byte_ranges(path, block_size=BLOCK_SIZE):
+    """Return the header columns and (start, end) byte ranges that each start and end on a line boundary."""
+    size = os.path.getsize(path)
+    with open(path, 'rb') as fh:
+        header = fh.readline()
+        start = fh.tell()
+        ranges = []
+        while start < size:
+            fh.seek(min(start + block_size, size))
+            # Extend to the end of the line the block boundary falls in
+            fh.readline()
+            end = min(fh.tell(), size)
+            ranges.append((start, end))
+            start = end
+    columns = list(read_raw(io.BytesIO(header), nrows=0).columns)
+    return columns, ranges
+
+
+def _aggregate_range(path, columns, start, end, specs):
+    """
+    Worker: parse one byte range and return its partial aggregates (None if no
+    valid rows) and the {raw: canonical} street names it added to the registry.
+    """
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        block = io.BytesIO(fh.read(end - start))
+    registry = street_names(path)
+    chunk = clean(read_raw(block, header=None, names=columns), registry)
+    added = registry.pop_added()
+    if chunk.empty:
+        return None, added
+    return partial_aggregate(add_objective_columns(chunk), specs), added
+
+
+def aggregate_parallel(path=None, specs=OBJECTIVE_SPECS, workers=None, block_size=BLOCK_SIZE):
+    """Aggregate the CSV across a pool of worker processes; results match aggregate_csv()."""
+    path = path or CSV_PATH
+    workers = workers or os.cpu_count()
+    columns, ranges = byte_ranges(path, block_size)
+    # Load the registry first so forked workers start from it
+    registry = street_names(path)
+
+    partials = None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_aggregate_range, path, columns, start, end, specs) for start, end in ranges]
+        # Merge partials as workers finish so completed results are not held back
+        for future in as_completed(futures):
+            partial, added = future.result()
+            registry.learn(added)
+            if partial is not None:
+                partials = partial if partials is None else merge_partials(partials, partial)
+    save_street_names(path)
+    if partials is None:
+        raise ValueError(f"no rows to aggregate in {path}")
+    return finalize(partials, specs)
+
+
+def benchmark(path=None, max_workers=None, block_size=BLOCK_SIZE):
+    """Time aggregate_parallel() at 1, 2, 4, ... max_workers processes and print the speedup."""
+    max_workers = max_workers or os.cpu_count()
+    counts = sorted({min(1 << i, max_workers) for i in range(max_workers.bit_length() + 1)})
+    timings = {}
+    for workers in counts:
+        start = time.perf_counter()
+        aggregate_parallel(path, workers=workers, block_size=block_size)
+        timings[workers] = time.perf_counter() - start
+        print(f"{workers:>3} workers: {timings[workers]:7.2f} s  "
+              f"speedup x{timings[counts[0]] / timings[workers]:.2f}")
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compute the objective aggregates with a process pool.")
+    parser.add_argument('--input', default=CSV_PATH, help="collisions CSV (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: %(default)s)")
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help="bytes per work unit (default: %(default)s)")
+    parser.add_argument('--benchmark', action='store_true', help="time 1, 2, 4, ... --workers processes")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.input, args.workers, args.block_size)
+    else:
+        results = aggregate_parallel(args.input, workers=args.workers, block_size=args.block_size)
+        for name, table in results.items():
+            print(f"{name}: {len(table)} rows")
@@ -0,0 +1,218 @@
+"""
+Per-stage instrumentation of the pipeline.
+
+Loading, Date/Time parsing, filling, every aggregate groupby and every figure
+are wrapped in stage() blocks that record wall time, CPU time, peak RSS and
+the rows going in and out. Recording is off by default and a disabled stage()
+costs one function call. Turn it on with the NYC_PROFILE environment variable
+or enable():
+
+    NYC_PROFILE=trace.json python analysis.py     # Chrome trace (chrome://tracing, ui.perfetto.dev)
+    NYC_PROFILE=stages.jsonl python analysis.py   # one JSON record per stage
+
+Stages nest; the peak RSS of a stage covers everything that ran inside it.
+Per-stage peaks rely on resetting the kernel's high-water mark (Linux); on
+other platforms the peak is the process-wide maximum so far.
+"""
+
+import atexit
+import contextlib
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS counter so the next reading covers one stage (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB since the last reset (or since start), None if unknown."""
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        # Windows: the peak working set, when psutil is installed
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / (1 << 20)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def child_cpu_s():
+    """CPU seconds used by finished child processes, 0 where unavailable."""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Stage:
+    """
+    Handle yielded by stage(); set rows_out (or add to args) before the block ends.
+
+    A block that raises gets an 'error' entry in its record.
+    """
+
+    def __init__(self, name, rows_in=None, args=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.args = args or {}
+        self.peak = None
+
+
+class Profiler:
+    """Collects stage records of the current process."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+        self._stack = []
+
+    @contextlib.contextmanager
+    def stage(self, name, rows_in=None, **args):
+        handle = Stage(name, rows_in, args)
+        # The enclosing stage keeps the peak reached so far before the counter is reset for this one
+        if self._stack:
+            parent = self._stack[-1]
+            parent.peak = max(parent.peak or 0, peak_rss_mb() or 0)
+        reset_peak_rss()
+        self._stack.append(handle)
+        start_us = time.time_ns() // 1000
+        wall, cpu, children = time.perf_counter(), time.process_time(), child_cpu_s()
+        try:
+            yield handle
+        except Exception as exc:
+            # The stage and every enclosing one record the error that ended them
+            handle.args.setdefault('error', f"{type(exc).__name__}: {exc}")
+            raise
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            children = child_cpu_s() - children
+            self._stack.pop()
+            peak = max(handle.peak or 0, peak_rss_mb() or 0) or None
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak or 0, peak or 0)
+
+            record = {'stage': name, 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+                      'peak_rss_mb': round(peak, 1) if peak is not None else None,
+                      'start_us': start_us, 'pid': os.getpid(), 'depth': len(self._stack)}
+            if children:
+                record['child_cpu_s'] = round(children, 6)
+            if handle.rows_in is not None:
+                record['rows_in'] = int(handle.rows_in)
+            if handle.rows_out is not None:
+                record['rows_out'] = int(handle.rows_out)
+            record.update(handle.args)
+            self.records.append(record)
+
+    def add(self, records):
+        """Append records collected in another process, nested under the current stage."""
+        depth = len(self._stack)
+        for record in records:
+            self.records.append(dict(record, depth=record['depth'] + depth))
+
+    def chrome_trace(self):
+        """Return the records as a Chrome trace-event document."""
+        events = []
+        for record in self.records:
+            args = {k: v for k, v in record.items() if k not in ('stage', 'start_us', 'pid', 'wall_s', 'depth')}
+            events.append({'name': record['stage'], 'cat': 'stage', 'ph': 'X', 'ts': record['start_us'],
+                           'dur': round(record['wall_s'] * 1e6), 'pid': record['pid'], 'tid': record['pid'],
+                           'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self, path=None):
+        """Write a Chrome trace (.json) or one JSON record per line (.jsonl/.log) and return the path."""
+        path = path or self.path
+        with open(path, 'w') as fh:
+            if path.endswith(('.jsonl', '.log')):
+                for record in sorted(self.records, key=lambda r: r['start_us']):
+                    fh.write(json.dumps(record) + '\n')
+            else:
+                json.dump(self.chrome_trace(), fh)
+        print(f"Profile of {len(self.records)} stages written to {path}", file=sys.stderr)
+        return path
+
+
+# Active profiler of this process, None while profiling is off
+_profiler = None
+
+
+def enable(path=None):
+    """Start recording stages; with a path, the profile is written there when the process exits."""
+    global _profiler
+    _profiler = Profiler(path)
+    if path:
+        owner = os.getpid()
+        atexit.register(lambda: os.getpid() == owner and _profiler is not None and _profiler.write())
+    return _profiler
+
+
+def disable():
+    """Stop recording and return the profiler that was active (or None)."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def enabled():
+    return _profiler is not None
+
+
+def stage(name, rows_in=None, **args):
+    """Context manager recording one pipeline stage; a no-op while profiling is off."""
+    if _profiler is None:
+        return contextlib.nullcontext(Stage(name, rows_in, args))
+    return _profiler.stage(name, rows_in, **args)
+
+
+def collect(func, *args):
+    """
+    Run func(*args) with a fresh profiler and return (result, records).
+
+    Used for work handed to pool processes: the records travel back with the
+    result and the parent adds them with merge().
+    """
+    global _profiler
+    previous, _profiler = _profiler, Profiler()
+    try:
+        result = func(*args)
+        return result, _profiler.records
+    finally:
+        _profiler = previous
+
+
+def merge(records):
+    """Add records returned by collect() to the active profiler."""
+    if _profiler is not None:
+        _profiler.add(records)
+
+
+# Profiling requested through the environment; processes started by the
+# profiled one (render workers) inherit the variable but not the output file
+if os.environ.get('NYC_PROFILE') and os.environ.get('NYC_PROFILE_OWNER', str(os.getpid())) == str(os.getpid()):
+    os.environ['NYC_PROFILE_OWNER'] = str(os.getpid())
+    enable(os.environ['NYC_PROFILE'])
@@ -0,0 +1,517 @@
+"""
+Headless batch rendering of the analysis figures.
+
+figure_specs() turns the aggregate tables from aggregate.aggregate() into one
+FigureSpec per PNG: the drawing function, the small table it plots and its
+style parameters. render_all() draws the specs concurrently in a process pool
+on the non-interactive Agg backend (no plt.show()) and reports how long each
+figure took. matplotlib and seaborn are only imported inside the drawing
+workers, so building specs is cheap.
+
+Rendered PNGs are also kept in a content-addressed cache keyed on a hash of the
+figure's input table, style parameters, drawing code (the whole of this module,
+so shared helpers count) and matplotlib/seaborn versions (figure_key()), so a
+figure whose inputs did not change is copied from the cache instead of redrawn.
+"""
+
+import hashlib
+import inspect
+import os
+import shutil
+import sys
+import time
+import textwrap
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+from aggregate import (day_hour_percentages, injury_profile, iqr_bounds, monthly_percentages,
+                       monthly_year_percentages, top_counts, value_counts, weekly_average, weighted_quantile)
+from collisions import DAY_ORDER
+from profiling import collect, enabled, merge, stage
+
+FigureSpec = namedtuple('FigureSpec', ['filename', 'draw', 'data', 'style'])
+FigureSpec.__doc__ = """One PNG: draw(data, style) is called on a fresh Agg figure and saved as filename."""
+
+# Uniform colormap and the shades picked from it for single-color elements
+STYLE = {'cmap': 'YlGnBu', 'single': 0.6, 'lighter': 0.4, 'darker': 0.8}
+
+# Bump to invalidate every cached figure for a change outside this module (e.g. in a table helper)
+RENDER_VERSION = 2
+
+# Cached figures not used for this many days are deleted
+CACHE_MAX_AGE_DAYS = 30
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# ------------------ Drawing functions (run inside the render workers) ------------------
+
+def draw_monthly(data, style):
+    plt = _pyplot()
+    norm = plt.Normalize(data['Accident_Count'].min(), data['Accident_Count'].max())
+    colors = plt.get_cmap(style['cmap'])(norm(data['Accident_Count']))
+
+    plt.figure(figsize=(10, 6))
+    plt.bar(data['Month'].astype(str), data['Percentage'], color=colors)
+    plt.title("Overall: Percentage of Accidents per Month from 2021-23")
+    plt.xlabel("Month")
+    plt.ylabel("Percentage of Total Accidents (%)")
+    plt.xticks(range(0, 12), [str(i+1) for i in range(12)])
+    plt.tight_layout()
+
+
+def draw_monthly_by_year(data, style):
+    plt = _pyplot()
+    cmap = plt.get_cmap(style['cmap'])
+    years = sorted(data['Year'].unique())
+    fig, axes = plt.subplots(nrows=len(years), ncols=1, figsize=(10, 6 * len(years)))
+    if len(years) == 1:
+        axes = [axes]
+
+    for ax, year in zip(axes, years):
+        df_year = data[data['Year'] == year].sort_values('Month')
+
+        norm_year = plt.Normalize(df_year['Accident_Count'].min(), df_year['Accident_Count'].max())
+        ax.bar(df_year['Month'].astype(str), df_year['Percentage'], color=cmap(norm_year(df_year['Accident_Count'])))
+        ax.set_title(f"Year {year}: Percentage of Accidents per Month")
+        ax.set_xlabel("Month")
+        ax.set_ylabel("Percentage of Total Accidents (%)")
+        ax.set_xticks(range(0, 12))
+        ax.set_xticklabels([str(i+1) for i in range(12)])
+
+        sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm_year)
+        sm.set_array([])
+        cbar = fig.colorbar(sm, ax=ax)
+        cbar.set_label("Accident Count")
+    plt.tight_layout()
+
+
+def draw_day(data, style):
+    plt = _pyplot()
+    import seaborn as sns
+    plt.figure(figsize=(8, 5))
+    sns.barplot(x=data.index, y=data.values, hue=data.index, palette=style['cmap'], legend=False)
+    plt.title("Accident Count by Day of the Week")
+    plt.xlabel("Day of Week")
+    plt.ylabel("Number of Accidents")
+    plt.tight_layout()
+
+
+def draw_hour(data, style):
+    plt = _pyplot()
+    import seaborn as sns
+    plt.figure(figsize=(10, 5))
+    sns.lineplot(x=data.index, y=data.values, marker="o", color=plt.get_cmap(style['cmap'])(style['single']))
+    plt.title("Accident Count by Hour of the Day")
+    plt.xlabel("Hour (0 - 23)")
+    plt.ylabel("Number of Accidents")
+    plt.xticks(range(0, 24))
+    plt.grid(True)
+    plt.tight_layout()
+
+
+def draw_heatmap(data, style):
+    plt = _pyplot()
+    import seaborn as sns
+    plt.figure(figsize=(12, 6))
+    sns.heatmap(data, cmap=style['cmap'], annot=True, fmt=".1f", linewidths=0.5)
+    plt.title("Heatmap of Accident Percentages by Day of Week and Hour of Day")
+    plt.xlabel("Hour of Day")
+    plt.ylabel("Day of Week")
+    plt.tight_layout()
+
+
+def draw_borough_heatmap(data, style):
+    plt = _pyplot()
+    import seaborn as sns
+    plt.figure(figsize=(12, 6))
+    sns.heatmap(data['percentages'], cmap=style['cmap'], annot=True, fmt=".1f", linewidths=0.5)
+    plt.title(f"{data['borough']}: Accident Percentages by Day of Week and Hour of Day")
+    plt.xlabel("Hour of Day")
+    plt.ylabel("Day of Week")
+    plt.tight_layout()
+
+
+def draw_correlation(data, style):
+    plt = _pyplot()
+    import seaborn as sns
+    plt.figure(figsize=(8, 6.5))
+    sns.heatmap(data, cmap=style['cmap'], annot=True, fmt=".3f", linewidths=0.5, square=True)
+    plt.title("Correlation of Borough Day-of-Week x Hour Accident Profiles")
+    plt.xlabel("Borough")
+    plt.ylabel("Borough")
+    plt.tight_layout()
+
+
+def draw_hotspots(data, style):
+    plt = _pyplot()
+    import seaborn as sns
+    plt.figure(figsize=(12, 8))
+    sns.barplot(data=data, y='Street Name', x='Accident_Count', hue='Borough', palette=style['cmap'], dodge=False)
+    plt.title("Top 20 Accident Hotspots by Street and Borough")
+    plt.xlabel("Number of Accidents")
+    plt.ylabel("Street Name")
+    plt.tight_layout()
+
+
+def draw_top_streets(data, style):
+    plt = _pyplot()
+    short_street_names = [textwrap.shorten(name, width=15, placeholder="...") for name in data.index]
+
+    plt.figure(figsize=(12, 7))
+    ax = data['Accident_Count'].plot(kind='bar', color=plt.get_cmap(style['cmap'])(style['single']))
+    ax.set_xticklabels(short_street_names, rotation=30, ha='right')
+    plt.title("Top 10 Streets by Accident Count\n(with Average Weekly Accidents)")
+    plt.xlabel("Street Name")
+    plt.ylabel("Total Accident Count")
+    plt.subplots_adjust(bottom=0.25, top=0.85)
+
+    for bar, avg_weekly_val in zip(ax.patches, data['Weekly_Average']):
+        ax.text(bar.get_x() + bar.get_width() / 2, bar.get_height() + 30,
+                f"{avg_weekly_val:.1f} / week",
+                ha='center', va='bottom', fontsize=9, color='black')
+    plt.tight_layout()
+
+
+def _annotated_barh(counts, style, title, xlabel):
+    plt = _pyplot()
+    import seaborn as sns
+    ax = sns.barplot(x=counts.values, y=counts.index, hue=counts.index, palette=style['cmap'], legend=False)
+    plt.title(title, fontsize=15)
+    plt.xlabel(xlabel, fontsize=13)
+    plt.ylabel("Contributing Factor", fontsize=13)
+    max_val = counts.max()
+    plt.xlim(0, max_val * 1.1)
+    for p in ax.patches:
+        width = p.get_width()
+        ax.text(width + max_val * 0.01,
+                p.get_y() + p.get_height() / 2,
+                f"{int(width)}",
+                ha='left', va='center', fontsize=11, color='black')
+    return plt
+
+
+def draw_factors(data, style):
+    plt = _pyplot()
+    plt.figure(figsize=(10, 7))
+    _annotated_barh(data['top'], style, "Top 10 Contributing Factors for Accidents", "Number of Accidents")
+    plt.figtext(0.5, 0.01,
+                f"Total accidents with 'Unspecified': {data['unspecified']} | "
+                f"Total with specified factors: {data['specified']}",
+                wrap=True, horizontalalignment='center', fontsize=12, color='gray')
+    plt.tight_layout(rect=[0, 0.03, 1, 1])
+
+
+def draw_fatal_factors(data, style):
+    plt = _pyplot()
+    plt.figure(figsize=(10, 6))
+    _annotated_barh(data, style, "Top Contributing Factors in Fatal Accidents", "Number of Fatal Accidents")
+    plt.tight_layout()
+
+
+def draw_injury_severity(data, style):
+    plt = _pyplot()
+    cmap = plt.get_cmap(style['cmap'])
+    plt.figure(figsize=(8, 6))
+    injured, killed = data['Injured'], data['Killed']
+    bars_injured = plt.bar(data['Category'], injured, width=0.6, label="Injured", color=cmap(style['lighter']))
+    bars_killed = plt.bar(data['Category'], killed, width=0.6, bottom=injured, label="Killed",
+                          color=cmap(style['darker']))
+
+    plt.title("Injury Severity Profiling", fontsize=15)
+    plt.xlabel("Category", fontsize=13)
+    plt.ylabel("Total Count", fontsize=13)
+    plt.legend()
+
+    for bar in bars_injured:
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width() / 2, height / 2,
+                 f"{int(height)}", ha="center", va="center", fontsize=11, color='black')
+    for bar, base in zip(bars_killed, injured):
+        height = bar.get_height()
+        plt.text(bar.get_x() + bar.get_width() / 2, base + height / 2,
+                 f"{int(height)}", ha="center", va="center", fontsize=11, color='black')
+    plt.tight_layout()
+
+
+def draw_relative_risk(data, style):
+    plt = _pyplot()
+    cmap = plt.get_cmap(style['cmap'])
+    data = data.iloc[::-1]
+    plt.figure(figsize=(10, 7))
+    # Clipped so rounding never gives matplotlib a negative error bar
+    errors = [(data['Relative Risk'] - data['CI Low']).clip(lower=0),
+              (data['CI High'] - data['Relative Risk']).clip(lower=0)]
+    plt.barh(data['Vehicle Type'], data['Relative Risk'], xerr=errors, color=cmap(style['single']),
+             error_kw={'ecolor': cmap(style['darker']), 'capsize': 3})
+    plt.axvline(1, color='gray', linestyle='--', linewidth=1)
+    plt.title("Relative Risk of a Fatal Accident by Vehicle Type\n(vs. all other vehicle types, 95% CI)",
+              fontsize=15)
+    plt.xlabel("Relative Risk", fontsize=13)
+    plt.ylabel("Vehicle Type", fontsize=13)
+    plt.tight_layout()
+
+
+def draw_boxplot(data, style):
+    plt = _pyplot()
+    cmap = plt.get_cmap(style['cmap'])
+    plt.figure(figsize=(10, 6))
+    ax = plt.gca()
+    ax.bxp([data['stats']], orientation='horizontal', widths=0.8, patch_artist=True,
+           boxprops={'facecolor': cmap(style['single'])}, medianprops={'color': 'black'})
+    ax.set_yticks([])
+    plt.title(data['title'])
+    plt.xlabel(data['column'])
+    plt.tight_layout()
+
+
+# ------------------ Specs built from the aggregate tables ------------------
+
+def box_stats(values, counts):
+    """Matplotlib bxp() statistics for the data described by distinct values and their counts."""
+    values = np.asarray(values, dtype='float64')
+    q1, q3, low, high = iqr_bounds(values, counts)
+    inside = values[(values >= low) & (values <= high)]
+    return {'med': weighted_quantile(values, counts, 0.5), 'q1': q1, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(),
+            'fliers': np.sort(values[(values < low) | (values > high)])}
+
+
+def _monthly_figures(results, style):
+    return [
+        FigureSpec("overall_monthly_accident_distribution.png", draw_monthly,
+                   monthly_percentages(results['monthly']), style),
+        FigureSpec("monthly_accident_distribution_by_year.png", draw_monthly_by_year,
+                   monthly_year_percentages(results['monthly_year']), style),
+    ]
+
+
+def _temporal_figures(results, style):
+    day_counts = results['day'].set_index('DayOfWeek')['Accident_Count'].reindex(DAY_ORDER)
+    day_counts.index = day_counts.index.astype(str)
+    hour_counts = results['hour'].set_index('Hour')['Accident_Count']
+    return [
+        FigureSpec("accidents_by_day.png", draw_day, day_counts, style),
+        FigureSpec("accidents_by_hour.png", draw_hour, hour_counts, style),
+        FigureSpec("heatmap_day_hour_percent.png", draw_heatmap, day_hour_percentages(results['day_hour']), style),
+    ]
+
+
+def _hotspot_figures(results, style):
+    top_hotspots = results['hotspots'].sort_values('Accident_Count', ascending=False, kind='stable').head(20)
+    top_hotspots = top_hotspots.astype({'Borough': str, 'Street Name': str})
+    return [FigureSpec("accident_hotspots.png", draw_hotspots, top_hotspots, style)]
+
+
+def _street_figures(results, style):
+    top_streets = top_counts(results['streets'], 'Street Name', 10).to_frame()
+    weekly = weekly_average(results['street_week'])
+    weekly.index = weekly.index.astype(str)
+    top_streets['Weekly_Average'] = weekly.reindex(top_streets.index).fillna(0)
+    return [FigureSpec("top_streets_with_weekly_avg.png", draw_top_streets, top_streets, style)]
+
+
+def _factor_figures(results, style):
+    cf_counts = top_counts(results['factors'], 'Contributing Factor')
+    cf_specified = cf_counts.drop("Unspecified", errors='ignore')
+    factors = {'top': cf_specified.head(10), 'unspecified': int(cf_counts.get("Unspecified", 0)),
+               'specified': int(cf_specified.sum())}
+    return [FigureSpec("top_contributing_factors_with_weekly_avg.png", draw_factors, factors, style)]
+
+
+def _fatal_figures(results, style):
+    fatal = top_counts(results['fatal_factors'], 'Contributing Factor', 10)
+    return [FigureSpec("fatal_accident_causality.png", draw_fatal_factors, fatal, style)]
+
+
+def _injury_figures(results, style):
+    return [FigureSpec("injury_severity_stacked.png", draw_injury_severity,
+                       injury_profile(results['casualties']), style)]
+
+
+def _temporal_spatial_figures(results, style):
+    from temporal import borough_heatmaps, count_tensor, profile_correlations
+
+    boroughs, tensor = count_tensor(results['borough_month_day_hour'])
+    specs = [FigureSpec(f"heatmap_day_hour_percent_{borough.lower().replace(' ', '_')}.png", draw_borough_heatmap,
+                        {'percentages': percentages, 'borough': borough}, style)
+             for borough, percentages in borough_heatmaps(boroughs, tensor).items()]
+    specs.append(FigureSpec("borough_profile_correlation.png", draw_correlation,
+                            profile_correlations(boroughs, tensor), style))
+    return specs
+
+
+def _vehicle_figures(results, style):
+    from vehicles import relative_risks, severity_classes
+
+    fatal = relative_risks(severity_classes(results['vehicle_severity']), 'fatal').head(15)
+    fatal = fatal[['Vehicle Type', 'Relative Risk', 'CI Low', 'CI High']]
+    return [FigureSpec("vehicle_fatal_relative_risk.png", draw_relative_risk, fatal, style)]
+
+
+def _outlier_figures(results, style):
+    values, counts = value_counts(results, 'Persons Injured')
+    _, _, low, high = iqr_bounds(values, counts)
+    kept = (values >= low) & (values <= high)
+    return [
+        FigureSpec("boxplot_before_outliers.png", draw_boxplot,
+                   {'stats': box_stats(values, counts), 'column': 'Persons Injured',
+                    'title': "Boxplot of Persons Injured (Before Outlier Removal)"}, style),
+        FigureSpec("boxplot_after_outliers.png", draw_boxplot,
+                   {'stats': box_stats(values[kept], counts[kept]), 'column': 'Persons Injured',
+                    'title': "Boxplot of Persons Injured (After Outlier Removal)"}, style),
+    ]
+
+
+# Figure builders per objective number
+OBJECTIVE_FIGURES = {
+    1: _monthly_figures,
+    2: _temporal_figures,
+    3: _hotspot_figures,
+    4: _street_figures,
+    5: _factor_figures,
+    6: _fatal_figures,
+    7: _injury_figures,
+    8: _vehicle_figures,
+    9: _temporal_spatial_figures,
+    10: _outlier_figures,
+}
+
+
+def figure_specs(results, style=STYLE, objectives=None):
+    """Build the FigureSpec of every PNG for the given objectives (default: all) from the aggregate() tables."""
+    specs = []
+    for number, build in OBJECTIVE_FIGURES.items():
+        if objectives is None or number in objectives:
+            specs.extend(build(results, style))
+    return specs
+
+
+# ------------------ Figure cache ------------------
+
+def _hash_into(digest, value):
+    """Feed a table, array, mapping or scalar into digest in a type-stable way."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(repr((type(value).__name__, getattr(value, 'name', None),
+                            list(getattr(value, 'columns', [])), [str(t) for t in np.atleast_1d(value.dtypes)])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        digest.update(pd.util.hash_pandas_object(value.index.to_series(), index=False).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            digest.update(repr(key).encode())
+            _hash_into(digest, value[key])
+    else:
+        digest.update(repr(value).encode())
+
+
+@lru_cache(maxsize=None)
+def _drawing_code_digest():
+    """Hash of this module's source (drawing functions, shared helpers, STYLE) and the plotting library versions."""
+    digest = hashlib.sha256(inspect.getsource(sys.modules[__name__]).encode())
+    for package in ('matplotlib', 'seaborn'):
+        try:
+            digest.update(f"{package}=={metadata.version(package)}".encode())
+        except metadata.PackageNotFoundError:
+            pass
+    return digest.hexdigest()
+
+
+def figure_key(spec):
+    """Content hash of everything that determines a figure's pixels."""
+    digest = hashlib.sha256(f"{RENDER_VERSION}:{spec.filename}:{_drawing_code_digest()}".encode())
+    digest.update(inspect.getsource(spec.draw).encode())
+    _hash_into(digest, spec.style)
+    _hash_into(digest, spec.data)
+    return digest.hexdigest()
+
+
+# ------------------ Rendering ------------------
+
+def render_figure(spec, output_dir='.'):
+    """Draw and save one figure on the Agg backend; return the seconds it took."""
+    start = time.perf_counter()
+    with stage(f'figure:{spec.filename}'):
+        plt = _pyplot()
+        with stage(f'draw:{spec.filename}'):
+            spec.draw(spec.data, spec.style)
+        with stage(f'savefig:{spec.filename}'):
+            plt.savefig(os.path.join(output_dir, spec.filename))
+        plt.close('all')
+    return time.perf_counter() - start
+
+
+def render_all(specs, output_dir='.', workers=None, cache_dir=None):
+    """
+    Render every spec, concurrently in a process pool unless workers=1.
+
+    Figures whose figure_key() is already in cache_dir (default: .cache/figures
+    under output_dir) are copied from there; pass cache_dir=False to always redraw.
+    Prints and returns {filename: seconds} for each figure, None for cached ones.
+    """
+    with stage('render') as step:
+        timings = _render_all(specs, output_dir, workers, cache_dir)
+        step.args['figures'] = len(specs)
+        step.args['drawn'] = sum(seconds is not None for seconds in timings.values())
+    return timings
+
+
+def _render_all(specs, output_dir, workers, cache_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    if cache_dir is None:
+        cache_dir = os.path.join(output_dir, '.cache', 'figures')
+    start = time.perf_counter()
+
+    timings, pending = {}, []
+    for spec in specs:
+        cached = cache_dir and os.path.join(cache_dir, figure_key(spec) + '.png')
+        if cached and os.path.exists(cached):
+            shutil.copyfile(cached, os.path.join(output_dir, spec.filename))
+            os.utime(cached)
+            timings[spec.filename] = None
+        else:
+            pending.append((spec, cached))
+
+    if workers == 1 or len(pending) <= 1:
+        for spec, _ in pending:
+            timings[spec.filename] = render_figure(spec, output_dir)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            if enabled():
+                # Workers profile their figures and send the stage records back with the timing
+                futures = {spec.filename: pool.submit(collect, render_figure, spec, output_dir)
+                           for spec, _ in pending}
+                for filename, future in futures.items():
+                    timings[filename], records = future.result()
+                    merge(records)
+            else:
+                futures = {spec.filename: pool.submit(render_figure, spec, output_dir) for spec, _ in pending}
+                timings.update({filename: future.result() for filename, future in futures.items()})
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        for spec, cached in pending:
+            shutil.copyfile(os.path.join(output_dir, spec.filename), cached)
+        expired = time.time() - CACHE_MAX_AGE_DAYS * 86400
+        for name in os.listdir(cache_dir):
+            if os.path.getmtime(os.path.join(cache_dir, name)) < expired:
+                os.remove(os.path.join(cache_dir, name))
+
+    for spec in specs:
+        seconds = timings[spec.filename]
+        print(f"{'cached' if seconds is None else f'{seconds:6.2f} s':>8}  {spec.filename}")
+    print(f"Rendered {len(pending)} of {len(specs)} figures in {time.perf_counter() - start:.2f} s "
+          f"({len(specs) - len(pending)} unchanged, served from cache).")
+    return timings
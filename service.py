@@ -0,0 +1,292 @@
+"""
+Local HTTP/JSON query service over the cleaned dataset.
+
+The cached columns are loaded once at start-up and the objective tables are
+answered for any combination of filters, e.g.
+
+    GET /hourly?borough=Brooklyn&year=2022
+    GET /factors?road_user=cyclists&severity=fatal&k=10
+    GET /monthly  /day_hour  /hotspots  /injuries
+    GET /metrics
+
+Filters: borough, year, month, day (day of week), hour, factor, vehicle
+(comma-separated values are OR-ed), road_user (pedestrians, cyclists,
+motorists) and severity (injury, fatal). Queries filtered only on cube
+dimensions are answered from the pre-aggregated cube (cube.py), the rest from
+the matching rows. Encoded responses are kept in an LRU cache keyed on the
+normalised query, and /metrics reports per-endpoint latency and cache hit rates.
+
+    python service.py --port 8050
+"""
+
+import argparse
+import json
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from aggregate import (COUNT_NAME, OBJECTIVE_SPECS, add_objective_columns, aggregate, injury_profile,
+                       monthly_percentages, top_counts)
+from collisions import CSV_PATH, load_collisions
+from cube import CUBE_TABLES, load_cube
+
+# Filter name -> column, for filters matched against the column's values
+CATEGORY_FILTERS = {'borough': 'Borough', 'day': 'DayOfWeek', 'factor': 'Contributing Factor',
+                    'vehicle': 'Vehicle Type'}
+NUMBER_FILTERS = {'year': 'Year', 'month': 'Month', 'hour': 'Hour'}
+ROAD_USERS = ['pedestrians', 'cyclists', 'motorists']
+SEVERITIES = ['injury', 'fatal']
+
+# Latency samples kept per endpoint for the percentiles in /metrics
+_LATENCY_WINDOW = 1024
+
+_SPECS = {spec.name: spec for spec in OBJECTIVE_SPECS}
+
+
+class QueryError(ValueError):
+    """A query with an unknown endpoint, filter or value (answered with HTTP 400)."""
+
+
+# Each query reads aggregate tables through table(name), which is backed either
+# by the cube or by the aggregate engine over the matching rows
+
+def query_monthly(table, k):
+    return monthly_percentages(table('monthly'))
+
+
+def query_hourly(table, k):
+    return table('hour')
+
+
+def query_day_hour(table, k):
+    counts = table('day_hour')
+    counts['DayOfWeek'] = counts['DayOfWeek'].astype(str)
+    counts['Percentage'] = (counts['Accident_Count'] /
+                            counts.groupby('DayOfWeek')['Accident_Count'].transform('sum') * 100)
+    return counts
+
+
+def query_hotspots(table, k):
+    top = table('hotspots').sort_values('Accident_Count', ascending=False, kind='stable').head(k)
+    return top.astype({'Borough': str, 'Street Name': str})
+
+
+def query_factors(table, k):
+    return top_counts(table('factors'), 'Contributing Factor', k).reset_index()
+
+
+def query_injuries(table, k):
+    return injury_profile(table('casualties'))
+
+
+QUERIES = {
+    'monthly': query_monthly,
+    'hourly': query_hourly,
+    'day_hour': query_day_hour,
+    'hotspots': query_hotspots,
+    'factors': query_factors,
+    'injuries': query_injuries,
+}
+
+# Aggregate tables each query reads; queries whose tables and filters are all
+# covered by the cube are answered from it without touching the rows
+QUERY_TABLES = {'monthly': ['monthly'], 'hourly': ['hour'], 'day_hour': ['day_hour'],
+                'hotspots': ['hotspots'], 'factors': ['factors'], 'injuries': ['casualties']}
+CUBE_FILTERS = {'borough', 'day', 'factor', 'year', 'month', 'hour'}
+
+
+class QueryService:
+    """Answers filtered objective queries over one loaded frame, with an LRU cache and latency metrics."""
+
+    def __init__(self, df, cache_size=256, cube=None):
+        self.df = add_objective_columns(df)
+        self.cube = cube
+        if cube is not None:
+            self._cube_labels = {dim: {str(v).casefold(): v for v in cube.labels[dim]}
+                                 for dim in CATEGORY_FILTERS.values() if dim in cube.labels}
+        # Category codes and value lookups are built once; filters compare small integer arrays
+        self._codes, self._lookup = {}, {}
+        for col in CATEGORY_FILTERS.values():
+            values = self.df[col].astype('category')
+            self._codes[col] = values.cat.codes.to_numpy()
+            self._lookup[col] = {str(v).casefold(): i for i, v in enumerate(values.cat.categories)}
+        self._numbers = {col: self.df[col].to_numpy() for col in NUMBER_FILTERS.values()}
+
+        self._cached = lru_cache(maxsize=cache_size)(self._execute)
+        self._lock = threading.Lock()
+        self._latency = {}
+        self._requests = {}
+
+    def mask(self, filters):
+        """Boolean row mask for a dict of normalised filters."""
+        mask = np.ones(len(self.df), dtype=bool)
+        for name, values in filters.items():
+            if name in CATEGORY_FILTERS:
+                col = CATEGORY_FILTERS[name]
+                codes = [self._lookup[col].get(v.casefold(), -2) for v in values]
+                mask &= np.isin(self._codes[col], codes)
+            elif name in NUMBER_FILTERS:
+                mask &= np.isin(self._numbers[NUMBER_FILTERS[name]], values)
+
+        road_users = filters.get('road_user', [])
+        severity = filters.get('severity', [])
+        if road_users or severity:
+            groups = [g.capitalize() for g in road_users] or ['Persons']
+            outcomes = [s.replace('fatal', 'Killed').replace('injury', 'Injured') for s in severity] or ['Injured', 'Killed']
+            hit = np.zeros(len(self.df), dtype=bool)
+            for group in groups:
+                for outcome in outcomes:
+                    hit |= self.df[f"{group} {outcome}"].to_numpy() > 0
+            mask &= hit
+        return mask
+
+    def normalise(self, endpoint, params):
+        """Validate query-string pairs and return a hashable cache key."""
+        if endpoint not in QUERIES:
+            raise QueryError(f"unknown endpoint /{endpoint}; choose from {sorted(QUERIES)}")
+        filters, k = {}, 10
+        for name, value in params:
+            values = [v.strip() for v in value.split(',') if v.strip()]
+            if name == 'k':
+                try:
+                    k = int(value)
+                except ValueError:
+                    raise QueryError(f"k must be an integer, got {value!r}")
+            elif name in NUMBER_FILTERS:
+                try:
+                    filters[name] = tuple(sorted({int(v) for v in values}))
+                except ValueError:
+                    raise QueryError(f"{name} must be integers, got {value!r}")
+            elif name in CATEGORY_FILTERS:
+                filters[name] = tuple(sorted({v.casefold() for v in values}))
+            elif name == 'road_user' or name == 'severity':
+                allowed = ROAD_USERS if name == 'road_user' else SEVERITIES
+                values = tuple(sorted({v.lower() for v in values}))
+                if not set(values) <= set(allowed):
+                    raise QueryError(f"{name} must be one of {allowed}, got {value!r}")
+                filters[name] = values
+            else:
+                raise QueryError(f"unknown filter {name!r}")
+        return endpoint, tuple(sorted(filters.items())), k
+
+    def _cube_slice(self, filters):
+        """Return the cube sliced by filters, or None if the cube cannot answer them."""
+        if self.cube is None or not set(filters) <= CUBE_FILTERS:
+            return None
+        selection = {}
+        for name, values in filters.items():
+            if name in CATEGORY_FILTERS:
+                col = CATEGORY_FILTERS[name]
+                selection[col] = [self._cube_labels[col][v] for v in values if v in self._cube_labels[col]]
+            else:
+                selection[NUMBER_FILTERS[name]] = list(values)
+        return self.cube.slice(selection)
+
+    def _execute(self, endpoint, filters, k):
+        filters = dict(filters)
+        cube = self._cube_slice(filters) if set(QUERY_TABLES[endpoint]) <= set(CUBE_TABLES) else None
+        if cube is not None:
+            rows = int(cube.measures[COUNT_NAME].sum())
+
+            def table(name):
+                return cube.results([name])[name]
+        else:
+            mask = self.mask(filters)
+            sub = self.df[mask] if filters else self.df
+            rows = int(mask.sum())
+
+            def table(name):
+                return aggregate(sub, [_SPECS[name]])[name]
+        body = {'query': endpoint, 'filters': filters, 'rows': rows,
+                'data': json.loads(QUERIES[endpoint](table, k).to_json(orient='records')) if rows else []}
+        return json.dumps(body).encode()
+
+    def query(self, endpoint, params):
+        """Return the JSON body (bytes) for an endpoint and its query-string pairs."""
+        return self._cached(*self.normalise(endpoint, params))
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            self._latency.setdefault(endpoint, deque(maxlen=_LATENCY_WINDOW)).append(seconds * 1000)
+
+    def metrics(self):
+        """Request counts, latency percentiles (ms) per endpoint and LRU cache statistics."""
+        with self._lock:
+            samples = {name: np.array(values) for name, values in self._latency.items()}
+            requests = dict(self._requests)
+        info = self._cached.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'endpoints': {name: {'requests': requests[name],
+                                 'mean_ms': round(float(ms.mean()), 3),
+                                 'p50_ms': round(float(np.percentile(ms, 50)), 3),
+                                 'p95_ms': round(float(np.percentile(ms, 95)), 3),
+                                 'max_ms': round(float(ms.max()), 3)}
+                          for name, ms in samples.items()},
+            'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize,
+                      'maxsize': info.maxsize, 'hit_rate': round(info.hits / lookups, 4) if lookups else None},
+        }
+
+    def warm(self):
+        """Precompute the unfiltered answer of every endpoint."""
+        for endpoint in QUERIES:
+            self.query(endpoint, [])
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            endpoint = url.path.strip('/')
+            try:
+                if endpoint == 'metrics':
+                    status, body = 200, json.dumps(service.metrics()).encode()
+                else:
+                    status, body = 200, service.query(endpoint, parse_qsl(url.query))
+            except QueryError as exc:
+                status, body = 400, json.dumps({'error': str(exc)}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            if status == 200 and endpoint != 'metrics':
+                service.record(endpoint, time.perf_counter() - start)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(path=None, host='127.0.0.1', port=8050, cache_size=256):
+    """Load the dataset, warm the cache and serve queries until interrupted."""
+    df = load_collisions(path)
+    service = QueryService(df, cache_size, load_cube(path, df=df))
+    service.warm()
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving {len(service.df)} collisions on http://{host}:{server.server_port}/ "
+          f"({', '.join(sorted(QUERIES))}, metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve filtered objective tables as JSON.")
+    parser.add_argument('--input', default=CSV_PATH, help="collisions CSV (default: %(default)s)")
+    parser.add_argument('--host', default='127.0.0.1', help="address to bind (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=8050, help="port to listen on (default: %(default)s)")
+    parser.add_argument('--cache-size', type=int, default=256, help="cached query results (default: %(default)s)")
+    args = parser.parse_args()
+    serve(args.input, args.host, args.port, args.cache_size)
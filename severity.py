@@ -0,0 +1,127 @@
+"""
+Casualty-rate cubes over the per-collision severity codes.
+
+collisions.clean() gives every collision a one-byte 'Severity' code: its class
+(none, injury or fatal) and the road-user groups hurt at that severity. The
+'severity' aggregate of OBJECTIVE_SPECS counts accidents and sums the casualty
+columns per Borough x Hour x Contributing Factor x Severity code, and
+severity_cube() turns that table into a Cube. The fatal and injury analyses
+then roll up any of those dimensions, restricted to a severity class or a
+road-user group, from a few thousand cells instead of filtering the rows.
+
+    python severity.py NYC_Collisions.csv
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME
+from collisions import ROAD_USER_BITS, SEVERITY_CLASS_MASK, SEVERITY_CLASSES
+from cube import Cube
+
+SEVERITY_DIMS = ['Borough', 'Hour', 'Contributing Factor', 'Severity']
+
+
+def severity_class(codes):
+    """Severity class of each code: 0 none, 1 injury, 2 fatal (index into SEVERITY_CLASSES)."""
+    return np.asarray(codes) & SEVERITY_CLASS_MASK
+
+
+def describe_code(code):
+    """Readable form of one severity code, e.g. 'fatal: Pedestrians, Motorists'."""
+    groups = [group for group, bit in ROAD_USER_BITS.items() if code & bit]
+    label = SEVERITY_CLASSES[code & SEVERITY_CLASS_MASK]
+    return f"{label}: {', '.join(groups)}" if groups else label
+
+
+def matching_codes(codes, severity=None, road_user=None):
+    """
+    The codes (of a cube's 'Severity' labels) of the given class and road-user group.
+
+    severity is a SEVERITY_CLASSES name and road_user a ROAD_USER_BITS group;
+    None matches any.
+    """
+    codes = np.asarray(codes)
+    keep = np.ones(len(codes), dtype=bool)
+    if severity is not None:
+        keep &= severity_class(codes) == SEVERITY_CLASSES.index(severity)
+    if road_user is not None:
+        keep &= (codes & ROAD_USER_BITS[road_user]) > 0
+    return codes[keep]
+
+
+def severity_cube(table):
+    """Cube of the 'severity' aggregate table (accident counts and casualty sums per cell)."""
+    return Cube.from_table(table, SEVERITY_DIMS)
+
+
+def select(cube, severity=None, road_user=None):
+    """Sub-cube of the collisions of one severity class and/or road-user group."""
+    return cube.slice({'Severity': matching_codes(cube.labels['Severity'], severity, road_user).tolist()})
+
+
+def fatal_factor_counts(cube, road_user=None):
+    """Fatal accidents per contributing factor, in the layout of the 'fatal_factors' aggregate."""
+    return select(cube, 'fatal', road_user).rollup(['Contributing Factor'], [COUNT_NAME])
+
+
+def casualty_rates(cube, dims, min_accidents=1):
+    """
+    Accident counts and casualty rates per group of dims.
+
+    Injury Rate is persons injured per accident, Fatality Rate persons killed
+    per 1,000 accidents and Fatal Share the percentage of accidents with a
+    fatality. Groups with fewer than min_accidents accidents are left out.
+    """
+    dims = list(dims)
+    table = cube.rollup(dims, [COUNT_NAME, 'Persons Injured', 'Persons Killed'])
+    fatal = select(cube, 'fatal').rollup(dims, [COUNT_NAME]).rename(columns={COUNT_NAME: 'Fatal Accidents'})
+    if dims:
+        table = table.merge(fatal, on=dims, how='left')
+    else:
+        table['Fatal Accidents'] = fatal['Fatal Accidents'].iloc[0]
+    table['Fatal Accidents'] = table['Fatal Accidents'].fillna(0).astype('int64')
+    table = table[table[COUNT_NAME] >= min_accidents].reset_index(drop=True)
+
+    accidents = table[COUNT_NAME]
+    table['Injury Rate'] = table['Persons Injured'] / accidents
+    table['Fatality Rate'] = table['Persons Killed'] / accidents * 1000
+    table['Fatal Share'] = table['Fatal Accidents'] / accidents * 100
+    return table
+
+
+def road_user_profile(cube):
+    """Accidents injuring and killing each road-user group, with the group's share of each class."""
+    codes = cube.rollup(['Severity'], [COUNT_NAME])
+    rows = {}
+    for group in ROAD_USER_BITS:
+        row = {}
+        for severity in ('injury', 'fatal'):
+            in_class = codes['Severity'].isin(matching_codes(codes['Severity'], severity))
+            involved = codes['Severity'].isin(matching_codes(codes['Severity'], severity, group))
+            total = codes.loc[in_class, COUNT_NAME].sum()
+            row[f'{severity.capitalize()} Accidents'] = int(codes.loc[involved, COUNT_NAME].sum())
+            row[f'{severity.capitalize()} Share'] = row[f'{severity.capitalize()} Accidents'] / total * 100 \
+                if total else 0.0
+        rows[group] = row
+    return pd.DataFrame.from_dict(rows, orient='index').rename_axis('Road User').reset_index()
+
+
+if __name__ == '__main__':
+    import time
+
+    from aggregate import OBJECTIVE_SPECS, aggregate_csv
+
+    table = aggregate_csv(sys.argv[1] if len(sys.argv) > 1 else None,
+                          [spec for spec in OBJECTIVE_SPECS if spec.name == 'severity'])['severity']
+    start = time.perf_counter()
+    cube = severity_cube(table)
+    rates = casualty_rates(cube, ['Borough', 'Hour'])
+    elapsed = time.perf_counter() - start
+    print(f"Severity cube: {len(cube)} occupied cells, "
+          f"{', '.join(describe_code(code) for code in cube.labels['Severity'])}")
+    print(rates.sort_values('Fatal Share', ascending=False).head(10).to_string(index=False))
+    print(road_user_profile(cube).round(2).to_string(index=False))
+    print(f"Built the cube and its Borough x Hour rates in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,241 @@
+"""
+Coordinate-based hotspots from the Latitude/Longitude columns.
+
+Points are projected to metres on a local equirectangular plane centred on
+New York City (accurate to well under 1% across the five boroughs), then
+binned into a square grid of a chosen cell size. Cell ids are plain integers,
+so hotspot counts at any resolution are a vectorized bincount over all points.
+PointIndex answers radius queries ("collisions within 200 m of this point")
+with a KD-tree when scipy is installed and a sorted grid-bucket index otherwise,
+and cluster_points() groups dense neighbouring cells into hotspot clusters.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Bounding box of the five boroughs; coordinates outside it (0/0, typos) are ignored
+NYC_BOUNDS = {'Latitude': (40.47, 40.93), 'Longitude': (-74.28, -73.68)}
+
+# Projection origin and metres per degree of latitude
+_LAT0, _LON0 = 40.7, -74.0
+_M_PER_DEG = 111_320.0
+
+# Grid resolutions (cell edge in metres) used by hotspot_grid() by default
+RESOLUTIONS = (100, 250, 1000)
+
+# Offset that keeps grid coordinates non-negative inside NYC_BOUNDS
+_GRID_ORIGIN = 50_000.0
+_GRID_SPAN = 1 << 20
+
+
+def valid_points(df):
+    """Boolean mask of rows whose coordinates fall inside NYC_BOUNDS."""
+    mask = np.ones(len(df), dtype=bool)
+    for col, (low, high) in NYC_BOUNDS.items():
+        values = df[col].to_numpy(dtype='float64')
+        mask &= (values >= low) & (values <= high)
+    return mask
+
+
+def project(lat, lon):
+    """Project degrees to (x, y) metres east/north of the NYC origin."""
+    lat = np.asarray(lat, dtype='float64')
+    lon = np.asarray(lon, dtype='float64')
+    x = (lon - _LON0) * _M_PER_DEG * np.cos(np.radians(_LAT0))
+    y = (lat - _LAT0) * _M_PER_DEG
+    return x, y
+
+
+def unproject(x, y):
+    """Inverse of project(): metres back to (lat, lon) degrees."""
+    lat = np.asarray(y) / _M_PER_DEG + _LAT0
+    lon = np.asarray(x) / (_M_PER_DEG * np.cos(np.radians(_LAT0))) + _LON0
+    return lat, lon
+
+
+def grid_cells(df, cell_size):
+    """Return the integer grid cell of each row at cell_size metres (-1 for rows without valid coordinates)."""
+    mask = valid_points(df)
+    x, y = project(df['Latitude'].to_numpy()[mask], df['Longitude'].to_numpy()[mask])
+    col = ((x + _GRID_ORIGIN) // cell_size).astype('int64')
+    row = ((y + _GRID_ORIGIN) // cell_size).astype('int64')
+    cells = np.full(len(df), -1, dtype='int64')
+    cells[mask] = row * _GRID_SPAN + col
+    return cells
+
+
+def cell_center(cells, cell_size):
+    """Return (lat, lon) of the centre of each grid cell id."""
+    cells = np.asarray(cells, dtype='int64')
+    x = (cells % _GRID_SPAN + 0.5) * cell_size - _GRID_ORIGIN
+    y = (cells // _GRID_SPAN + 0.5) * cell_size - _GRID_ORIGIN
+    return unproject(x, y)
+
+
+def top_cells(df, cell_size=250, k=20):
+    """
+    Return the k densest grid cells at cell_size metres.
+
+    Each row carries the cell id, its centre, the accident count, the injured and
+    killed totals and the most frequent 'Street Name' in the cell as a label.
+    """
+    cells = grid_cells(df, cell_size)
+    located = cells >= 0
+    ids, slot = np.unique(cells[located], return_inverse=True)
+    counts = np.bincount(slot, minlength=len(ids))
+    top = np.argsort(counts, kind='stable')[::-1][:k]
+
+    lat, lon = cell_center(ids[top], cell_size)
+    table = pd.DataFrame({
+        'Cell': ids[top],
+        'Latitude': lat,
+        'Longitude': lon,
+        'Accident_Count': counts[top],
+    })
+    for col in ['Persons Injured', 'Persons Killed']:
+        sums = np.bincount(slot, weights=df[col].to_numpy()[located], minlength=len(ids))
+        table[col] = sums[top].astype('int64')
+
+    # Label each top cell with its most common street, looking only at rows in those cells
+    in_top = np.isin(slot, top)
+    streets = pd.DataFrame({'Cell': ids[slot[in_top]],
+                            'Street Name': df['Street Name'].iloc[np.flatnonzero(located)[in_top]].to_numpy()})
+    labels = streets.groupby('Cell')['Street Name'].agg(lambda s: s.value_counts().index[0])
+    table['Street Name'] = table['Cell'].map(labels)
+    return table
+
+
+def hotspot_grid(df, resolutions=RESOLUTIONS, k=20):
+    """Return {cell_size: top_cells table} for each grid resolution."""
+    return {size: top_cells(df, size, k) for size in resolutions}
+
+
+class PointIndex:
+    """
+    Radius queries over the collision points of a frame.
+
+    Results are positional row indices into the frame the index was built from.
+    Uses scipy's cKDTree when available, otherwise buckets points into a
+    sorted square grid and only measures distances in neighbouring buckets.
+    """
+
+    def __init__(self, df, bucket_size=200):
+        mask = valid_points(df)
+        self.rows = np.flatnonzero(mask)
+        x, y = project(df['Latitude'].to_numpy()[mask], df['Longitude'].to_numpy()[mask])
+        self.xy = np.column_stack([x, y])
+        try:
+            from scipy.spatial import cKDTree
+        except ImportError:
+            self.tree = None
+            self.bucket_size = bucket_size
+            buckets = self._bucket(self.xy)
+            self.order = np.argsort(buckets, kind='stable')
+            self.buckets = buckets[self.order]
+        else:
+            self.tree = cKDTree(self.xy)
+
+    def _bucket(self, xy):
+        cells = ((xy + _GRID_ORIGIN) // self.bucket_size).astype('int64')
+        return cells[:, 1] * _GRID_SPAN + cells[:, 0]
+
+    def within(self, lat, lon, radius):
+        """Return the row indices of collisions within radius metres of (lat, lon), nearest first."""
+        x, y = project(lat, lon)
+        point = np.array([float(x), float(y)])
+        if self.tree is not None:
+            found = np.asarray(self.tree.query_ball_point(point, radius), dtype='int64')
+        else:
+            reach = int(np.ceil(radius / self.bucket_size))
+            center = self._bucket(point[None, :])[0]
+            candidates = []
+            for dy in range(-reach, reach + 1):
+                first = center + dy * _GRID_SPAN - reach
+                lo = np.searchsorted(self.buckets, first, side='left')
+                hi = np.searchsorted(self.buckets, first + 2 * reach, side='right')
+                candidates.append(self.order[lo:hi])
+            found = np.concatenate(candidates)
+        distances = np.hypot(*(self.xy[found] - point).T)
+        keep = distances <= radius
+        found, distances = found[keep], distances[keep]
+        return self.rows[found[np.argsort(distances, kind='stable')]]
+
+    def count_within(self, lat, lon, radius):
+        """Number of collisions within radius metres of (lat, lon)."""
+        return len(self.within(lat, lon, radius))
+
+
+def cluster_points(df, eps=100, min_samples=25):
+    """
+    Grid-accelerated density clustering of the collision points.
+
+    Points are binned into eps-sized cells; a cell holding at least min_samples
+    collisions is dense, and 8-connected dense cells form one cluster (a grid
+    approximation of DBSCAN with radius eps). Work is linear in the number of
+    points plus the number of occupied cells, with no pairwise distances.
+    Returns an int64 cluster label per row, -1 for noise or missing coordinates.
+    """
+    cells = grid_cells(df, eps)
+    located = np.flatnonzero(cells >= 0)
+    ids, slot = np.unique(cells[located], return_inverse=True)
+    dense = ids[np.bincount(slot, minlength=len(ids)) >= min_samples]
+    labels = np.full(len(df), -1, dtype='int64')
+    if not len(dense):
+        return labels
+
+    # Label propagation over neighbouring dense cells with pointer jumping;
+    # each cell ends up pointing at one representative cell of its component
+    parent = np.arange(len(dense))
+    offsets = [dr * _GRID_SPAN + dc for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+    while True:
+        updated = parent.copy()
+        for offset in offsets:
+            neighbour = dense + offset
+            pos = np.minimum(np.searchsorted(dense, neighbour), len(dense) - 1)
+            hit = dense[pos] == neighbour
+            updated[hit] = np.minimum(updated[hit], parent[pos[hit]])
+        updated = updated[updated]
+        if np.array_equal(updated, parent):
+            break
+        parent = updated
+    _, component = np.unique(parent, return_inverse=True)
+
+    pos = np.minimum(np.searchsorted(dense, cells[located]), len(dense) - 1)
+    in_dense = dense[pos] == cells[located]
+    labels[located[in_dense]] = component[pos[in_dense]]
+    return labels
+
+
+def cluster_summary(df, labels):
+    """
+    Summarise clusters from cluster_points(): centroid, size and severity, largest first.
+
+    Severity columns are the injured/killed totals and casualties per collision.
+    """
+    member = np.flatnonzero(labels >= 0)
+    cluster = labels[member]
+    n = int(cluster.max()) + 1 if len(cluster) else 0
+    counts = np.bincount(cluster, minlength=n)
+
+    def total(col):
+        return np.bincount(cluster, weights=df[col].to_numpy(dtype='float64')[member], minlength=n)
+
+    summary = pd.DataFrame({
+        'Cluster': np.arange(n),
+        'Latitude': total('Latitude') / np.maximum(counts, 1),
+        'Longitude': total('Longitude') / np.maximum(counts, 1),
+        'Accident_Count': counts,
+        'Persons Injured': total('Persons Injured').astype('int64'),
+        'Persons Killed': total('Persons Killed').astype('int64'),
+    })
+    summary['Casualties_Per_Accident'] = ((summary['Persons Injured'] + summary['Persons Killed'])
+                                          / np.maximum(counts, 1))
+
+    streets = pd.DataFrame({'Cluster': cluster, 'Street Name': df['Street Name'].iloc[member].to_numpy()})
+    summary['Street Name'] = streets.groupby('Cluster')['Street Name'].agg(lambda s: s.value_counts().index[0])
+    return summary.sort_values('Accident_Count', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def spatial_hotspots(df, eps=100, min_samples=25, k=20):
+    """Return the k largest density clusters of collisions."""
+    return cluster_summary(df, cluster_points(df, eps, min_samples)).head(k)
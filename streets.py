@@ -0,0 +1,212 @@
+"""
+Street name normalization and interning.
+
+The raw 'Street Name' column spells one street in several ways ('ATLANTIC
+AVENUE', 'ATLANTIC AVE', 'Atlantic Avenue ', 'E 42 ST' / 'EAST 42ND STREET'),
+which splits its accidents across several hotspots. normalize_street() maps a
+name to one canonical spelling, and StreetNames interns canonical names as
+small integer street IDs. The rules run once per distinct raw string: a
+registry remembers every raw spelling it has seen with its ID and is saved as
+JSON in the cache directory, so later loads only normalize names that are new.
+
+An encoded column is a categorical whose categories are the registry's names
+in ID order, so its codes are the street IDs and groupbys on it run on those
+integers. IDs are stable across runs that share the registry file; tables built
+in separate processes (parallel.py workers) merge on the names, not the IDs.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Bump whenever the rules below change so saved registries are rebuilt
+STREET_RULES_VERSION = 1
+
+# Abbreviated street types and the word they stand for (anywhere but the first word)
+STREET_TYPES = {
+    'ST': 'STREET', 'STR': 'STREET', 'AVE': 'AVENUE', 'AV': 'AVENUE', 'AVEN': 'AVENUE',
+    'BLVD': 'BOULEVARD', 'BLV': 'BOULEVARD', 'BOULV': 'BOULEVARD', 'RD': 'ROAD', 'PL': 'PLACE',
+    'DR': 'DRIVE', 'LN': 'LANE', 'CT': 'COURT', 'TER': 'TERRACE', 'TERR': 'TERRACE', 'CIR': 'CIRCLE',
+    'PKWY': 'PARKWAY', 'PKY': 'PARKWAY', 'PARKWY': 'PARKWAY', 'EXPY': 'EXPRESSWAY', 'EXPWY': 'EXPRESSWAY',
+    'EXWY': 'EXPRESSWAY', 'EXPRESSWY': 'EXPRESSWAY', 'HWY': 'HIGHWAY', 'TPKE': 'TURNPIKE', 'BR': 'BRIDGE',
+    'BRG': 'BRIDGE', 'SQ': 'SQUARE', 'PLZ': 'PLAZA', 'HTS': 'HEIGHTS', 'TUNL': 'TUNNEL',
+}
+
+# Compass prefixes ('W 42 ST'); only expanded as the first of several words, since 'AVENUE N' is a street
+DIRECTIONS = {'N': 'NORTH', 'S': 'SOUTH', 'E': 'EAST', 'W': 'WEST'}
+
+# Names that mean "no street recorded"
+MISSING_NAMES = {'', 'UNKNOWN', 'NAN', 'NONE', 'N/A', 'NA'}
+
+# File name of the saved registry inside a cache directory
+REGISTRY_NAME = f'street_names.v{STREET_RULES_VERSION}.json'
+
+_ORDINAL = re.compile(r'^(\d+)(ST|ND|RD|TH)$')
+_SEPARATORS = re.compile(r"[.,'`]")
+
+
+def normalize_street(name):
+    """
+    Canonical spelling of a street name.
+
+    Upper-cases and collapses whitespace, drops periods, commas and
+    apostrophes, strips ordinal suffixes from numbers ('42ND' -> '42'), expands
+    a leading compass letter and abbreviated street types, and reads a leading
+    'ST' before a word ('ST MARKS PL') as 'SAINT'. Missing names become 'Unknown'.
+    """
+    words = _SEPARATORS.sub('', str(name).upper()).split()
+    if ' '.join(words) in MISSING_NAMES:
+        return 'Unknown'
+    canonical = []
+    for i, word in enumerate(words):
+        ordinal = _ORDINAL.match(word)
+        if ordinal:
+            word = ordinal.group(1)
+        elif i == 0 and len(words) > 1 and word in DIRECTIONS:
+            word = DIRECTIONS[word]
+        elif i == 0 and word == 'ST' and len(words) > 1 and words[1][0].isalpha():
+            word = 'SAINT'
+        elif i > 0:
+            word = STREET_TYPES.get(word, word)
+        canonical.append(word)
+    return ' '.join(canonical)
+
+
+class StreetNames:
+    """
+    Registry interning street names as integer IDs.
+
+    names[id] is the canonical name of each ID and raw maps every raw spelling
+    seen so far to its ID, so normalize_street() runs once per raw string.
+    added holds the raw spellings first seen by this process with their
+    canonical names, for worker processes to hand back (see pop_added()).
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.names = []
+        self.ids = {}
+        self.raw = {}
+        self.added = {}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        """Registry saved at path, or an empty one bound to path if it is missing or from older rules."""
+        registry = cls(path)
+        try:
+            with open(path) as fh:
+                saved = json.load(fh)
+        except (OSError, ValueError):
+            return registry
+        if saved.get('version') == STREET_RULES_VERSION:
+            registry.names = saved['names']
+            registry.ids = {name: i for i, name in enumerate(registry.names)}
+            registry.raw = saved['raw']
+        return registry
+
+    def save(self, path=None):
+        """Write the registry as JSON if it changed; returns whether it was written."""
+        path = path or self.path
+        if not path or not self.dirty:
+            return False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump({'version': STREET_RULES_VERSION, 'names': self.names, 'raw': self.raw}, fh)
+        os.replace(tmp, path)
+        self.dirty = False
+        return True
+
+    def intern(self, raw_names):
+        """Return the street ID of each raw name, normalizing only names not seen before."""
+        ids = np.empty(len(raw_names), dtype='int32')
+        for i, raw in enumerate(raw_names):
+            street = self.raw.get(raw)
+            if street is None:
+                name = normalize_street(raw)
+                street = self.ids.get(name)
+                if street is None:
+                    street = self.ids[name] = len(self.names)
+                    self.names.append(name)
+                self.raw[raw] = street
+                self.added[raw] = name
+                self.dirty = True
+            ids[i] = street
+        return ids
+
+    def pop_added(self):
+        """Return and forget the {raw: canonical name} entries added since the last call."""
+        added, self.added = self.added, {}
+        return added
+
+    def learn(self, entries):
+        """Add {raw: canonical name} entries normalized by another process (e.g. a parallel.py worker)."""
+        for raw, name in entries.items():
+            if raw not in self.raw:
+                street = self.ids.get(name)
+                if street is None:
+                    street = self.ids[name] = len(self.names)
+                    self.names.append(name)
+                self.raw[raw] = street
+                self.dirty = True
+
+    def encode(self, series):
+        """
+        Canonical form of a column of raw names, as a categorical coded by street ID.
+
+        The categories are the registry's names in ID order, so the category
+        code of every row is its street ID. Only the distinct raw values are
+        looked up and the rows are re-coded with one take(); missing values
+        become 'Unknown'.
+        """
+        values = series.astype('category')
+        codes = values.cat.codes.to_numpy()
+        category_ids = self.intern(list(values.cat.categories.astype(str)) + ['Unknown'])
+        ids = category_ids.take(np.where(codes >= 0, codes, len(category_ids) - 1))
+        return pd.Categorical.from_codes(ids, categories=pd.Index(self.names))
+
+    def labels(self, ids):
+        """Canonical names of the given street IDs."""
+        return np.asarray(self.names, dtype=object)[np.asarray(ids, dtype='int64')]
+
+
+def intersection_labels(street, cross):
+    """
+    Unordered intersection of each row's 'Street Name' and 'Cross Street', as a categorical.
+
+    street and cross are encoded columns (see StreetNames.encode). Each
+    intersection is labelled 'A & B' with the two canonical names in
+    alphabetical order, so (A, B) and (B, A) rows share one category and the
+    label does not depend on street IDs. Rows with an unknown street or cross
+    street, or the same street on both sides, are missing. Pairs are built on
+    the integer codes; labels are only formatted for the distinct pairs.
+    """
+    names = street.cat.categories
+    extra = cross.cat.categories[~cross.cat.categories.isin(names)]
+    names = names.append(extra)
+    street_ids = street.cat.codes.to_numpy().astype('int64')
+    cross_ids = names.get_indexer(cross.cat.categories).take(cross.cat.codes.to_numpy())
+    cross_ids[cross.cat.codes.to_numpy() < 0] = -1
+
+    valid = (street_ids >= 0) & (cross_ids >= 0) & (street_ids != cross_ids)
+    if 'Unknown' in names:
+        unknown = names.get_loc('Unknown')
+        valid &= (street_ids != unknown) & (cross_ids != unknown)
+    low = np.minimum(street_ids, cross_ids)[valid]
+    high = np.maximum(street_ids, cross_ids)[valid]
+    pairs, positions = np.unique(low * len(names) + high, return_inverse=True)
+
+    first = np.asarray(names, dtype=object)[pairs // len(names)]
+    second = np.asarray(names, dtype=object)[pairs % len(names)]
+    swap = second < first
+    first[swap], second[swap] = second[swap], first[swap]
+    labels = pd.Index(first + ' & ' + second)
+    order = labels.argsort()
+
+    codes = np.full(len(street_ids), -1, dtype='int32')
+    codes[valid] = np.argsort(order).take(positions)
+    return pd.Categorical.from_codes(codes, categories=labels.take(order))
@@ -0,0 +1,208 @@
+"""
+Synthetic collisions in the schema of NYC_Collisions_data_dictionary.csv.
+
+The real CSV is not part of the repository, so benchmarks and experiments use
+generated data with the same columns, formats and roughly the same shape:
+seasonal and weekday date weights, rush-hour peaks, the borough mix, a long
+tail of street names (including spelling variants of the busy ones), the
+common contributing factors and vehicle types, rare fatalities and a small
+share of missing or invalid values. Rows are produced in chunks, so files of
+tens of millions of rows are written with bounded memory.
+
+    python synthetic.py 1000000 NYC_Collisions_1M.csv [--seed 0]
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Collision ID', 'Date', 'Time', 'Borough', 'Street Name', 'Cross Street',
+           'Latitude', 'Longitude', 'Contributing Factor', 'Vehicle Type',
+           'Persons Injured', 'Persons Killed', 'Pedestrians Injured', 'Pedestrians Killed',
+           'Cyclists Injured', 'Cyclists Killed', 'Motorists Injured', 'Motorists Killed']
+
+# Period covered by the published dataset
+START, END = '2021-01-01', '2023-04-30'
+
+# Share of collisions per borough (None = not recorded) and the centre/spread of its coordinates
+BOROUGHS = {
+    'Brooklyn': (0.27, 40.65, -73.95, 0.045),
+    'Queens': (0.23, 40.72, -73.82, 0.060),
+    'Manhattan': (0.13, 40.78, -73.97, 0.035),
+    'Bronx': (0.12, 40.84, -73.88, 0.035),
+    'Staten Island': (0.03, 40.58, -74.14, 0.045),
+    None: (0.22, 40.71, -73.92, 0.080),
+}
+
+# Relative collisions per month (January first) and per weekday (Monday first)
+MONTH_WEIGHTS = [0.86, 0.82, 0.95, 0.97, 1.05, 1.08, 1.02, 1.01, 1.04, 1.06, 1.02, 0.97]
+WEEKDAY_WEIGHTS = [1.00, 1.00, 1.01, 1.03, 1.10, 0.97, 0.85]
+
+# Relative collisions per hour of the day, with morning and afternoon rush peaks
+HOUR_WEIGHTS = [2.9, 1.6, 1.3, 1.1, 1.3, 1.6, 2.4, 3.4, 5.0, 4.8, 4.4, 4.6,
+                5.0, 5.3, 6.1, 6.4, 6.5, 6.6, 6.0, 5.0, 4.3, 3.8, 3.3, 3.0]
+
+CONTRIBUTING_FACTORS = [
+    'Driver Inattention/Distraction', 'Unspecified', 'Failure to Yield Right-of-Way',
+    'Following Too Closely', 'Passing or Lane Usage Improper', 'Unsafe Speed',
+    'Passing Too Closely', 'Backing Unsafely', 'Traffic Control Disregarded', 'Other Vehicular',
+    'Unsafe Lane Changing', 'Turning Improperly', 'Driver Inexperience', 'Alcohol Involvement',
+    'Reaction to Uninvolved Vehicle', 'View Obstructed/Limited', 'Pavement Slippery',
+    'Pedestrian/Bicyclist/Other Pedestrian Error/Confusion', 'Aggressive Driving/Road Rage',
+    'Oversized Vehicle', 'Brakes Defective', 'Fell Asleep', 'Steering Failure',
+    'Passenger Distraction', 'Obstruction/Debris', 'Outside Car Distraction', 'Glare',
+    'Lost Consciousness', 'Illnes', 'Tire Failure/Inadequate', 'Fatigued/Drowsy',
+    'Driverless/Runaway Vehicle', 'Failure to Keep Right', 'Pavement Defective',
+    'Drugs (illegal)', 'Animals Action', 'Cell Phone (hand-Held)', 'Accelerator Defective',
+    'Lane Marking Improper/Inadequate', 'Traffic Control Device Improper/Non-Working',
+    'Headlights Defective', 'Other Lighting Defects', 'Using On Board Navigation Device',
+    'Tinted Windows', 'Eating or Drinking', 'Vehicle Vandalism', 'Windshield Inadequate',
+    'Texting', 'Prescription Medication', 'Cell Phone (hands-free)', 'Shoulders Defective/Improper',
+    'Listening/Using Headphones', 'Other Electronic Device',
+]
+
+VEHICLE_TYPES = [
+    'Sedan', 'Station Wagon/Sport Utility Vehicle', 'Taxi', 'Pick-up Truck', 'Box Truck', 'Bus',
+    'Bike', 'Tractor Truck Diesel', 'Motorcycle', 'Van', 'E-Bike', 'E-Scooter', 'Ambulance',
+    'Dump', 'Convertible', 'Moped', 'Garbage or Refuse', 'Flat Bed', 'Carry All', 'Tow Truck / Wrecker',
+    'Chassis Cab', 'Motorscooter', 'Tanker', 'Fire Truck', 'Concrete Mixer', 'Armored Truck',
+]
+
+# Busy named roads; the rest of the street names are numbered streets and avenues
+NAMED_STREETS = [
+    'BELT PARKWAY', 'BROOKLYN QUEENS EXPRESSWAY', 'BROADWAY', 'ATLANTIC AVENUE', 'LONG ISLAND EXPRESSWAY',
+    'GRAND CENTRAL PKWY', 'MAJOR DEEGAN EXPRESSWAY', 'CROSS BRONX EXPY', 'FDR DRIVE', 'NORTHERN BOULEVARD',
+    'FLATBUSH AVENUE', 'QUEENS BOULEVARD', 'VAN WYCK EXPWY', 'BRUCKNER BOULEVARD', 'JAMAICA AVENUE',
+    'OCEAN PARKWAY', 'GRAND CONCOURSE', 'LINDEN BOULEVARD', 'EASTERN PARKWAY', 'ROCKAWAY BOULEVARD',
+    'HYLAN BOULEVARD', 'STATEN ISLAND EXPRESSWAY', 'WEST STREET', 'AMSTERDAM AVENUE', 'HARLEM RIVER DRIVE',
+]
+
+# Probability that a casualty of each road-user group is recorded on a collision
+INJURY_RATES = {'Pedestrians': 0.055, 'Cyclists': 0.035, 'Motorists': 0.33}
+FATALITY_RATES = {'Pedestrians': 0.0006, 'Cyclists': 0.0002, 'Motorists': 0.0004}
+
+
+def _street_names(rng, count=6000):
+    """Street name vocabulary with Zipf-like weights; busy names also appear in spelling variants."""
+    numbered = [f"{n} {kind}" for kind in ('STREET', 'AVENUE', 'ROAD', 'PLACE') for n in range(1, 1 + count // 4)]
+    names = NAMED_STREETS + numbered[:count - len(NAMED_STREETS)]
+    weights = 1.0 / np.arange(1, len(names) + 1) ** 1.05
+    rng.shuffle(weights[len(NAMED_STREETS):])
+
+    # Abbreviated, title-case and padded spellings of the busiest names, as in the raw data
+    variants, variant_weights = [], []
+    for name, weight in zip(names[:len(NAMED_STREETS)], weights[:len(NAMED_STREETS)]):
+        for variant in (name.replace('AVENUE', 'AVE').replace('BOULEVARD', 'BLVD'), name.title(), name + ' '):
+            if variant != name:
+                variants.append(variant)
+                variant_weights.append(weight * 0.15)
+    names = np.array(names + variants, dtype=object)
+    weights = np.concatenate([weights, variant_weights])
+    return names, weights / weights.sum()
+
+
+def _day_weights(days):
+    months = days.month.to_numpy() - 1
+    weekdays = days.dayofweek.to_numpy()
+    weights = np.take(MONTH_WEIGHTS, months) * np.take(WEEKDAY_WEIGHTS, weekdays)
+    return weights / weights.sum()
+
+
+def _choice(rng, values, p, n):
+    """rng.choice over a small vocabulary, returned as an object array (None stays missing)."""
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+
+def _zipf_weights(count, exponent=1.0):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate(n, seed=0, first_id=4_000_000, invalid_rate=0.0005):
+    """Return n synthetic collisions with the raw CSV's columns and formats."""
+    return next(generate_chunks(n, seed=seed, chunk_rows=n, first_id=first_id, invalid_rate=invalid_rate))
+
+
+def generate_chunks(n, seed=0, chunk_rows=1_000_000, first_id=4_000_000, invalid_rate=0.0005):
+    """Yield n synthetic collisions as frames of at most chunk_rows rows."""
+    rng = np.random.default_rng(seed)
+    days = pd.date_range(START, END, freq='D')
+    day_strings = np.asarray(days.strftime('%Y-%m-%d'), dtype=object)
+    day_p = _day_weights(days)
+    hour_p = np.asarray(HOUR_WEIGHTS) / sum(HOUR_WEIGHTS)
+    minute_strings = np.array([f"{h:02d}:{m:02d}:00" for h in range(24) for m in range(60)], dtype=object)
+    streets, street_p = _street_names(rng)
+    boroughs = list(BOROUGHS)
+    borough_p = np.array([spec[0] for spec in BOROUGHS.values()])
+    borough_p /= borough_p.sum()
+    centres = np.array([spec[1:] for spec in BOROUGHS.values()])
+    factor_p = _zipf_weights(len(CONTRIBUTING_FACTORS), 1.3)
+    vehicle_p = _zipf_weights(len(VEHICLE_TYPES), 1.6)
+
+    for start in range(0, n, chunk_rows):
+        size = min(chunk_rows, n - start)
+        chunk = {'Collision ID': np.arange(first_id + start, first_id + start + size, dtype='int64')}
+
+        chunk['Date'] = day_strings[rng.choice(len(days), size=size, p=day_p)]
+        minutes = rng.choice(24, size=size, p=hour_p) * 60 + rng.integers(0, 60, size)
+        # Reported times cluster on the hour and half hour
+        rounded = rng.random(size) < 0.25
+        minutes[rounded] -= minutes[rounded] % 30
+        chunk['Time'] = minute_strings[minutes]
+
+        borough = rng.choice(len(boroughs), size=size, p=borough_p)
+        chunk['Borough'] = np.asarray(boroughs, dtype=object)[borough]
+        chunk['Street Name'] = streets[rng.choice(len(streets), size=size, p=street_p)]
+        cross = streets[rng.choice(len(streets), size=size, p=street_p)]
+        cross[rng.random(size) < 0.35] = None
+        chunk['Cross Street'] = cross
+
+        lat = centres[borough, 0] + rng.normal(0, 1, size) * centres[borough, 2]
+        lon = centres[borough, 1] + rng.normal(0, 1, size) * centres[borough, 2] * 1.3
+        missing = rng.random(size) < 0.07
+        lat[missing], lon[missing] = np.nan, np.nan
+        zero = rng.random(size) < 0.005
+        lat[zero], lon[zero] = 0.0, 0.0
+        chunk['Latitude'], chunk['Longitude'] = lat.round(6), lon.round(6)
+
+        chunk['Contributing Factor'] = _choice(rng, CONTRIBUTING_FACTORS, factor_p, size)
+        vehicle = _choice(rng, VEHICLE_TYPES, vehicle_p, size)
+        vehicle[rng.random(size) < 0.01] = None
+        chunk['Vehicle Type'] = vehicle
+
+        injured, killed = {}, {}
+        for group, rate in INJURY_RATES.items():
+            hit = rng.random(size) < rate
+            injured[group] = np.where(hit, 1 + rng.poisson(0.25 if group == 'Motorists' else 0.05, size), 0)
+            killed[group] = (rng.random(size) < FATALITY_RATES[group]).astype('int64')
+        chunk['Persons Injured'] = sum(injured.values())
+        chunk['Persons Killed'] = sum(killed.values())
+        for group in INJURY_RATES:
+            chunk[f'{group} Injured'] = injured[group]
+            chunk[f'{group} Killed'] = killed[group]
+
+        frame = pd.DataFrame(chunk, columns=COLUMNS)
+        # A few malformed dates and times, which clean() is expected to drop
+        if invalid_rate:
+            bad = np.flatnonzero(rng.random(size) < invalid_rate)
+            frame.loc[bad[::2], 'Date'] = '2021-02-30'
+            frame.loc[bad[1::2], 'Time'] = '24:61:00'
+        yield frame
+
+
+def write_csv(path, n, seed=0, chunk_rows=1_000_000):
+    """Write n synthetic collisions to path in chunks and return the path."""
+    for i, chunk in enumerate(generate_chunks(n, seed=seed, chunk_rows=chunk_rows)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic collisions CSV.")
+    parser.add_argument('rows', type=lambda s: int(float(s)), help="number of collisions, e.g. 1e6")
+    parser.add_argument('output', help="CSV file to write")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default: %(default)s)")
+    args = parser.parse_args()
+    write_csv(args.output, args.rows, args.seed)
+    print(f"Wrote {args.rows} synthetic collisions to {args.output}")
@@ -0,0 +1,141 @@
+"""
+Temporal-spatial correlation exploration (objective 9) on a count tensor.
+
+The 'borough_month_day_hour' aggregate of OBJECTIVE_SPECS counts accidents
+per Borough x Month x DayOfWeek x Hour in the same pass as every other table;
+count_tensor() lays it out as a dense (boroughs, 12, 7, 24) array. Every
+borough-level statistic is then a batched NumPy reduction over that array:
+the Day x Hour percentage profile behind each borough's heatmap, correlations
+between the boroughs' monthly, hourly and weekly profiles, and the share of
+accidents in each part of the day (rush hours, midday, night), so nothing is
+re-scanned per borough.
+
+    python temporal.py NYC_Collisions.csv
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME
+from collisions import DAY_ORDER
+
+# Parts of the day, as half-open hour ranges
+SEGMENTS = {
+    'Night': (0, 6),
+    'Morning Rush': (6, 10),
+    'Midday': (10, 16),
+    'Evening Rush': (16, 20),
+    'Evening': (20, 24),
+}
+
+# Profiles compared by profile_correlations(): the tensor axes each one keeps
+PROFILE_AXES = {'Month': (1,), 'Hour': (3,), 'DayOfWeek x Hour': (2, 3)}
+
+# Weekdays are the first five entries of DAY_ORDER
+_WEEKDAYS = 5
+
+
+def count_tensor(table):
+    """
+    Dense (borough, month, day of week, hour) accident counts of the 'borough_month_day_hour' table.
+
+    Returns (boroughs, tensor): the Index of borough names and an int64 array
+    of shape (len(boroughs), 12, 7, 24), months and days in calendar order.
+    """
+    borough_codes, boroughs = pd.factorize(table['Borough'].astype(str), sort=True)
+    day_codes = pd.Categorical(table['DayOfWeek'].astype(str), categories=DAY_ORDER).codes
+    tensor = np.zeros((len(boroughs), 12, len(DAY_ORDER), 24), dtype='int64')
+    tensor[borough_codes, table['Month'].to_numpy().astype('int64') - 1, day_codes,
+           table['Hour'].to_numpy().astype('int64')] = table[COUNT_NAME].to_numpy()
+    return pd.Index(boroughs, name='Borough'), tensor
+
+
+def day_hour_profiles(tensor):
+    """
+    (borough, day, hour) percentages with each borough's days normalised to 100%.
+
+    The batched form of aggregate.day_hour_percentages(): element [b] is the
+    heatmap table of borough b.
+    """
+    day_hour = tensor.sum(axis=1).astype('float64')
+    totals = day_hour.sum(axis=2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.nan_to_num(day_hour / totals * 100)
+
+
+def borough_heatmaps(boroughs, tensor):
+    """Day x Hour percentage table of every borough, as {borough: DataFrame} in the heatmap layout."""
+    profiles = day_hour_profiles(tensor)
+    columns = pd.Index(range(24), name='Hour')
+    index = pd.Index(DAY_ORDER, name='DayOfWeek')
+    return {borough: pd.DataFrame(profiles[b], index=index, columns=columns) for b, borough in enumerate(boroughs)}
+
+
+def profile_correlations(boroughs, tensor, profile='DayOfWeek x Hour'):
+    """
+    Pearson correlation between the boroughs' accident profiles.
+
+    Each borough's profile is its share of accidents over the PROFILE_AXES of
+    profile (summed over the other axes), so the correlation compares the
+    shape of the profiles, not the boroughs' volumes.
+    """
+    keep = PROFILE_AXES[profile]
+    summed = tensor.sum(axis=tuple(axis for axis in (1, 2, 3) if axis not in keep))
+    flat = summed.reshape(len(boroughs), -1).astype('float64')
+    shares = flat / np.maximum(flat.sum(axis=1, keepdims=True), 1)
+    return pd.DataFrame(np.corrcoef(shares), index=boroughs, columns=boroughs)
+
+
+def segment_shares(boroughs, tensor):
+    """
+    Percentage of each borough's weekday and weekend accidents in each SEGMENTS part of the day.
+
+    Columns are a (Days, Segment) MultiIndex; each borough's weekday and
+    weekend shares each add up to 100.
+    """
+    onehot = np.zeros((24, len(SEGMENTS)))
+    for s, (start, end) in enumerate(SEGMENTS.values()):
+        onehot[start:end, s] = 1
+    day_hour = tensor.sum(axis=1).astype('float64')
+    parts = {'Weekday': day_hour[:, :_WEEKDAYS].sum(axis=1), 'Weekend': day_hour[:, _WEEKDAYS:].sum(axis=1)}
+    columns, blocks = [], []
+    for days, hours in parts.items():
+        counts = hours @ onehot
+        blocks.append(counts / np.maximum(counts.sum(axis=1, keepdims=True), 1) * 100)
+        columns.extend((days, segment) for segment in SEGMENTS)
+    return pd.DataFrame(np.hstack(blocks), index=boroughs,
+                        columns=pd.MultiIndex.from_tuples(columns, names=['Days', 'Segment']))
+
+
+def peak_hours(boroughs, tensor):
+    """Each borough's busiest hour on weekdays and at weekends, with its share of those days' accidents."""
+    day_hour = tensor.sum(axis=1).astype('float64')
+    table = {}
+    for days, hours in (('Weekday', day_hour[:, :_WEEKDAYS].sum(axis=1)),
+                        ('Weekend', day_hour[:, _WEEKDAYS:].sum(axis=1))):
+        peak = hours.argmax(axis=1)
+        table[f'{days} Peak Hour'] = peak
+        table[f'{days} Peak Share'] = hours[np.arange(len(peak)), peak] / np.maximum(hours.sum(axis=1), 1) * 100
+    return pd.DataFrame(table, index=boroughs)
+
+
+if __name__ == '__main__':
+    import time
+
+    from aggregate import OBJECTIVE_SPECS, aggregate_csv
+
+    table = aggregate_csv(sys.argv[1] if len(sys.argv) > 1 else None,
+                          [spec for spec in OBJECTIVE_SPECS if spec.name == 'borough_month_day_hour'])
+    start = time.perf_counter()
+    boroughs, tensor = count_tensor(table['borough_month_day_hour'])
+    heatmaps = borough_heatmaps(boroughs, tensor)
+    correlations = {profile: profile_correlations(boroughs, tensor, profile) for profile in PROFILE_AXES}
+    shares = segment_shares(boroughs, tensor)
+    elapsed = time.perf_counter() - start
+    for profile, matrix in correlations.items():
+        print(f"Correlation of the boroughs' {profile} profiles:")
+        print(matrix.round(3).to_string())
+    print(shares.round(1).to_string())
+    print(f"Built the {tensor.shape} tensor, {len(heatmaps)} heatmaps and the statistics in {elapsed * 1000:.1f} ms")
@@ -0,0 +1,59 @@
+"""
+Spike detection on synthetic data: no alerts without spikes, injected spikes are found,
+and the two-sided baseline handles level changes and the ends of a series.
+
+    python -m pytest test_anomaly.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import collisions
+from aggregate import COUNT_NAME, OBJECTIVE_SPECS, aggregate_csv
+from anomaly import ANOMALY_TABLES, WEEK_WINDOW, detect, rolling_anomalies
+from synthetic import write_csv
+
+
+@pytest.fixture(scope='module')
+def null_tables(tmp_path_factory):
+    """Anomaly tables of 300,000 synthetic collisions, which have seasonality but no spikes."""
+    folder = tmp_path_factory.mktemp('null')
+    cache_dir, collisions.CACHE_DIR = collisions.CACHE_DIR, str(folder / '.cache')
+    try:
+        path = write_csv(str(folder / 'null.csv'), 300_000, seed=7)
+        yield aggregate_csv(path, [spec for spec in OBJECTIVE_SPECS if spec.name in ANOMALY_TABLES])
+    finally:
+        collisions.CACHE_DIR = cache_dir
+
+
+def test_null_data_raises_almost_no_alerts(null_tables):
+    anomalies = detect(null_tables)
+    assert set(anomalies) == set(ANOMALY_TABLES)
+    assert sum(len(table) for table in anomalies.values()) <= 1
+
+
+def test_injected_spikes_are_found(null_tables):
+    daily = null_tables['daily'].copy()
+    daily.loc[300, COUNT_NAME] *= 2
+    borough_hour_week = null_tables['borough_hour_week'].copy()
+    row = borough_hour_week[COUNT_NAME].idxmax()
+    borough_hour_week.loc[row, COUNT_NAME] *= 3
+
+    anomalies = detect({'daily': daily, 'borough_hour_week': borough_hour_week})
+    assert daily.loc[300, 'Date'] in set(anomalies['daily']['Date'])
+    flagged = anomalies['borough_hour_week']
+    spike = borough_hour_week.loc[row]
+    assert ((flagged['Borough'] == spike['Borough']) & (flagged['Hour'] == spike['Hour']) &
+            (flagged['Week'] == spike['Week'])).any()
+
+
+def test_two_sided_baseline_at_series_edges():
+    # 40 steady weeks of 100 accidents that step up to 200 for good at week 20,
+    # with a one-week spike to 300 in the first and the last week
+    counts = np.where(np.arange(40) < 20, 100, 200)
+    counts[0], counts[-1] = 300, 300
+    table = pd.DataFrame({'Borough': 'Queens', 'Week': np.arange(40), COUNT_NAME: counts})
+
+    spikes = rolling_anomalies(table, ['Borough'], 'Week', WEEK_WINDOW)
+    assert sorted(spikes['Week']) == [0, 39]
@@ -0,0 +1,32 @@
+"""
+Smoke test of the benchmark harness at a tiny scale.
+
+    python -m pytest test_benchmark.py
+"""
+
+import json
+
+from benchmark import benchmark, run_scale
+
+
+def test_benchmark_records_every_stage(tmp_path):
+    history = str(tmp_path / 'history.json')
+    run, found = benchmark([2_000], history, str(tmp_path), render=True)
+    scale, = run['scales']
+    assert scale['failed'] == []
+    stages = {stage['stage'] for stage in scale['stages']}
+    assert {'read', 'clean', 'objective_columns', 'render'} <= stages
+    assert scale['total_wall_s'] > 0
+
+    benchmark([2_000], history, str(tmp_path), render=False)
+    with open(history) as fh:
+        assert len(json.load(fh)) == 2
+
+
+def test_failing_stage_is_reported_not_raised(tmp_path):
+    # A CSV without the expected columns makes cleaning fail in the child
+    (tmp_path / 'synthetic_1000_seed0.csv').write_text("a,b\n1,2\n")
+    scale = run_scale(1_000, str(tmp_path), render=False)
+    failed = dict(scale['failed'])
+    assert 'read' not in failed and failed['clean'] == "KeyError: 'Date'"
+    assert 'objective_columns' not in {stage['stage'] for stage in scale['stages']}
@@ -0,0 +1,33 @@
+"""
+Street-name registries and caches of several datasets loaded in one process.
+
+    python -m pytest test_collisions.py
+"""
+
+import json
+import os
+
+import collisions
+from streets import REGISTRY_NAME, STREET_RULES_VERSION
+from synthetic import write_csv
+
+
+def test_each_dataset_keeps_its_own_registry(tmp_path):
+    first, second = tmp_path / 'first', tmp_path / 'second'
+    first.mkdir()
+    write_csv(str(first / 'a.csv'), 2_000, seed=1)
+
+    a = collisions.load_collisions(str(first / 'a.csv'))
+    registry = collisions.street_names(str(first / 'a.csv'))
+    assert collisions.street_names(str(second / 'b.csv')) is not registry
+    # Cross Street is encoded last, so its categories are the whole registry
+    assert list(a['Cross Street'].cat.categories) == registry.names
+
+    with open(first / '.cache' / REGISTRY_NAME) as fh:
+        assert json.load(fh)['names'] == registry.names
+    assert not os.path.exists(second / '.cache' / REGISTRY_NAME)
+
+
+def test_cache_name_carries_the_street_rules_version(tmp_path):
+    path = write_csv(str(tmp_path / 'c.csv'), 100, seed=2)
+    assert collisions._cache_path(path, None)[2].endswith(f".r{STREET_RULES_VERSION}.feather")
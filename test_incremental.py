@@ -0,0 +1,44 @@
+"""
+Incremental aggregation of a CSV that is appended to while its last row is half-written.
+
+    python -m pytest test_incremental.py
+"""
+
+import io
+
+import pandas as pd
+
+import collisions
+from aggregate import OBJECTIVE_SPECS, aggregate_csv
+from incremental import update_aggregates
+from synthetic import write_csv
+
+SPECS = [spec for spec in OBJECTIVE_SPECS if spec.name in ('casualties', 'daily', 'streets')]
+
+
+def test_truncated_last_row_is_counted_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(collisions, 'CACHE_DIR', str(tmp_path / '.cache'))
+    full = write_csv(str(tmp_path / 'full.csv'), 20_000, seed=5)
+    with open(full, 'rb') as fh:
+        data = fh.read()
+    lines = data.splitlines(keepends=True)
+    # The first run sees 15,000 rows and half of the next one
+    cut = sum(len(line) for line in lines[:15_001]) + len(lines[15_001]) // 2
+    path = tmp_path / 'growing.csv'
+    path.write_bytes(data[:cut])
+
+    first = update_aggregates(str(path), SPECS)
+    assert first['casualties']['Accident_Count'].iloc[0] == 15_000 - dropped_rows(data, 15_001)
+
+    path.write_bytes(data)
+    second = update_aggregates(str(path), SPECS)
+    exact = aggregate_csv(full, SPECS)
+    for spec in SPECS:
+        pd.testing.assert_frame_equal(second[spec.name], exact[spec.name], check_dtype=False,
+                                      check_categorical=False)
+
+
+def dropped_rows(data, lines):
+    """Rows among the first lines of data (header included) that clean() drops."""
+    raw = collisions.read_raw(io.BytesIO(b''.join(data.splitlines(keepends=True)[:lines])))
+    return len(raw) - len(collisions.clean(raw))
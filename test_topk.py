@@ -0,0 +1,45 @@
+"""
+Approximate top-K aggregation against the exact aggregates on synthetic data.
+
+    python -m pytest test_topk.py
+"""
+
+import pandas as pd
+import pytest
+
+import collisions
+from aggregate import COUNT_NAME, OBJECTIVE_SPECS, aggregate_csv
+from synthetic import write_csv
+from topk import TOP_K, aggregate_approximate
+
+
+@pytest.fixture(scope='module')
+def results(tmp_path_factory):
+    """Exact and approximate aggregates of 50,000 synthetic collisions."""
+    folder = tmp_path_factory.mktemp('topk')
+    cache_dir, collisions.CACHE_DIR = collisions.CACHE_DIR, str(folder / '.cache')
+    try:
+        path = write_csv(str(folder / 'topk.csv'), 50_000, seed=3)
+        specs = [spec for spec in OBJECTIVE_SPECS if spec.name in ('factors', 'fatal_factors', 'streets')]
+        yield aggregate_csv(path, specs), aggregate_approximate(path, specs)[0]
+    finally:
+        collisions.CACHE_DIR = cache_dir
+
+
+def ranked(table):
+    return table.sort_values([COUNT_NAME] + [c for c in table if c != COUNT_NAME], ascending=False,
+                             kind='stable').reset_index(drop=True)
+
+
+def test_factors_stay_exact(results):
+    exact, approximate = results
+    assert len(exact['factors']) > TOP_K['fatal_factors']
+    pd.testing.assert_frame_equal(ranked(approximate['factors']), ranked(exact['factors']), check_dtype=False,
+                                  check_categorical=False)
+
+
+def test_top_k_counts_are_exact(results):
+    exact, approximate = results
+    for name in ('fatal_factors', 'streets'):
+        top = ranked(exact[name]).head(TOP_K[name])
+        assert list(approximate[name][COUNT_NAME]) == list(top[COUNT_NAME])
@@ -0,0 +1,36 @@
+"""
+Relative risks of vehicle types, including a type without fatal accidents.
+
+    python -m pytest test_vehicles.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME
+from vehicles import relative_risks, severity_classes
+
+
+def vehicle_severity(counts):
+    """'vehicle_severity' table from {vehicle type: (none, injury, fatal) accident counts}."""
+    rows = [(vehicle, code, count) for vehicle, classes in counts.items()
+            for code, count in enumerate(classes) if count]
+    return pd.DataFrame(rows, columns=['Vehicle Type', 'Severity', COUNT_NAME])
+
+
+def test_relative_risk_lies_inside_its_interval():
+    table = relative_risks(severity_classes(vehicle_severity({
+        'Sedan': (8000, 1900, 30), 'Bike': (300, 400, 5), 'Bus': (900, 100, 0)})), min_accidents=0)
+    assert np.isfinite(table[['Relative Risk', 'CI Low', 'CI High']].to_numpy()).all()
+    assert (table['CI Low'] <= table['Relative Risk']).all()
+    assert (table['Relative Risk'] <= table['CI High']).all()
+
+    bus = table.set_index('Vehicle Type').loc['Bus']
+    assert bus['Fatal Accidents'] == 0 and bus['Fatal Rate'] == 0
+    assert 0 < bus['Relative Risk'] < 1
+
+
+def test_relative_risk_without_empty_cells_is_the_plain_ratio():
+    table = relative_risks(severity_classes(vehicle_severity({
+        'Sedan': (8000, 1900, 100), 'Bike': (300, 400, 20)})), min_accidents=0).set_index('Vehicle Type')
+    assert np.isclose(table.loc['Bike', 'Relative Risk'], (20 / 720) / (100 / 10000))
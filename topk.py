@@ -0,0 +1,211 @@
+"""
+Approximate top-K over high-cardinality keys in bounded memory.
+
+The hotspot, street and contributing-factor objectives only report the 10 or
+20 largest groups, but the exact path keeps a count for every street (and
+every street x week) ever seen. SpaceSaving keeps at most `capacity`
+counters per key set, each with an upper bound (the counter) and a lower bound
+(counter minus error); summaries of different chunks or workers merge into a
+summary with the same guarantees, and any key not in a summary occurred at
+most `floor` times. aggregate_approximate() streams the CSV once to build the
+summaries, then re-counts only the candidate keys exactly in a second pass, so
+the reported top-K tables are exact whenever the bounds separate them.
+
+    python analysis.py --approximate --capacity 2000
+"""
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME, OBJECTIVE_SPECS, add_objective_columns, finalize, merge_partials, partial_aggregate
+from collisions import iter_collisions, report_dropped
+from profiling import stage
+
+# Aggregates reported as top-K tables, and how many groups each objective shows.
+# 'factors' stays exact: its vocabulary is small and objective 5 also needs the
+# 'Unspecified' count and the total of all specified factors.
+TOP_K = {'hotspots': 20, 'streets': 10, 'fatal_factors': 10}
+
+# Counters kept per sketch; every estimate is within total / CAPACITY of the true count
+CAPACITY = 1000
+
+
+def _plain_index(index):
+    """Return index with categorical levels turned into plain values so chunks with different categories align."""
+    if isinstance(index, pd.MultiIndex):
+        return pd.MultiIndex.from_arrays([np.asarray(index.get_level_values(i)) for i in range(index.nlevels)],
+                                         names=index.names)
+    return pd.Index(np.asarray(index), name=index.name)
+
+
+class SpaceSaving:
+    """
+    Mergeable Space-Saving summary of the heaviest keys of a stream.
+
+    counts holds each tracked key's upper bound and errors how much of it may be
+    overcounting, so the true count lies in [counts - errors, counts]. Keys that
+    are not tracked occurred at most floor times, and floor <= total / capacity.
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype='int64')
+        self.errors = pd.Series(dtype='int64')
+        self.floor = 0
+        self.total = 0
+
+    @classmethod
+    def from_counts(cls, counts, capacity=CAPACITY):
+        """Summary of exact counts (a Series indexed by key), e.g. one chunk's group sizes."""
+        summary = cls(capacity)
+        counts = counts[counts > 0].astype('int64')
+        counts.index = _plain_index(counts.index)
+        summary._truncate(counts, pd.Series(0, index=counts.index, dtype='int64'), 0)
+        summary.total = int(counts.sum())
+        return summary
+
+    def _truncate(self, counts, errors, floor):
+        if len(counts) > self.capacity:
+            order = np.argsort(-counts.to_numpy(), kind='stable')
+            # Dropped keys can only be bounded by the largest dropped counter
+            floor = max(floor, int(counts.iloc[order[self.capacity]]))
+            keep = order[:self.capacity]
+            counts, errors = counts.iloc[keep], errors.iloc[keep]
+        self.counts, self.errors, self.floor = counts, errors, floor
+
+    def merge(self, other):
+        """Fold another summary (or exact counts via from_counts) into this one."""
+        if not len(other.counts):
+            self.floor += other.floor
+            self.total += other.total
+            return self
+        if not len(self.counts):
+            index = other.counts.index
+        else:
+            index = self.counts.index.union(other.counts.index)
+        # A key missing from one side may have occurred up to that side's floor times there
+        counts = (self.counts.reindex(index, fill_value=self.floor) +
+                  other.counts.reindex(index, fill_value=other.floor))
+        errors = (self.errors.reindex(index, fill_value=self.floor) +
+                  other.errors.reindex(index, fill_value=other.floor))
+        self._truncate(counts.astype('int64'), errors.astype('int64'), self.floor + other.floor)
+        self.total += other.total
+        return self
+
+    def update(self, counts):
+        """Add exact counts of a new chunk (a Series indexed by key)."""
+        return self.merge(SpaceSaving.from_counts(counts, self.capacity))
+
+    @property
+    def max_error(self):
+        """Largest possible overcount of any estimate (also bounds keys that are not tracked)."""
+        return max(self.floor, int(self.errors.max()) if len(self.errors) else 0)
+
+    def top(self, k):
+        """Estimated top k as a frame of key columns, Estimate, Lower and Upper bounds."""
+        order = np.argsort(-self.counts.to_numpy(), kind='stable')[:k]
+        table = pd.DataFrame({'Estimate': self.counts.iloc[order],
+                              'Lower': (self.counts - self.errors).iloc[order],
+                              'Upper': self.counts.iloc[order]})
+        return table.reset_index()
+
+    def candidates(self, k):
+        """
+        Keys that may belong to the true top k, and whether the set is guaranteed to contain it.
+
+        A key is a candidate if its upper bound reaches the k-th largest lower
+        bound; untracked keys are excluded safely only while floor stays below it.
+        """
+        lower = (self.counts - self.errors).to_numpy()
+        if len(lower) < k:
+            return self.counts.index, self.floor == 0
+        threshold = np.sort(lower)[::-1][k - 1]
+        keep = self.counts.to_numpy() >= threshold
+        return self.counts.index[keep], self.floor < threshold
+
+
+def _restrict(table, keys, candidates):
+    """Rows of a partial table (indexed by keys first) whose key prefix is a candidate."""
+    if isinstance(table.index, pd.MultiIndex):
+        prefix = table.index.droplevel([n for n in table.index.names if n not in keys])
+    else:
+        prefix = table.index
+    return table[_plain_index(prefix).isin(candidates)]
+
+
+def aggregate_approximate(path=None, specs=OBJECTIVE_SPECS, capacity=CAPACITY, chunksize=500_000, coverage=None):
+    """
+    Stream the CSV twice and return (results, summaries).
+
+    The TOP_K specs come back as their top-K tables with exact counts (largest
+    first) and specs keyed on one of them plus more keys (street x week) only
+    for the reported keys; every other spec is computed exactly as
+    aggregate_csv() would. summaries maps each TOP_K spec to its SpaceSaving.
+    coverage maps a dependent spec to how many of its parent's largest keys it
+    keeps, when that is more than the parent's TOP_K (e.g. the 200 busiest
+    streets of street_week scored by anomaly.py).
+    """
+    coverage = coverage or {}
+    heavy = [spec for spec in specs if spec.name in TOP_K]
+    # A dependent spec extends a heavy spec's keys; one with the same keys (factors) stays exact
+    dependent = {spec.name: parent for spec in specs if spec.name not in TOP_K for parent in heavy
+                 if len(spec.keys) > len(parent.keys) and list(spec.keys[:len(parent.keys)]) == list(parent.keys)}
+    # Parent keys re-counted exactly: the TOP_K reported plus whatever a dependent spec covers
+    wanted = {spec.name: max([TOP_K[spec.name]] + [coverage.get(name, 0) for name, parent in dependent.items()
+                                                   if parent.name == spec.name]) for spec in heavy}
+    exact = [spec for spec in specs if spec.name not in TOP_K and spec.name not in dependent]
+
+    # Pass 1: exact partials for the small specs, a bounded sketch for the heavy ones
+    summaries = {spec.name: SpaceSaving(capacity) for spec in heavy}
+    partials, dropped = None, {'Date': 0, 'Time': 0}
+    with stage('topk_sketch') as step:
+        for chunk in iter_collisions(path, chunksize):
+            for col, count in chunk.attrs.get('dropped_rows', {}).items():
+                dropped[col] += count
+            partial = partial_aggregate(add_objective_columns(chunk), exact + heavy)
+            for spec in heavy:
+                summaries[spec.name].update(partial.pop(spec.name)[COUNT_NAME])
+            partials = partial if partials is None else merge_partials(partials, partial)
+        step.args['capacity'] = capacity
+    report_dropped(dropped)
+
+    candidates = {}
+    for spec in heavy:
+        keys, guaranteed = summaries[spec.name].candidates(wanted[spec.name])
+        candidates[spec.name] = keys
+        if not guaranteed:
+            print(f"Approximate top {wanted[spec.name]} of '{spec.name}' may miss keys seen up to "
+                  f"{summaries[spec.name].floor} times; raise the capacity for an exact ranking.")
+
+    # Pass 2: exact counts for the candidate keys only
+    recount_specs = heavy + [spec for spec in specs if spec.name in dependent]
+    recounted = None
+    with stage('topk_recount') as step:
+        for chunk in iter_collisions(path, chunksize):
+            partial = partial_aggregate(add_objective_columns(chunk), recount_specs)
+            for spec in recount_specs:
+                parent = dependent.get(spec.name, spec)
+                partial[spec.name] = _restrict(partial[spec.name], parent.keys, candidates[parent.name])
+                partial[spec.name].index = _plain_index(partial[spec.name].index)
+            recounted = partial if recounted is None else merge_partials(recounted, partial)
+        step.args['candidates'] = sum(len(keys) for keys in candidates.values())
+
+    results = finalize(partials, exact) if exact else {}
+    results.update(finalize(recounted, recount_specs))
+    ranked = {spec.name: results[spec.name].sort_values(COUNT_NAME, ascending=False, kind='stable')
+              for spec in heavy}
+    for spec in heavy:
+        results[spec.name] = ranked[spec.name].head(TOP_K[spec.name]).reset_index(drop=True)
+    # Keep only the dependent rows of the keys that made the final top-K (or the spec's coverage)
+    for name, parent in dependent.items():
+        top = ranked[parent.name].head(coverage.get(name, TOP_K[parent.name])).set_index(list(parent.keys)).index
+        table = results[name]
+        results[name] = table[_plain_index(table.set_index(list(parent.keys)).index).isin(top)].reset_index(drop=True)
+    return {spec.name: results[spec.name] for spec in specs}, summaries
+
+
+def report_error_bounds(summaries):
+    """Print each sketch's stream size, tracked keys and worst-case estimate error."""
+    for name, summary in summaries.items():
+        print(f"{name}: {summary.total} rows, {len(summary.counts)} of {summary.capacity} counters used, "
+              f"estimates within {summary.max_error} (bound {summary.total // summary.capacity})")
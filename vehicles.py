@@ -0,0 +1,203 @@
+"""
+Vehicle Type impact analysis (objective 8) on sparse contingency tables.
+
+collisions.clean() gives every vehicle type one canonical spelling, and the
+'vehicle_severity' and 'vehicle_factors' aggregates of OBJECTIVE_SPECS count
+accidents per Vehicle Type x Severity code and Vehicle Type x Contributing
+Factor. Contingency holds such a table as integer row/column codes plus the
+counts of the occupied cells (COO layout; to_sparse() gives a scipy matrix),
+and every statistic is computed from the occupied cells in bulk: the
+chi-square test of independence and Cramer's V of the whole table, and for
+each vehicle type the relative risk of a fatal or injury outcome compared
+with all other vehicle types, with its 95% confidence interval and 2x2
+chi-square.
+
+    python vehicles.py NYC_Collisions.csv
+"""
+
+import sys
+
+import numpy as np
+import pandas as pd
+
+from aggregate import COUNT_NAME
+from collisions import SEVERITY_CLASSES
+from severity import severity_class
+
+# Vehicle types with fewer accidents than this are left out of the relative-risk tables
+MIN_ACCIDENTS = 100
+
+# z of the two-sided 95% confidence interval
+_Z95 = 1.959964
+
+
+class Contingency:
+    """
+    Sparse rows x cols table of counts.
+
+    rows and cols are the pandas Index of the row and column labels; row_codes,
+    col_codes and counts describe the occupied cells (every other cell is 0).
+    """
+
+    def __init__(self, rows, cols, row_codes, col_codes, counts):
+        self.rows = rows
+        self.cols = cols
+        self.row_codes = row_codes
+        self.col_codes = col_codes
+        self.counts = counts
+
+    @classmethod
+    def from_table(cls, table, row, col, value=COUNT_NAME):
+        """Build the table of value per (row, col) from a finalize()-style aggregate table."""
+        row_codes, rows = pd.factorize(table[row], sort=True)
+        col_codes, cols = pd.factorize(table[col], sort=True)
+        return cls(pd.Index(rows, name=row), pd.Index(cols, name=col), row_codes, col_codes,
+                   table[value].to_numpy(dtype='int64'))
+
+    @property
+    def shape(self):
+        return len(self.rows), len(self.cols)
+
+    @property
+    def total(self):
+        return int(self.counts.sum())
+
+    def row_totals(self):
+        return np.bincount(self.row_codes, weights=self.counts, minlength=len(self.rows))
+
+    def col_totals(self):
+        return np.bincount(self.col_codes, weights=self.counts, minlength=len(self.cols))
+
+    def recode_cols(self, labels):
+        """
+        Merge columns: labels gives the new label of every current column.
+
+        Used to collapse the severity codes of Vehicle Type x Severity into classes.
+        """
+        cols, positions = np.unique(np.asarray(labels), return_inverse=True)
+        codes = positions[self.col_codes] * len(self.rows) + self.row_codes
+        ids, slot = np.unique(codes, return_inverse=True)
+        counts = np.bincount(slot, weights=self.counts).astype('int64')
+        return Contingency(self.rows, pd.Index(cols, name=self.cols.name),
+                           ids % len(self.rows), ids // len(self.rows), counts)
+
+    def to_sparse(self):
+        """The table as a scipy.sparse CSR matrix (requires scipy)."""
+        from scipy.sparse import coo_matrix
+
+        return coo_matrix((self.counts, (self.row_codes, self.col_codes)), shape=self.shape).tocsr()
+
+    def to_frame(self):
+        """The table as a dense DataFrame, for small tables."""
+        dense = np.zeros(self.shape, dtype='int64')
+        dense[self.row_codes, self.col_codes] = self.counts
+        return pd.DataFrame(dense, index=self.rows, columns=self.cols)
+
+    def chi_square(self):
+        """
+        Pearson chi-square test of independence: {'chi2', 'dof', 'cramers_v', 'p'}.
+
+        Uses chi2 = N * (sum O^2 / (R_i C_j) - 1), which only needs the occupied
+        cells. Rows and columns without any count are left out of the degrees of
+        freedom. p needs scipy and is None without it.
+        """
+        rows, cols = self.row_totals(), self.col_totals()
+        n = self.total
+        ratio = self.counts.astype('float64') ** 2 / (rows[self.row_codes] * cols[self.col_codes])
+        chi2 = n * (ratio.sum() - 1)
+        r, c = int((rows > 0).sum()), int((cols > 0).sum())
+        dof = (r - 1) * (c - 1)
+        cramers_v = np.sqrt(chi2 / (n * max(min(r, c) - 1, 1)))
+        try:
+            from scipy.stats import chi2 as chi2_dist
+        except ImportError:
+            p = None
+        else:
+            p = float(chi2_dist.sf(chi2, dof)) if dof else None
+        return {'chi2': float(chi2), 'dof': dof, 'cramers_v': float(cramers_v), 'p': p}
+
+    def residuals(self, min_count=1):
+        """
+        Standardized Pearson residual (O - E) / sqrt(E) of each occupied cell.
+
+        Returns a frame of row label, column label, Observed, Expected and
+        Residual for cells with at least min_count accidents, largest residual first.
+        """
+        rows, cols = self.row_totals(), self.col_totals()
+        expected = rows[self.row_codes] * cols[self.col_codes] / self.total
+        keep = self.counts >= min_count
+        table = pd.DataFrame({self.rows.name: self.rows.take(self.row_codes[keep]),
+                              self.cols.name: self.cols.take(self.col_codes[keep]),
+                              'Observed': self.counts[keep], 'Expected': expected[keep],
+                              'Residual': (self.counts[keep] - expected[keep]) / np.sqrt(expected[keep])})
+        return table.sort_values('Residual', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def severity_classes(vehicle_severity):
+    """Vehicle Type x severity class (none/injury/fatal) table of the 'vehicle_severity' aggregate."""
+    table = Contingency.from_table(vehicle_severity, 'Vehicle Type', 'Severity')
+    classes = np.asarray(SEVERITY_CLASSES, dtype=object)[severity_class(table.cols.to_numpy())]
+    return table.recode_cols(classes)
+
+
+def relative_risks(classes, outcome='fatal', min_accidents=MIN_ACCIDENTS):
+    """
+    Relative risk of outcome for each vehicle type against all other vehicle types.
+
+    classes is the Vehicle Type x severity class table of severity_classes().
+    A 'fatal' outcome is a collision with a fatality, an 'injury' outcome one
+    with an injury or a fatality. Every vehicle type is scored at once from
+    the row totals. Types whose 2x2 table has an empty cell (e.g. no fatal
+    accidents) get 0.5 added to every cell, for the relative risk as well as
+    its interval, so the estimate always lies inside the interval.
+    """
+    dense = classes.to_frame()
+    accidents = dense.sum(axis=1).to_numpy('float64')
+    outcomes = [name for name in SEVERITY_CLASSES[SEVERITY_CLASSES.index(outcome):] if name in dense]
+    hit = dense[outcomes].sum(axis=1).to_numpy('float64')
+    rest, rest_hit = accidents.sum() - accidents, hit.sum() - hit
+
+    # 2x2 table of each vehicle type against the rest: a/b outcome or not for the type, c/d for the rest
+    a, b, c, d = hit, accidents - hit, rest_hit, rest - rest_hit
+    with np.errstate(divide='ignore', invalid='ignore'):
+        risk = a / accidents
+        chi2 = (a + b + c + d) * (a * d - b * c) ** 2 / ((a + b) * (c + d) * (a + c) * (b + d))
+        # log(RR) and its interval; tables with an empty cell get 0.5 added to every cell
+        fix = 0.5 * ((a == 0) | (b == 0) | (c == 0) | (d == 0))
+        a, b, c, d = a + fix, b + fix, c + fix, d + fix
+        log_rr = np.log(a / (a + b)) - np.log(c / (c + d))
+        se = np.sqrt(1 / a - 1 / (a + b) + 1 / c - 1 / (c + d))
+
+    name = outcome.capitalize()
+    table = pd.DataFrame({'Vehicle Type': dense.index.astype(str), 'Accidents': accidents.astype('int64'),
+                          f'{name} Accidents': hit.astype('int64'), f'{name} Rate': risk * 100,
+                          'Relative Risk': np.exp(log_rr), 'CI Low': np.exp(log_rr - _Z95 * se),
+                          'CI High': np.exp(log_rr + _Z95 * se), 'Chi2': chi2})
+    table = table[table['Accidents'] >= min_accidents]
+    return table.sort_values('Relative Risk', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def report_association(name, table):
+    """Print the chi-square test of one contingency table."""
+    test = table.chi_square()
+    p = f", p = {test['p']:.3g}" if test['p'] is not None else ""
+    print(f"{name}: {table.shape[0]} x {table.shape[1]} table, {len(table.counts)} occupied cells, "
+          f"chi2 = {test['chi2']:.1f} (dof {test['dof']}){p}, Cramer's V = {test['cramers_v']:.3f}")
+
+
+if __name__ == '__main__':
+    import time
+
+    from aggregate import OBJECTIVE_SPECS, aggregate_csv
+
+    results = aggregate_csv(sys.argv[1] if len(sys.argv) > 1 else None,
+                            [spec for spec in OBJECTIVE_SPECS if spec.name in ('vehicle_severity', 'vehicle_factors')])
+    start = time.perf_counter()
+    classes = severity_classes(results['vehicle_severity'])
+    factors = Contingency.from_table(results['vehicle_factors'], 'Vehicle Type', 'Contributing Factor')
+    fatal = relative_risks(classes, 'fatal')
+    elapsed = time.perf_counter() - start
+    report_association("Vehicle Type x severity", classes)
+    report_association("Vehicle Type x Contributing Factor", factors)
+    print(fatal.head(10).round(3).to_string(index=False))
+    print(f"Computed the tables and statistics in {elapsed * 1000:.1f} ms")